@@ -0,0 +1,153 @@
+import argparse
+import io
+import json
+import mmap
+import os
+import struct
+
+# magic, длина индекса; индекс (JSON) идёт сразу за заголовком, потом данные
+MAGIC = b"ARCPAK01"
+HEADER = struct.Struct("<8sI")
+ALIGNMENT = 16
+
+
+class ArchiveReader(io.RawIOBase):
+    # readinto кладёт байты прямо из отображения в буфер вызывающего; read() по контракту
+    # отдаёт bytes, то есть копию прочитанного куска. Целиком без копии - getbuffer()
+    def __init__(self, view):
+        self.view = view
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.view)
+        self.position = max(0, min(offset, len(self.view)))
+        return self.position
+
+    def readinto(self, buffer):
+        chunk = self.view[self.position:self.position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+    def getbuffer(self):
+        return self.view
+
+    def read(self, size=-1):
+        end = len(self.view) if size is None or size < 0 else min(len(self.view), self.position + size)
+        chunk = self.view[self.position:end].tobytes()
+        self.position = end
+        return chunk
+
+
+class AssetArchive:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mm)
+
+        magic, index_size = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an asset archive")
+        index_start = HEADER.size
+        index = json.loads(self.view[index_start:index_start + index_size].tobytes())
+        self.entries = {name: (offset, size) for name, (offset, size) in index.items()}
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def size(self, name):
+        return self.entries[name][1]
+
+    def read(self, name):
+        offset, size = self.entries[name]
+        return self.view[offset:offset + size]
+
+    def open(self, name):
+        return ArchiveReader(self.read(name))
+
+    def close(self):
+        self.view.release()
+        self.mm.close()
+        self.file.close()
+
+
+def collect_files(root_dir):
+    # Имена как у resource_path: "Assets/images/teeth.png"
+    files = []
+    for directory, _, names in os.walk(root_dir):
+        for name in names:
+            full_path = os.path.join(directory, name)
+            relative = os.path.relpath(full_path, os.path.dirname(root_dir)).replace(os.sep, "/")
+            files.append((relative, full_path))
+    return sorted(files)
+
+
+def aligned(value):
+    return (value + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def build_archive(root_dir, out_path):
+    files = collect_files(root_dir)
+
+    # Размер индекса зависит от смещений, поэтому считаем их в два прохода
+    index = {name: [0, os.path.getsize(path)] for name, path in files}
+    index_size = len(json.dumps(index).encode("utf-8")) + 32 * len(files)
+    offset = aligned(HEADER.size + index_size)
+    for name, _ in files:
+        index[name][0] = offset
+        offset = aligned(offset + index[name][1])
+
+    index_bytes = json.dumps(index).encode("utf-8")
+    index_bytes += b" " * (index_size - len(index_bytes))
+
+    with open(out_path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, len(index_bytes)))
+        out.write(index_bytes)
+        for name, path in files:
+            out.seek(index[name][0])
+            with open(path, "rb") as source:
+                out.write(source.read())
+
+    return len(files)
+
+
+def main():
+    from assets import ARCHIVE_NAME, resource_path
+
+    parser = argparse.ArgumentParser(description="Pack Assets/ into a single mmap-friendly archive")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build")
+    build_parser.add_argument("--assets", default=resource_path("Assets"))
+    build_parser.add_argument("--out", default=os.path.join(os.path.dirname(resource_path("Assets")), ARCHIVE_NAME))
+    list_parser = subparsers.add_parser("list")
+    list_parser.add_argument("archive")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_archive(os.path.abspath(args.assets), args.out)
+        print(f"{count} files packed into {args.out}")
+    else:
+        archive = AssetArchive(args.archive)
+        for name, (offset, size) in sorted(archive.entries.items()):
+            print(f"{offset:10d} {size:10d}  {name}")
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import functools
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from collections import OrderedDict
+
+import arcade
+import pyglet
+from PIL import Image
+
+from asset_archive import AssetArchive
+
+# Сколько байт RGBA-данных текстур держим в кэше одновременно
+TEXTURE_BUDGET_BYTES = 256 * 1024 * 1024
+
+# Собирается asset_archive.py; в замороженной сборке лежит рядом с exe
+ARCHIVE_NAME = "assets.pak"
+
+# Уменьшенные копии больших текстур, ключ: хэш исходника + размер
+SCALED_CACHE_DIR = os.environ.get("SCALED_TEXTURE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "two_player_games", "textures")
+
+# Кнопки меню и рестарта, одинаковые во всех сценах; по ним же prefetch строит ключи
+MENU_ICON_SCALE = 0.2
+RESTART_ICON_SCALE = 0.8
+
+# Мелкие спрайты, которые сцены берут в полном размере: грузятся в GL-атлас одним
+# проходом при открытии окна, а не по одному в первых кадрах сцен
+STARTUP_SPRITES = [
+    "Assets/images/blue_angle.png",
+    "Assets/images/red_angle.png",
+    "Assets/images/red_player.png",
+    "Assets/images/blue_player.png",
+    "Assets/images/explosion1.png",
+    "Assets/images/explosion2.png",
+    "Assets/images/explosion3.png",
+    "Assets/images/car_red_tires.png",
+    "Assets/images/car_cyan_tires.png",
+    "Assets/images/tank_red.png",
+    "Assets/images/tank_blue.png",
+    ":resources:/images/topdown_tanks/tankRed_barrel1.png",
+    ":resources:/images/topdown_tanks/tankBlue_barrel1.png",
+]
+
+
+@functools.lru_cache(maxsize=None)
+def resource_path(relative_path):
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+        assets_path = os.path.join(os.path.dirname(base_path), "Assets")
+        if os.path.exists(assets_path):
+            test_path = os.path.join(os.path.dirname(base_path), relative_path)
+            if os.path.exists(test_path):
+                return test_path
+            test_path = os.path.join(base_path, relative_path)
+            if os.path.exists(test_path):
+                return test_path
+
+    full_path = os.path.join(base_path, relative_path)
+    return full_path
+
+
+def resolve_path(path):
+    # ":resources:" пути arcade разрешает сам
+    if path.startswith(":"):
+        return path
+    return resource_path(path)
+
+
+def texture_size_bytes(texture):
+    return texture.width * texture.height * 4
+
+
+def find_archive():
+    candidates = [os.environ.get("ASSET_ARCHIVE", "")]
+    if getattr(sys, "frozen", False):
+        candidates.append(os.path.join(os.path.dirname(sys.executable), ARCHIVE_NAME))
+    candidates.append(resource_path(ARCHIVE_NAME))
+    for path in candidates:
+        if path and os.path.exists(path):
+            return AssetArchive(path)
+    return None
+
+
+_archive = None
+_archive_checked = False
+
+
+def get_archive():
+    global _archive, _archive_checked
+    if not _archive_checked:
+        _archive = find_archive()
+        _archive_checked = True
+    return _archive
+
+
+def in_archive(path):
+    archive = get_archive()
+    return archive is not None and path in archive
+
+
+def asset_exists(path):
+    return in_archive(path) or os.path.exists(resource_path(path))
+
+
+def asset_size(path):
+    if in_archive(path):
+        return get_archive().size(path)
+    if path.startswith(":"):
+        return os.path.getsize(arcade.resources.resolve(path))
+    return os.path.getsize(resource_path(path))
+
+
+def open_asset(path):
+    if in_archive(path):
+        return get_archive().open(path)
+    if path.startswith(":"):
+        return open(arcade.resources.resolve(path), "rb")
+    return open(resource_path(path), "rb")
+
+
+def decode_image(path):
+    # Без GL, можно звать из рабочих потоков
+    with open_asset(path) as file:
+        return Image.open(file).convert("RGBA")
+
+
+@functools.lru_cache(maxsize=None)
+def source_size(path):
+    with open_asset(path) as file:
+        return Image.open(file).size
+
+
+@functools.lru_cache(maxsize=None)
+def source_digest(path):
+    if in_archive(path):
+        # хэш прямо по отображению архива, без копии файла
+        return hashlib.sha1(get_archive().read(path)).hexdigest()
+    with open_asset(path) as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def scaled_size(path, scale):
+    if scale >= 1:
+        return None
+    width, height = source_size(path)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def fitted_size(path, max_width, max_height):
+    width, height = source_size(path)
+    factor = min(max_width / width, max_height / height)
+    if factor >= 1:
+        return None
+    return max(1, round(width * factor)), max(1, round(height * factor))
+
+
+def scaled_key(path, size):
+    return f"{resolve_path(path)}@{size[0]}x{size[1]}"
+
+
+def decode_scaled_image(path, size):
+    cache_path = os.path.join(SCALED_CACHE_DIR, f"{source_digest(path)}_{size[0]}x{size[1]}.png")
+    if os.path.exists(cache_path):
+        return Image.open(cache_path).convert("RGBA")
+
+    # Масштабируем в premultiplied alpha, иначе по краям появляется тёмная кайма
+    image = decode_image(path).convert("RGBa").resize(size, Image.LANCZOS).convert("RGBA")
+
+    # Тот же размер могут одновременно строить prefetch-потоки и главный поток:
+    # у каждого свой временный файл, а проигравший гонку просто отдаёт свою копию
+    os.makedirs(SCALED_CACHE_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=SCALED_CACHE_DIR, suffix=".tmp", delete=False) as out:
+        image.save(out, format="PNG", compress_level=1)
+    try:
+        os.replace(out.name, cache_path)
+    except OSError:
+        if os.path.exists(out.name):
+            os.remove(out.name)
+    return image
+
+
+class ArchiveSound(arcade.Sound):
+    # arcade.Sound.__init__ открывает только путь на диске; здесь источник pyglet
+    # декодирует прямо из assets.pak, а остальное - те же поля, что ставит базовый класс
+    def __init__(self, path, streaming=False):
+        self.file_name = path
+        self.source = pyglet.media.load(path, file=get_archive().open(path), streaming=streaming)
+        self.min_distance = 100000000
+
+
+def decode_sound(path):
+    if in_archive(path):
+        return ArchiveSound(path)
+    return arcade.load_sound(resolve_path(path))
+
+
+def load_texture_file(path, key):
+    # Своего офлайн-атласа нет: arcade 3 и так кладёт каждую текстуру в ctx.default_atlas,
+    # и SpriteList рисует из него одним bind. Упакованный источник - assets.pak, без него
+    # читаем отдельные файлы; загрузку в GL при старте делает preload_sprites
+    if in_archive(path):
+        return arcade.Texture(decode_image(path), hash=key)
+    return arcade.load_texture(key)
+
+
+class TextureCache:
+    def __init__(self, budget_bytes=TEXTURE_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._textures = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._textures
+
+    def __len__(self):
+        return len(self._textures)
+
+    def lookup(self, key):
+        texture = self._textures.get(key)
+        if texture is not None:
+            self._textures.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        return texture
+
+    def get(self, path):
+        key = resolve_path(path)
+        texture = self.lookup(key)
+        if texture is None:
+            texture = load_texture_file(path, key)
+            self.put(key, texture)
+        return texture
+
+    def get_sized(self, path, size):
+        key = scaled_key(path, size)
+        texture = self.lookup(key)
+        if texture is None:
+            texture = arcade.Texture(decode_scaled_image(path, size), hash=key)
+            self.put(key, texture)
+        return texture
+
+    def put(self, key, texture):
+        # Хитбокс считается один раз здесь, а не в каждом спрайте
+        texture.hit_box_points
+
+        old = self._textures.pop(key, None)
+        if old is not None:
+            self.used_bytes -= texture_size_bytes(old)
+
+        self._textures[key] = texture
+        self.used_bytes += texture_size_bytes(texture)
+        self.evict()
+
+    def evict(self):
+        # Место в ctx.default_atlas освобождает finalizer атласа, когда умирает последняя
+        # ссылка на Texture; спрайты, которые ещё рисуют эту текстуру, держат её сами
+        while self.used_bytes > self.budget_bytes and len(self._textures) > 1:
+            _, texture = self._textures.popitem(last=False)
+            self.used_bytes -= texture_size_bytes(texture)
+            self.evictions += 1
+
+    def set_budget(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.evict()
+
+    def clear(self):
+        self._textures.clear()
+        self.used_bytes = 0
+
+    def stats(self):
+        return {
+            "textures": len(self._textures),
+            "used_bytes": self.used_bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+texture_cache = TextureCache()
+sound_cache = {}
+
+
+def load_texture(path):
+    return texture_cache.get(path)
+
+
+def load_texture_scaled(path, scale):
+    # Возвращает текстуру и масштаб, с которым её осталось нарисовать
+    size = scaled_size(path, scale)
+    if size is None:
+        return load_texture(path), scale
+    texture = texture_cache.get_sized(path, size)
+    return texture, scale * source_size(path)[0] / texture.width
+
+
+def load_texture_fit(path, max_width, max_height):
+    size = fitted_size(path, max_width, max_height)
+    if size is None:
+        return load_texture(path)
+    return texture_cache.get_sized(path, size)
+
+
+def preload_sprites(ctx, paths=STARTUP_SPRITES):
+    # Сначала декодируем всё, потом подряд кладём в атлас, пока первый кадр не нарисован
+    textures = [load_texture(path) for path in paths if path.startswith(":") or asset_exists(path)]
+    for texture in textures:
+        ctx.default_atlas.add(texture)
+    return len(textures)
+
+
+def load_sound(path):
+    key = resolve_path(path)
+    sound = sound_cache.get(key)
+    if sound is None:
+        sound = decode_sound(path)
+        sound_cache[key] = sound
+    return sound
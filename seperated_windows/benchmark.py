@@ -0,0 +1,327 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# Без окна на экране и без звуковой карты: до первого импорта arcade
+os.environ.setdefault("ARCADE_HEADLESS", "1")
+import pyglet
+pyglet.options["audio"] = ("silent",)
+
+import arcade
+
+import scenes
+
+WINDOW_WIDTH = 1920
+WINDOW_HEIGHT = 1080
+FRAME_DT = 1 / 60
+WARMUP_FRAMES = 30
+FRAMES = 300
+# Отдельный короткий проход под tracemalloc: он замедляет кадр, поэтому времена в нём не меряются
+ALLOC_FRAMES = 60
+PERCENTILES = [50, 90, 99]
+# насколько хуже базовой линии считается регрессией
+REGRESSION_THRESHOLD = 0.10
+COMPARED_METRICS = [("frame_ms", "p50"), ("frame_ms", "p99"), ("update_ms", "p99"), ("draw_ms", "p99")]
+
+
+class Scenario:
+    def __init__(self, name, scene, count=None, setup=None, prepare=None, update=None):
+        self.name = name
+        self.scene = scene
+        self.count = count
+        self.setup = setup
+        # prepare - вне замера, перед каждым кадром; update - то, что замеряется вместо on_update
+        self.prepare = prepare
+        self.update = update
+
+
+def fill_menu_cars(view, count):
+    import interface
+    while len(view.current_sprites) < count:
+        view.current_sprites.append(interface.Car())
+
+
+def setup_tank_rockets(view, count):
+    import tanks
+    # горизонтальные ракеты не улетают за верх/низ экрана и живут весь прогон
+    for i in range(count):
+        x = random.uniform(0, view.window.width)
+        y = random.uniform(view.window.height * 0.4, view.window.height * 0.6)
+        rocket_class = tanks.Rocket_red if i % 2 else tanks.Rocket_blue
+        view.rockets.append(rocket_class(x, y, 90 if i % 4 < 2 else 270))
+
+
+def keep_tanks_running(view, count):
+    if view.game_over:
+        view.setup()
+        setup_tank_rockets(view, count)
+
+
+def setup_confetti(view, count):
+    view.game_over = True
+    view.confetti_active = True
+    view.winner_index = 0
+    keep_confetti(view, count)
+
+
+def keep_confetti(view, count):
+    import confetti
+    missing = count - view.confetti.count
+    while missing > 0:
+        amount = min(missing, 200)
+        view.confetti.emit(random.uniform(0, view.window.width), random.uniform(0, view.window.height),
+                           amount, confetti.PLAYER_COLORS[0])
+        missing -= amount
+
+
+def lay_snakes(view, length):
+    import snakes_battle
+    sim = view.sim
+    sim.reset(seed=0)
+    half = sim.rows // 2
+    for player, snake in enumerate(sim.snakes):
+        while snake.segments:
+            snake.pop_tail()
+        # змейка укладывается «змейкой» по своей половине поля
+        rows = range(0, half) if player == 0 else range(sim.rows - 1, half - 1, -1)
+        cells = []
+        for i, row in enumerate(rows):
+            cols = range(sim.cols) if i % 2 == 0 else range(sim.cols - 1, -1, -1)
+            cells += [(col, row) for col in cols]
+        cells = cells[:max(2, min(length, len(cells)))]
+        for col, row in cells:
+            snake.push(sim.cell(col, row))
+        (prev_col, prev_row), (snake.head_col, snake.head_row) = cells[-2], cells[-1]
+        snake.direction = (snake.head_col - prev_col, snake.head_row - prev_row)
+    for apple in [apple for apple in sim.apples if sim.grid[apple]]:
+        sim.apples.remove(apple)
+        sim.spawn_apple()
+    view.sync_sprites()
+    view.state = snakes_battle.STATE_GAME
+
+
+def keep_snakes(view, length):
+    # после столкновения партия раскладывается заново - вне замера
+    if view.sim.game_over:
+        lay_snakes(view, length)
+
+
+def setup_race_cars(view, count):
+    import races_game
+    # боты вместо всех машин сверх игроков; отсчёт и «GO!» пропускаются
+    view.bot_count = max(0, count - len(races_game.PLAYER_KEYS))
+    view.setup()
+    view.is_countdown_active = False
+    view.show_go_text = False
+
+
+def keep_race_cars(view, count):
+    if view.game_over:
+        setup_race_cars(view, count)
+
+
+SCENARIOS = {scenario.name: scenario for scenario in [
+    Scenario("menu", "menu"),
+    Scenario("croco", "croco"),
+    Scenario("races", "races"),
+    Scenario("snakes", "snakes"),
+    Scenario("tanks", "tanks"),
+    Scenario("menu_cars", "menu", 500, setup=fill_menu_cars, prepare=fill_menu_cars),
+    Scenario("tank_rockets", "tanks", 2000, setup=setup_tank_rockets, prepare=keep_tanks_running),
+    Scenario("confetti", "croco", 20000, setup=setup_confetti, prepare=keep_confetti),
+    Scenario("snake_length", "snakes", 400, setup=lay_snakes, prepare=keep_snakes),
+    Scenario("races_setup", "races", update=lambda view, count: view.setup()),
+    Scenario("race_cars", "races", 32, setup=setup_race_cars, prepare=keep_race_cars),
+]}
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    result = {f"p{p}": ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1000 for p in PERCENTILES}
+    result["max"] = ordered[-1] * 1000
+    result["mean"] = sum(ordered) / len(ordered) * 1000
+    return result
+
+
+def step_frame(scenario, view, count):
+    if scenario.update:
+        scenario.update(view, count)
+    else:
+        view.on_update(FRAME_DT)
+
+
+def measure_allocations(scenario, view, count, frames):
+    # Пик выделенной за кадр памяти сверх начала кадра: в отличие от разницы живых блоков,
+    # учитывает и то, что выделено и освобождено внутри кадра
+    peaks = []
+    tracemalloc.start()
+    for _ in range(frames):
+        if scenario.prepare:
+            scenario.prepare(view, count)
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        step_frame(scenario, view, count)
+        view.on_draw()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return sum(peaks) / len(peaks) / 1024
+
+
+def run_scenario(scenario, count, frames):
+    random.seed(0)
+    window = scenes.SceneWindow(fullscreen=False, width=WINDOW_WIDTH, height=WINDOW_HEIGHT)
+    view = window.show_scene(scenario.scene)
+    if scenario.setup:
+        scenario.setup(view, count)
+
+    update_times, draw_times, frame_times, blocks = [], [], [], []
+    for frame in range(WARMUP_FRAMES + frames):
+        if scenario.prepare:
+            scenario.prepare(view, count)
+        blocks_before = sys.getallocatedblocks()
+        start = time.perf_counter()
+        step_frame(scenario, view, count)
+        updated = time.perf_counter()
+        view.on_draw()
+        # ждём GPU, иначе замер покажет только постановку команд в очередь
+        window.ctx.finish()
+        drawn = time.perf_counter()
+        if frame >= WARMUP_FRAMES:
+            update_times.append(updated - start)
+            draw_times.append(drawn - updated)
+            frame_times.append(drawn - start)
+            blocks.append(sys.getallocatedblocks() - blocks_before)
+
+    alloc_peak_kb = measure_allocations(scenario, view, count, min(frames, ALLOC_FRAMES))
+    window.close()
+    return {
+        "scene": scenario.scene,
+        "count": count,
+        "frames": frames,
+        "update_ms": percentiles(update_times),
+        "draw_ms": percentiles(draw_times),
+        "frame_ms": percentiles(frame_times),
+        # прирост живых блоков за кадр: растёт, только если кадр что-то копит
+        "net_live_blocks_per_frame": sum(blocks) / len(blocks),
+        "alloc_peak_kb_per_frame": alloc_peak_kb,
+        # ru_maxrss на Linux в килобайтах
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def parse_selection(names):
+    # "menu_cars:1000" - сценарий с другим N
+    selection = []
+    for name in names or list(SCENARIOS):
+        name, _, count = name.partition(":")
+        if name not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name!r}, see 'benchmark.py list'")
+        selection.append((name, int(count) if count else SCENARIOS[name].count))
+    return selection
+
+
+def run(args):
+    results = {}
+    for name, count in parse_selection(args.scenarios):
+        print(f"{name}{'' if count is None else f' ({count})'}...", file=sys.stderr)
+        if args.in_process:
+            results[name] = run_scenario(SCENARIOS[name], count, args.frames)
+            continue
+        # каждый сценарий в своём процессе, чтобы peak RSS и кэши не смешивались
+        selector = name if count is None else f"{name}:{count}"
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "run", selector,
+                                 "--frames", str(args.frames), "--in-process", "--out", "-"],
+                                check=True, capture_output=True, text=True).stdout
+        results.update(json.loads(output)["results"])
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "arcade": arcade.version.VERSION,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, "w") as out:
+            out.write(text)
+        print_table(results)
+
+
+def print_table(results):
+    print(f"{'scenario':16} {'count':>6} {'update p50':>11} {'draw p50':>9} {'frame p99':>10} "
+          f"{'live blk':>8} {'alloc KB':>8} {'rss MB':>7}")
+    for name, result in results.items():
+        count = "" if result["count"] is None else result["count"]
+        print(f"{name:16} {count:>6} {result['update_ms']['p50']:11.2f} {result['draw_ms']['p50']:9.2f} "
+              f"{result['frame_ms']['p99']:10.2f} {result['net_live_blocks_per_frame']:8.1f} "
+              f"{result['alloc_peak_kb_per_frame']:8.1f} "
+              f"{result['peak_rss_kb'] / 1024:7.1f}")
+
+
+def compare(args):
+    with open(args.baseline) as source:
+        baseline = json.load(source)["results"]
+    with open(args.current) as source:
+        current = json.load(source)["results"]
+
+    regressions = 0
+    for name, result in current.items():
+        base = baseline.get(name)
+        if base is None or base["count"] != result["count"]:
+            print(f"{name:16} no comparable baseline")
+            continue
+        checks = [(f"{group}.{key}", base[group][key], result[group][key]) for group, key in COMPARED_METRICS]
+        checks.append(("peak_rss_kb", base["peak_rss_kb"], result["peak_rss_kb"]))
+        for metric, old, new in checks:
+            change = (new - old) / old if old else 0.0
+            flag = ""
+            if change > args.threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{name:16} {metric:16} {old:10.2f} -> {new:10.2f} {change:+7.1%}{flag}")
+    if regressions:
+        print(f"{regressions} regression(s) over {args.threshold:.0%}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless frame-time benchmarks for the games")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("scenarios", nargs="*", help="scenario or scenario:N, all by default")
+    run_parser.add_argument("--frames", type=int, default=FRAMES)
+    run_parser.add_argument("--out", default="benchmark.json", help="JSON report, '-' for stdout")
+    run_parser.add_argument("--in-process", action="store_true", help="do not isolate scenarios in subprocesses")
+
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+
+    subparsers.add_parser("list")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args)
+    elif args.command == "compare":
+        compare(args)
+    else:
+        for name, scenario in SCENARIOS.items():
+            print(f"{name:16} scene={scenario.scene}" + ("" if scenario.count is None else f" N={scenario.count}"))
+
+
+if __name__ == "__main__":
+    main()
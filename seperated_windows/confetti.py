@@ -0,0 +1,155 @@
+import arcade
+import numpy as np
+from arcade.gl import BufferDescription
+
+GRAVITY = 0.3
+DRAG_X = 0.995
+
+PLAYER_COLORS = [
+    [(255, 0, 0), (178, 34, 34), (220, 20, 60), (255, 69, 0),
+     (255, 140, 0), (255, 99, 71), (255, 20, 147), (255, 215, 0)],
+    [(0, 0, 255), (0, 0, 139), (65, 105, 225), (70, 130, 180),
+     (100, 149, 237), (30, 144, 255), (138, 43, 226), (0, 255, 255)]
+]
+
+RAIN_COLORS = [
+    [(255, 0, 0), (255, 69, 0), (255, 140, 0), (255, 215, 0)],
+    [(0, 0, 255), (65, 105, 225), (30, 144, 255), (0, 255, 255)]
+]
+
+# x, y, размер, r, g, b, жизнь
+VERTEX_FORMAT = "2f 1f 3f 1f"
+VERTEX_FLOATS = 7
+
+VERTEX_SHADER = """
+#version 330
+
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+
+uniform float pixel_ratio;
+
+in vec2 in_position;
+in float in_size;
+in vec3 in_color;
+in float in_life;
+
+out vec4 v_color;
+
+void main() {
+    gl_Position = window.projection * window.view * vec4(in_position, 0.0, 1.0);
+    gl_PointSize = in_size * 2.0 * pixel_ratio;
+    v_color = vec4(in_color, clamp(in_life, 0.0, 1.0));
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330
+
+in vec4 v_color;
+
+out vec4 fragColor;
+
+void main() {
+    vec2 offset = gl_PointCoord - vec2(0.5);
+    if (dot(offset, offset) > 0.25) {
+        discard;
+    }
+    fragColor = v_color;
+}
+"""
+
+rng = np.random.default_rng()
+
+
+class ConfettiSystem:
+    def __init__(self, capacity=1024):
+        self.count = 0
+        self.capacity = 0
+        self.vertices = None
+        self.velocity = None
+        self.decay = None
+        self.program = None
+        self.buffer = None
+        self.geometry = None
+        self.resize(capacity)
+
+    def resize(self, capacity):
+        vertices = np.zeros((capacity, VERTEX_FLOATS), dtype=np.float32)
+        velocity = np.zeros((capacity, 2), dtype=np.float32)
+        decay = np.zeros(capacity, dtype=np.float32)
+        if self.vertices is not None:
+            vertices[:self.count] = self.vertices[:self.count]
+            velocity[:self.count] = self.velocity[:self.count]
+            decay[:self.count] = self.decay[:self.count]
+        self.vertices = vertices
+        self.velocity = velocity
+        self.decay = decay
+        self.capacity = capacity
+        if self.buffer is not None:
+            self.buffer.orphan(size=self.vertices.nbytes)
+
+    def clear(self):
+        self.count = 0
+
+    def emit(self, x, y, amount, colors):
+        if self.count + amount > self.capacity:
+            self.resize(max(self.capacity * 2, self.count + amount))
+
+        start, end = self.count, self.count + amount
+        palette = np.asarray(colors, dtype=np.float32) / 255
+
+        new = self.vertices[start:end]
+        new[:, 0] = x
+        new[:, 1] = y
+        new[:, 2] = rng.integers(4, 13, amount)
+        new[:, 3:6] = palette[rng.integers(0, len(palette), amount)]
+        new[:, 6] = 1.0
+        self.velocity[start:end, 0] = rng.uniform(-4, 4, amount)
+        self.velocity[start:end, 1] = rng.uniform(4, 12, amount)
+        self.decay[start:end] = rng.uniform(0.005, 0.015, amount)
+        self.count = end
+
+    def update(self):
+        count = self.count
+        if count == 0:
+            return
+
+        vertices = self.vertices[:count]
+        velocity = self.velocity[:count]
+        vertices[:, 0:2] += velocity
+        velocity[:, 1] -= GRAVITY
+        vertices[:, 6] -= self.decay[:count]
+        velocity[:, 0] *= DRAG_X
+
+        alive = vertices[:, 6] > 0
+        if not alive.all():
+            survivors = int(alive.sum())
+            self.vertices[:survivors] = vertices[alive]
+            self.velocity[:survivors] = velocity[alive]
+            self.decay[:survivors] = self.decay[:count][alive]
+            self.count = survivors
+
+    def setup_gl(self, ctx):
+        self.program = ctx.program(vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER)
+        self.buffer = ctx.buffer(reserve=self.vertices.nbytes)
+        self.geometry = ctx.geometry(
+            [BufferDescription(self.buffer, VERTEX_FORMAT, ["in_position", "in_size", "in_color", "in_life"])],
+            mode=ctx.POINTS,
+        )
+
+    def draw(self):
+        if self.count == 0:
+            return
+
+        window = arcade.get_window()
+        ctx = window.ctx
+        if self.program is None:
+            self.setup_gl(ctx)
+
+        self.buffer.write(self.vertices[:self.count])
+        self.program["pixel_ratio"] = window.get_pixel_ratio()
+        with ctx.enabled(ctx.BLEND, ctx.PROGRAM_POINT_SIZE):
+            self.geometry.render(self.program, vertices=self.count)
@@ -1,27 +1,13 @@
-import os
-import sys
 import random
 import arcade
 import math
 from arcade.gui import UIManager, UITextureButton, UIAnchorLayout, UIBoxLayout
+import assets
+import confetti
 import interface
-
-def resource_path(relative_path):
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        assets_path = os.path.join(os.path.dirname(base_path), "Assets")
-        if os.path.exists(assets_path):
-            test_path = os.path.join(os.path.dirname(base_path), relative_path)
-            if os.path.exists(test_path):
-                return test_path
-            test_path = os.path.join(base_path, relative_path)
-            if os.path.exists(test_path):
-                return test_path
-
-    full_path = os.path.join(base_path, relative_path)
-    return full_path
+import replay
+from profiler import profiler
+import scenes
 
 
 CROCO_SCALE = 0.9
@@ -29,38 +15,10 @@ TEETH_SCALE = 0.9
 NUM_TEETH = 9
 
 
-class SimpleConfettiParticle:
-    def __init__(self, x, y, color, player_index):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.size = random.randint(4, 12)
-        self.speed_x = random.uniform(-4, 4)
-        self.speed_y = random.uniform(4, 12)
-        self.gravity = 0.3
-        self.life = 1.0
-        self.decay = random.uniform(0.005, 0.015)
-        self.player_index = player_index
-
-    def update(self):
-        self.x += self.speed_x
-        self.y += self.speed_y
-        self.speed_y -= self.gravity
-        self.life -= self.decay
-        self.speed_x *= 0.995
-        return self.life > 0
-
-    def draw(self):
-        alpha = int(self.life * 255)
-        arcade.draw_circle_filled(self.x, self.y, self.size,
-                                  (self.color[0], self.color[1], self.color[2], alpha))
-
-
 class CrocodileClosed(arcade.Sprite):
     def __init__(self, screen_width, screen_height):
         super().__init__()
-        self.scale = CROCO_SCALE
-        self.texture = arcade.load_texture(resource_path("Assets/images/croco_close.png"))
+        self.texture, self.scale = assets.load_texture_scaled("Assets/images/croco_close.png", CROCO_SCALE)
         self.center_x = screen_width // 2
         self.center_y = screen_height // 2
 
@@ -68,8 +26,7 @@ class CrocodileClosed(arcade.Sprite):
 class CrocodileOpen(arcade.Sprite):
     def __init__(self, screen_width, screen_height):
         super().__init__()
-        self.scale = CROCO_SCALE
-        self.texture = arcade.load_texture(resource_path("Assets/images/croco_open.png"))
+        self.texture, self.scale = assets.load_texture_scaled("Assets/images/croco_open.png", CROCO_SCALE)
         self.center_x = screen_width // 2
         self.center_y = screen_height // 2
 
@@ -77,8 +34,7 @@ class CrocodileOpen(arcade.Sprite):
 class Tooth(arcade.Sprite):
     def __init__(self, x, y, is_bad=False):
         super().__init__()
-        self.scale = TEETH_SCALE
-        self.texture = arcade.load_texture(resource_path("Assets/images/teeth.png"))
+        self.texture, self.scale = assets.load_texture_scaled("Assets/images/teeth.png", TEETH_SCALE)
         self.center_x = x
         self.center_y = y
         self.is_pressed = False
@@ -89,8 +45,7 @@ class Tooth(arcade.Sprite):
 class ToothPressed(arcade.Sprite):
     def __init__(self, x, y, player_index):
         super().__init__()
-        self.scale = TEETH_SCALE
-        self.texture = arcade.load_texture(resource_path("Assets/images/teeth_pressed.png"))
+        self.texture, self.scale = assets.load_texture_scaled("Assets/images/teeth_pressed.png", TEETH_SCALE)
         self.center_x = x
         self.center_y = y
         self.is_pressed = True
@@ -101,7 +56,7 @@ class BlueAngle(arcade.Sprite):
     def __init__(self, screen_width, screen_height):
         super().__init__()
         self.scale = 1
-        self.texture = arcade.load_texture(resource_path("Assets/images/blue_angle.png"))
+        self.texture = assets.load_texture("Assets/images/blue_angle.png")
         self.center_x = screen_width - 70
         self.center_y = screen_height - 70
 
@@ -110,16 +65,17 @@ class RedAngle(arcade.Sprite):
     def __init__(self, screen_width, screen_height):
         super().__init__()
         self.scale = 1
-        self.texture = arcade.load_texture(resource_path("Assets/images/red_angle.png"))
+        self.texture = assets.load_texture("Assets/images/red_angle.png")
         self.center_x = 70
         self.center_y = 70
 
 
-class CrocoGame(arcade.Window):
+class CrocoGame(arcade.View):
     def __init__(self):
-        super().__init__(fullscreen=True, title="Крокодил: Два игрока")
-        arcade.set_background_color(arcade.color.LIGHT_PINK)
+        super().__init__()
 
+        # всё, что решает исход партии, берётся отсюда; сид даёт replay
+        self.rng = random.Random()
         self.manager = None
         self.anchor_layout = None
         self.box_layout = None
@@ -129,50 +85,51 @@ class CrocoGame(arcade.Window):
 
         self.setup_ui()
 
-        self.click_sound = arcade.load_sound(resource_path("Assets/sound/button-dry-clear-close-bright.wav"))
-        self.game_over_sound = arcade.load_sound(":resources:sounds/gameover2.wav")
-        self.confetti_sound = arcade.load_sound(":resources:sounds/upgrade1.wav")
+        self.click_sound = assets.load_sound("Assets/sound/button-dry-clear-close-bright.wav")
+        self.game_over_sound = assets.load_sound(":resources:sounds/gameover2.wav")
+        self.confetti_sound = assets.load_sound(":resources:sounds/upgrade1.wav")
 
         self.highlight_pulse = 0
         self.pulse_speed = 0.05
         self.pulse_direction = 1
 
+        self.confetti = confetti.ConfettiSystem()
+
+    def on_show_view(self):
+        self.window.set_caption("Крокодил: Два игрока")
+        arcade.set_background_color(arcade.color.LIGHT_PINK)
+        self.manager.enable()
         self.setup()
 
+    def on_hide_view(self):
+        if self.background_music_player:
+            arcade.stop_sound(self.background_music_player)
+            self.background_music_player = None
+        self.manager.disable()
+
     def setup_ui(self):
         self.manager = UIManager()
-        self.manager.enable()
         self.anchor_layout = UIAnchorLayout()
         self.box_layout = UIBoxLayout(vertical=False, space_between=30)
         self.anchor_layout.add(self.box_layout)
         self.manager.add(self.anchor_layout)
 
-        menu_button = UITextureButton(
-            texture=arcade.load_texture(resource_path("Assets/images/menu_icon.png")),
-            scale=0.2
-        )
+        menu_texture, menu_scale = assets.load_texture_scaled("Assets/images/menu_icon.png", assets.MENU_ICON_SCALE)
+        menu_button = UITextureButton(texture=menu_texture, scale=menu_scale)
 
         def on_menu_click(event):
-            if self.background_music_player:
-                arcade.stop_sound(self.background_music_player)
-            self.manager.disable()
-            self.close()
-            import interface
-            menu_window = interface.MyGame()
-            arcade.run()
+            self.window.show_scene("menu")
 
         menu_button.on_click = on_menu_click
         self.box_layout.add(menu_button)
 
-        self.again_button = UITextureButton(
-            texture=arcade.load_texture(resource_path("Assets/images/vor.png")),
-            scale=0.8
-        )
+        again_texture, again_scale = assets.load_texture_scaled("Assets/images/vor.png", assets.RESTART_ICON_SCALE)
+        self.again_button = UITextureButton(texture=again_texture, scale=again_scale)
         self.again_button.on_click = self.restart_game
         self.box_layout.add(self.again_button)
 
     def setup(self):
-        screen_width, screen_height = self.get_size()
+        screen_width, screen_height = self.window.get_size()
 
         self.croco_closed = CrocodileClosed(screen_width, screen_height)
         self.croco_open = CrocodileOpen(screen_width, screen_height)
@@ -187,18 +144,19 @@ class CrocoGame(arcade.Window):
         self.angles.append(self.blue_angle)
         self.angles.append(self.red_angle)
 
-        self.confetti_particles = []
+        self.confetti.clear()
         self.confetti_active = False
         self.confetti_spawn_timer = 0
         self.game_over = False
 
-        self.current_player = random.randint(0, 1)
+        self.rng.seed(replay.match_seed())
+        self.current_player = self.rng.randint(0, 1)
 
         self.scores = [0, 0]
         self.pressed_teeth_count = 0
         self.winner_index = None
 
-        self.bad_tooth_index = random.randint(0, NUM_TEETH - 1)
+        self.bad_tooth_index = self.rng.randint(0, NUM_TEETH - 1)
         self.add_teeth(screen_width, screen_height)
 
         self.start_background_music()
@@ -207,12 +165,34 @@ class CrocoGame(arcade.Window):
         if self.background_music_player:
             arcade.stop_sound(self.background_music_player)
 
-        self.background_music = arcade.load_sound(resource_path("Assets/sound/background_crocodile.mp3"))
+        self.background_music = assets.load_sound("Assets/sound/background_crocodile.mp3")
         self.background_music_player = arcade.play_sound(self.background_music, loop=True)
 
     def restart_game(self, event=None):
         self.setup()
 
+    def save_state(self):
+        # Для перемотки воспроизведения: зуб - (x, y, плохой ли, кем нажат или None)
+        teeth = [(tooth.center_x, tooth.center_y, getattr(tooth, "is_bad", False), tooth.pressed_by)
+                 for tooth in self.teeth_list]
+        return (self.rng.getstate(), self.current_player, list(self.scores), self.pressed_teeth_count,
+                self.winner_index, self.bad_tooth_index, self.game_over, self.croco_closed in self.crocodile_list,
+                teeth)
+
+    def load_state(self, state):
+        (rng_state, self.current_player, scores, self.pressed_teeth_count, self.winner_index,
+         self.bad_tooth_index, self.game_over, closed, teeth) = state
+        self.rng.setstate(rng_state)
+        self.scores = list(scores)
+        self.teeth_list.clear()
+        for x, y, is_bad, pressed_by in teeth:
+            self.teeth_list.append(Tooth(x, y, is_bad) if pressed_by is None else ToothPressed(x, y, pressed_by))
+        self.crocodile_list.clear()
+        self.crocodile_list.append(self.croco_closed if closed else self.croco_open)
+        self.confetti.clear()
+        self.confetti_active = self.game_over and self.winner_index is not None
+        self.confetti_spawn_timer = 0
+
     def add_teeth(self, screen_width, screen_height):
         teeth_coordinates = [
             (screen_width // 2 - 160, screen_height // 2 + 33),
@@ -272,57 +252,45 @@ class CrocoGame(arcade.Window):
         self.angles.draw()
         self.teeth_list.draw()
 
-        for particle in self.confetti_particles:
-            particle.draw()
+        with profiler.phase("confetti"):
+            self.confetti.draw()
 
         if self.game_over:
-            self.manager.draw()
+            with profiler.phase("ui"):
+                self.manager.draw()
 
 
     def create_confetti_explosion(self, player_index):
         self.confetti_active = True
         arcade.play_sound(self.confetti_sound, volume=1.0)
 
-        colors = [
-            [(255, 0, 0), (178, 34, 34), (220, 20, 60), (255, 69, 0),
-             (255, 140, 0), (255, 99, 71), (255, 20, 147), (255, 215, 0)],
-            [(0, 0, 255), (0, 0, 139), (65, 105, 225), (70, 130, 180),
-             (100, 149, 237), (30, 144, 255), (138, 43, 226), (0, 255, 255)]
-        ][player_index]
+        colors = confetti.PLAYER_COLORS[player_index]
 
         for _ in range(5):
-            spawn_x = random.randint(100, self.width - 100)
-            spawn_y = random.randint(100, self.height - 100)
-            for _ in range(80):
-                self.confetti_particles.append(SimpleConfettiParticle(
-                    spawn_x, spawn_y, random.choice(colors), player_index
-                ))
+            spawn_x = random.randint(100, self.window.width - 100)
+            spawn_y = random.randint(100, self.window.height - 100)
+            self.confetti.emit(spawn_x, spawn_y, 80, colors)
 
     def update_confetti(self, delta_time):
         if not self.confetti_active:
             return
 
-        self.confetti_particles = [p for p in self.confetti_particles if p.update()]
+        self.confetti.update()
         self.confetti_spawn_timer += delta_time
 
         if self.confetti_spawn_timer > 0.3 and self.winner_index is not None:
             self.confetti_spawn_timer = 0
-            colors = [
-                [(255, 0, 0), (255, 69, 0), (255, 140, 0), (255, 215, 0)],
-                [(0, 0, 255), (65, 105, 225), (30, 144, 255), (0, 255, 255)]
-            ][self.winner_index]
+            colors = confetti.RAIN_COLORS[self.winner_index]
 
             for _ in range(3):
-                spawn_x = random.randint(0, self.width)
-                spawn_y = self.height
-                for _ in range(2):
-                    self.confetti_particles.append(SimpleConfettiParticle(
-                        spawn_x, spawn_y, random.choice(colors), self.winner_index
-                    ))
+                spawn_x = random.randint(0, self.window.width)
+                spawn_y = self.window.height
+                self.confetti.emit(spawn_x, spawn_y, 2, colors)
 
     def on_update(self, delta_time):
         if self.game_over and self.confetti_active:
-            self.update_confetti(delta_time)
+            with profiler.phase("confetti"):
+                self.update_confetti(delta_time)
 
     def on_mouse_press(self, x: int, y: int, button: int, modifiers: int):
         if self.game_over:
@@ -374,8 +342,7 @@ class CrocoGame(arcade.Window):
 
 
 def main():
-    game = CrocoGame()
-    arcade.run()
+    scenes.run("croco")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,177 @@
+import arcade
+import numpy as np
+from arcade.gl import BufferDescription
+from PIL import Image
+
+EXPLOSION_CAPACITY = 8192
+# FadeParticle сдвигается на change_xy за кадр, в шейдере время в секундах
+FRAME_RATE = 60.0
+
+# центр xy, скорость xy, размер wh, uv (u0, v0, u1, v1), рождение, время жизни, альфа (старт, конец)
+INSTANCE_FORMAT = "2f 2f 2f 4f 1f 1f 2f"
+INSTANCE_ATTRIBUTES = ["in_origin", "in_velocity", "in_size", "in_uv", "in_birth", "in_lifetime", "in_alpha"]
+INSTANCE_FLOATS = 14
+# столбцы in_birth и in_lifetime в строке экземпляра
+BIRTH_COLUMN = 10
+LIFETIME_COLUMN = 11
+
+VERTEX_SHADER = """
+#version 330
+
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+
+uniform float time;
+uniform float frame_rate;
+
+in vec2 in_corner;
+in vec2 in_origin;
+in vec2 in_velocity;
+in vec2 in_size;
+in vec4 in_uv;
+in float in_birth;
+in float in_lifetime;
+in vec2 in_alpha;
+
+out vec2 v_uv;
+out float v_alpha;
+
+void main() {
+    float age = time - in_birth;
+    float progress = age / in_lifetime;
+    if (age < 0.0 || progress >= 1.0) {
+        gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+        v_uv = vec2(0.0);
+        v_alpha = 0.0;
+        return;
+    }
+    vec2 position = in_origin + in_velocity * age * frame_rate + in_corner * in_size;
+    gl_Position = window.projection * window.view * vec4(position, 0.0, 1.0);
+    v_uv = mix(in_uv.xy, in_uv.zw, in_corner + 0.5);
+    v_alpha = mix(in_alpha.x, in_alpha.y, progress) / 255.0;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330
+
+uniform sampler2D frames;
+
+in vec2 v_uv;
+in float v_alpha;
+
+out vec4 fragColor;
+
+void main() {
+    vec4 color = texture(frames, v_uv);
+    fragColor = vec4(color.rgb, color.a * v_alpha);
+}
+"""
+
+rng = np.random.default_rng()
+
+
+class GpuExplosions:
+    def __init__(self, textures, capacity=EXPLOSION_CAPACITY):
+        self.textures = textures
+        self.capacity = capacity
+        self.cursor = 0
+        # сколько слотов с начала буфера уже записано; остальные рисовать незачем
+        self.written = 0
+        self.time = 0.0
+        self.alive_until = 0.0
+        self.program = None
+        self.frames = None
+        self.geometry = None
+        self.instance_buffer = None
+        self.frame_sizes = None
+        self.frame_uvs = None
+
+    def setup_gl(self, ctx):
+        # Все кадры взрыва в одну полосу, чтобы рисовать одним вызовом
+        cell_width = max(texture.width for texture in self.textures)
+        cell_height = max(texture.height for texture in self.textures)
+        strip_width = cell_width * len(self.textures)
+        strip = Image.new("RGBA", (strip_width, cell_height), (0, 0, 0, 0))
+        uvs = []
+        for index, texture in enumerate(self.textures):
+            strip.paste(texture.image.convert("RGBA"), (index * cell_width, 0))
+            u0 = index * cell_width / strip_width
+            uvs.append((u0, 1 - texture.height / cell_height, u0 + texture.width / strip_width, 1.0))
+        strip = strip.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+
+        self.frames = ctx.texture(strip.size, components=4, data=strip.tobytes())
+        self.frame_sizes = np.array([(texture.width, texture.height) for texture in self.textures], dtype=np.float32)
+        self.frame_uvs = np.array(uvs, dtype=np.float32)
+
+        self.program = ctx.program(vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER)
+        self.program["frames"] = 0
+        self.program["frame_rate"] = FRAME_RATE
+
+        corners = np.array([-0.5, -0.5, 0.5, -0.5, -0.5, 0.5, 0.5, 0.5], dtype=np.float32)
+        corner_buffer = ctx.buffer(data=corners)
+
+        empty = np.zeros((self.capacity, INSTANCE_FLOATS), dtype=np.float32)
+        # пустые слоты родились давно и с ненулевой жизнью, чтобы шейдер их отбросил, а не делил 0/0
+        empty[:, BIRTH_COLUMN] = -1.0e6
+        empty[:, LIFETIME_COLUMN] = 1.0
+        self.instance_buffer = ctx.buffer(data=empty)
+
+        self.geometry = ctx.geometry(
+            [
+                BufferDescription(corner_buffer, "2f", ["in_corner"]),
+                BufferDescription(self.instance_buffer, INSTANCE_FORMAT, INSTANCE_ATTRIBUTES, instanced=True),
+            ],
+            mode=ctx.TRIANGLE_STRIP,
+        )
+
+    def emit(self, x, y, count, lifetime=(0.5, 1.5), start_alpha=255, end_alpha=0,
+             scale=(0.35, 0.8), speed=9.0):
+        if self.program is None:
+            self.setup_gl(arcade.get_window().ctx)
+        count = min(count, self.capacity)
+
+        # Равномерно внутри круга, как arcade.math.rand_in_circle
+        radius = speed * np.sqrt(rng.random(count))
+        angle = rng.uniform(0, 2 * np.pi, count)
+        frame = rng.integers(0, len(self.textures), count)
+        particle_scale = rng.uniform(scale[0], scale[1], count)[:, None]
+        particle_lifetime = rng.uniform(lifetime[0], lifetime[1], count)
+
+        data = np.empty((count, INSTANCE_FLOATS), dtype=np.float32)
+        data[:, 0] = x
+        data[:, 1] = y
+        data[:, 2] = radius * np.cos(angle)
+        data[:, 3] = radius * np.sin(angle)
+        data[:, 4:6] = self.frame_sizes[frame] * particle_scale
+        data[:, 6:10] = self.frame_uvs[frame]
+        data[:, BIRTH_COLUMN] = self.time
+        data[:, LIFETIME_COLUMN] = particle_lifetime
+        data[:, 12] = start_alpha
+        data[:, 13] = end_alpha
+
+        # Кольцевой буфер: самые старые частицы перезаписываются
+        stride = INSTANCE_FLOATS * 4
+        first = min(count, self.capacity - self.cursor)
+        self.instance_buffer.write(data[:first], offset=self.cursor * stride)
+        if first < count:
+            self.instance_buffer.write(data[first:], offset=0)
+            self.written = self.capacity
+        else:
+            self.written = max(self.written, self.cursor + count)
+        self.cursor = (self.cursor + count) % self.capacity
+        self.alive_until = max(self.alive_until, self.time + lifetime[1])
+
+    def update(self, delta_time):
+        self.time += delta_time
+
+    def draw(self):
+        if self.program is None or self.time > self.alive_until:
+            return
+        ctx = self.program.ctx
+        self.program["time"] = self.time
+        self.frames.use(0)
+        with ctx.enabled(ctx.BLEND):
+            self.geometry.render(self.program, instances=self.written)
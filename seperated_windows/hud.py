@@ -0,0 +1,47 @@
+import string
+
+import arcade
+
+DIGITS = string.digits
+LATIN = string.ascii_letters + string.digits + string.punctuation + " "
+CYRILLIC = "АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯабвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+ARROWS = "←→↑↓"
+
+
+class Hud:
+    # Тексты живут всё время сцены: arcade.Text пересчитывает раскладку,
+    # только когда меняется строка, в отличие от draw_text на каждом кадре
+    def __init__(self):
+        self.texts = {}
+        self.charsets = {}
+        self.warm_texts = []
+
+    def add(self, name, text, x, y, color=arcade.color.WHITE, font_size=12, charset=LATIN, **kwargs):
+        label = arcade.Text(text, x, y, color, font_size, **kwargs)
+        self.texts[name] = label
+        font = (kwargs.get("font_name", ("calibri", "arial")), font_size,
+                kwargs.get("bold", False), kwargs.get("italic", False))
+        self.charsets[font] = self.charsets.get(font, "") + charset + text
+        return label
+
+    def __getitem__(self, name):
+        return self.texts[name]
+
+    def set(self, name, value):
+        label = self.texts[name]
+        value = str(value)
+        if label.text != value:
+            label.text = value
+        return label
+
+    def prewarm(self):
+        # Все глифы каждого шрифта растеризуются заранее, а не на первом кадре, где они появятся
+        for (font_name, font_size, bold, italic), charset in self.charsets.items():
+            glyphs = "".join(sorted(set(charset)))
+            self.warm_texts.append(arcade.Text(glyphs, 0, 0, font_size=font_size, font_name=font_name,
+                                               bold=bold, italic=italic))
+        self.charsets.clear()
+
+    def draw(self, *names):
+        for name in names:
+            self.texts[name].draw()
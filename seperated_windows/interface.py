@@ -3,43 +3,33 @@ import random
 import math
 from arcade.gui import UIManager, UITextureButton, UILabel
 from arcade.gui.widgets.layout import UIAnchorLayout, UIBoxLayout
-from arcade.particles import FadeParticle, Emitter, EmitBurst
-import os
-import sys
+import assets
+import explosions
+from profiler import profiler
+import scenes
+from prefetch import prefetcher
+
+# Общий счёт побед за сессию
+count_of_red = 0
+count_of_blue = 0
 
 OBJECT_SPEED = 5
 CAR_SCALE = 1.25
 BUFFER_DISTANCE = 50
 
-
-def resource_path(relative_path):
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        assets_path = os.path.join(os.path.dirname(base_path), "Assets")
-        if os.path.exists(assets_path):
-            test_path = os.path.join(os.path.dirname(base_path), relative_path)
-            if os.path.exists(test_path):
-                return test_path
-            test_path = os.path.join(base_path, relative_path)
-            if os.path.exists(test_path):
-                return test_path
-
-    full_path = os.path.join(base_path, relative_path)
-    return full_path
+CAR_TEXTURES = [
+    "Assets/images/car_red_tires.png",
+    "Assets/images/tank_red.png",
+    "Assets/images/tank_blue.png",
+    "Assets/images/car_cyan_tires.png"
+]
 
 
 class Car(arcade.Sprite):
     def __init__(self):
         super().__init__()
         self.scale = CAR_SCALE
-        self.texture = random.choice([
-            arcade.load_texture(resource_path("Assets/images/car_red_tires.png")),
-            arcade.load_texture(resource_path("Assets/images/tank_red.png")),
-            arcade.load_texture(resource_path("Assets/images/tank_blue.png")),
-            arcade.load_texture(resource_path("Assets/images/car_cyan_tires.png"))
-        ])
+        self.texture = assets.load_texture(random.choice(CAR_TEXTURES))
         self.spawn_outside_screen()
         self.set_direction()
 
@@ -85,24 +75,22 @@ class Car(arcade.Sprite):
         self.center_y += self.change_y
 
 
-class MyGame(arcade.Window):
+class MyGame(arcade.View):
     def __init__(self):
-        super().__init__(fullscreen=True)
-        arcade.set_background_color(arcade.color.LIGHT_GRAY)
+        super().__init__()
 
         self.current_sprites = None
-        self.explosion_emitters = []
         self.explosion_textures = [
-            arcade.load_texture(resource_path("Assets/images/explosion1.png")),
-            arcade.load_texture(resource_path("Assets/images/explosion2.png")),
-            arcade.load_texture(resource_path("Assets/images/explosion3.png"))
+            assets.load_texture("Assets/images/explosion1.png"),
+            assets.load_texture("Assets/images/explosion2.png"),
+            assets.load_texture("Assets/images/explosion3.png")
         ]
+        self.explosions = explosions.GpuExplosions(self.explosion_textures)
 
         self.background_music_player = None
-        self.closing = False
+        self.game_buttons = {}
 
         self.manager = UIManager()
-        self.manager.enable()
 
         self.main_horizontal = UIBoxLayout(vertical=False, space_between=40, padding=(20, 20, 20, 20))
 
@@ -129,13 +117,22 @@ class MyGame(arcade.Window):
 
         self.manager.add(self.anchor_layout)
 
+    def on_show_view(self):
+        self.window.set_caption(scenes.WINDOW_TITLE)
+        arcade.set_background_color(arcade.color.LIGHT_GRAY)
+        self.manager.enable()
         self.start_background_music()
+        prefetcher.request_all()
+
+    def on_hide_view(self):
+        self.stop_background_music()
+        self.manager.disable()
 
     def start_background_music(self):
         if self.background_music_player:
             arcade.stop_sound(self.background_music_player)
 
-        music = arcade.load_sound(resource_path("Assets/sound/background_menu.wav"))
+        music = assets.load_sound("Assets/sound/background_menu.wav")
         self.background_music_player = arcade.play_sound(music, loop=True)
 
     def stop_background_music(self):
@@ -153,14 +150,12 @@ class MyGame(arcade.Window):
         )
         self.box_layout1.add(info_label_red)
 
-        press_blue = UITextureButton(
-            texture=arcade.load_texture(resource_path("Assets/images/wasd.png")),
-            scale=0.8
-        )
+        press_blue_texture, press_blue_scale = assets.load_texture_scaled("Assets/images/wasd.png", 0.8)
+        press_blue = UITextureButton(texture=press_blue_texture, scale=press_blue_scale)
         self.box_layout1.add(press_blue)
 
         player_red = UITextureButton(
-            texture=arcade.load_texture(resource_path("Assets/images/red_player.png"))
+            texture=assets.load_texture("Assets/images/red_player.png")
         )
         self.box_layout1.add(player_red)
 
@@ -177,57 +172,47 @@ class MyGame(arcade.Window):
         self.hor_andrew_layout = UIBoxLayout(vertical=False, space_between=80)
         self.box_layout2.add(self.hor_andrew_layout)
 
-        texture_snakes = arcade.load_texture(resource_path("Assets/images/snakes.png"))
-        snakes_button = UITextureButton(texture=texture_snakes, scale=0.27)
+        texture_snakes, snakes_scale = assets.load_texture_scaled("Assets/images/snakes.png", 0.27)
+        snakes_button = UITextureButton(texture=texture_snakes, scale=snakes_scale)
         self.hor_andrew_layout.add(snakes_button)
 
         def on_snakes_click(event):
-            self.stop_background_music()
-            self.manager.disable()
-            self.closing = True
-            self.close()
-            import snakes_battle
-            game = snakes_battle.SnakeBattle()
-            arcade.run()
+            self.window.show_scene("snakes")
 
+        self.game_buttons["snakes"] = snakes_button
         snakes_button.on_click = on_snakes_click
         self.hor_andrew_layout.add(snakes_button)
 
-        texture_tanks = arcade.load_texture(resource_path("Assets/images/tanks.png"))
-        tanks_button = UITextureButton(texture=texture_tanks, scale=0.8)
+        texture_tanks, tanks_scale = assets.load_texture_scaled("Assets/images/tanks.png", 0.8)
+        tanks_button = UITextureButton(texture=texture_tanks, scale=tanks_scale)
+
+        def on_tanks_click(event):
+            self.window.show_scene("tanks")
+
+        self.game_buttons["tanks"] = tanks_button
+        tanks_button.on_click = on_tanks_click
         self.hor_andrew_layout.add(tanks_button)
 
         self.hor_anna_layout = UIBoxLayout(vertical=False, space_between=80)
         self.box_layout2.add(self.hor_anna_layout)
 
-        texture_crocodile = arcade.load_texture(resource_path("Assets/images/crocodile.png"))
-        crocodile_button = UITextureButton(texture=texture_crocodile, scale=0.8)
+        texture_crocodile, crocodile_scale = assets.load_texture_scaled("Assets/images/crocodile.png", 0.8)
+        crocodile_button = UITextureButton(texture=texture_crocodile, scale=crocodile_scale)
 
         def on_crocodile_click(event):
-            self.stop_background_music()
-            self.manager.disable()
-            self.closing = True
-            self.close()
-            import croco_game
-            game = croco_game.CrocoGame()
-            arcade.run()
+            self.window.show_scene("croco")
 
+        self.game_buttons["croco"] = crocodile_button
         crocodile_button.on_click = on_crocodile_click
         self.hor_anna_layout.add(crocodile_button)
 
-        texture_race = arcade.load_texture(resource_path("Assets/images/race.png"))
-        race_button = UITextureButton(texture=texture_race, scale=0.8)
+        texture_race, race_scale = assets.load_texture_scaled("Assets/images/race.png", 0.8)
+        race_button = UITextureButton(texture=texture_race, scale=race_scale)
 
         def on_race_click(event):
-            self.stop_background_music()
-            self.manager.disable()
-            self.closing = True
-            self.close()
-            import races_game
-            game = races_game.Races()
-            game.setup()
-            arcade.run()
+            self.window.show_scene("races")
 
+        self.game_buttons["races"] = race_button
         race_button.on_click = on_race_click
         self.hor_anna_layout.add(race_button)
 
@@ -240,55 +225,41 @@ class MyGame(arcade.Window):
         )
         self.box_layout3.add(info_label_blue)
 
-        press_red = UITextureButton(
-            texture=arcade.load_texture(resource_path("Assets/images/strelochki.png")),
-            scale=0.8
-        )
+        press_red_texture, press_red_scale = assets.load_texture_scaled("Assets/images/strelochki.png", 0.8)
+        press_red = UITextureButton(texture=press_red_texture, scale=press_red_scale)
         self.box_layout3.add(press_red)
 
         player_blue = UITextureButton(
-            texture=arcade.load_texture(resource_path("Assets/images/blue_player.png"))
+            texture=assets.load_texture("Assets/images/blue_player.png")
         )
         self.box_layout3.add(player_blue)
 
     def make_explosion(self, x, y, count=80):
-        return Emitter(
-            center_xy=(x, y),
-            emit_controller=EmitBurst(count),
-            particle_factory=lambda emitter: FadeParticle(
-                filename_or_texture=random.choice(self.explosion_textures),
-                change_xy=arcade.math.rand_in_circle((0.0, 0.0), 9.0),
-                lifetime=random.uniform(0.5, 1.5),
-                start_alpha=255,
-                end_alpha=0,
-                scale=random.uniform(0.35, 0.8),
-            ),
+        self.explosions.emit(
+            x, y, count,
+            lifetime=(0.5, 1.5),
+            start_alpha=255,
+            end_alpha=0,
+            scale=(0.35, 0.8),
+            speed=9.0,
         )
 
     def on_draw(self):
-        if self.closing:
-            return
         self.clear()
         self.current_sprites.draw()
-        for emitter in self.explosion_emitters:
-            emitter.draw()
+        with profiler.phase("explosions"):
+            self.explosions.draw()
 
-        self.manager.draw()
+        with profiler.phase("ui"):
+            self.manager.draw()
 
     def on_update(self, delta_time):
-        if self.closing:
-            return
+        with profiler.phase("prefetch"):
+            prefetcher.pump()
 
         self.current_sprites.update(delta_time)
 
-        explosions_to_remove = []
-        for i, emitter in enumerate(self.explosion_emitters):
-            emitter.update(delta_time)
-            if emitter.can_reap():
-                explosions_to_remove.append(i)
-
-        for index in sorted(explosions_to_remove, reverse=True):
-            del self.explosion_emitters[index]
+        self.explosions.update(delta_time)
 
         sprites_to_remove = []
         for sprite in self.current_sprites:
@@ -302,24 +273,41 @@ class MyGame(arcade.Window):
             new_car = Car()
             self.current_sprites.append(new_car)
 
+    def save_state(self):
+        # Для перемотки воспроизведения: машинки взрываются по клику, так что их положение важно
+        return [(car.texture, car.center_x, car.center_y, car.change_x, car.change_y, car.angle)
+                for car in self.current_sprites]
+
+    def load_state(self, state):
+        # Car() тратит random, но генераторы после загрузки восстанавливает сам Player
+        self.current_sprites.clear()
+        for texture, x, y, change_x, change_y, angle in state:
+            car = Car()
+            car.texture = texture
+            car.center_x, car.center_y = x, y
+            car.change_x, car.change_y = change_x, change_y
+            car.angle = angle
+            self.current_sprites.append(car)
+
+    def on_mouse_motion(self, x, y, dx, dy):
+        for scene, game_button in self.game_buttons.items():
+            if game_button.rect.point_in_rect((x, y)):
+                prefetcher.prioritize(scene)
+
     def on_mouse_press(self, x, y, button, modifiers):
-        if self.closing:
-            return
         if button == arcade.MOUSE_BUTTON_LEFT:
             clicked_sprites = arcade.get_sprites_at_point((x, y), self.current_sprites)
             for car in clicked_sprites:
-                explosion = self.make_explosion(car.center_x, car.center_y, count=50)
-                self.explosion_emitters.append(explosion)
+                self.make_explosion(car.center_x, car.center_y, count=50)
 
                 for _ in range(3):
                     offset_x = random.uniform(-30, 30)
                     offset_y = random.uniform(-30, 30)
-                    small_explosion = self.make_explosion(
+                    self.make_explosion(
                         car.center_x + offset_x,
                         car.center_y + offset_y,
                         count=30
                     )
-                    self.explosion_emitters.append(small_explosion)
 
                 car.remove_from_sprite_lists()
 
@@ -331,8 +319,7 @@ class MyGame(arcade.Window):
 
 
 def main():
-    game = MyGame()
-    arcade.run()
+    scenes.run("menu")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+from arcade.gl import BufferDescription
+from pyglet.math import Mat4
+
+# Сколько кусков держать сверх видимых прямо сейчас, в разах: запас на разворот камеры
+CHUNK_SLACK = 2
+
+VERTEX_SHADER = """
+#version 330
+
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+
+// x, y, ширина, высота в мировых координатах
+uniform vec4 rect;
+
+in vec2 in_corner;
+
+out vec2 v_uv;
+
+void main() {
+    gl_Position = window.projection * window.view * vec4(rect.xy + in_corner * rect.zw, 0.0, 1.0);
+    v_uv = in_corner;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330
+
+uniform sampler2D layer;
+
+in vec2 v_uv;
+
+out vec4 fragColor;
+
+void main() {
+    fragColor = texture(layer, v_uv);
+}
+"""
+
+
+class ChunkPool:
+    # Запечённые куски всех слоёв всех карт в одном LRU: бюджет в кусках задаёт сцена
+    # по тому, сколько их видят её камеры, так что память не растёт с размером карты
+    def __init__(self):
+        # (слой, столбец, строка) -> текстура, в порядке последнего показа
+        self.chunks = OrderedDict()
+        self.budget = 0
+
+    def get(self, key):
+        texture = self.chunks.get(key)
+        if texture is not None:
+            self.chunks.move_to_end(key)
+        return texture
+
+    def put(self, key, texture):
+        self.chunks[key] = texture
+
+    def evict(self, keep):
+        while len(self.chunks) > self.budget:
+            key = next(iter(self.chunks))
+            if key in keep:
+                break
+            self.chunks.pop(key).delete()
+
+    def drop(self, layer):
+        for key in [key for key in self.chunks if key[0] is layer]:
+            self.chunks.pop(key).delete()
+
+    def stats(self):
+        return {
+            "chunks": len(self.chunks),
+            "budget": self.budget,
+            "bytes": sum(texture.width * texture.height * 4 for texture in self.chunks.values()),
+        }
+
+
+chunk_pool = ChunkPool()
+
+
+class BakedLayer:
+    # Статичные слои, запечённые в текстуры кусками chunk_width x chunk_height:
+    # кусок печётся, когда впервые попал в кадр, и кадр стоит по кваду на видимый кусок,
+    # сколько бы тайлов ни было на карте. build(x, y, width, height) отдаёт списки спрайтов куска.
+    # Куски - целые пиксели мира, а выборка NEAREST без повтора: при целой позиции камеры
+    # тексел ложится ровно на пиксель экрана и на стыках кусков нет швов
+    def __init__(self, ctx, build, width, height, chunk_width, chunk_height, pixel_ratio=1.0):
+        self.ctx = ctx
+        self.build = build
+        self.width = width
+        self.height = height
+        self.chunk_width = max(1, math.floor(chunk_width))
+        self.chunk_height = max(1, math.floor(chunk_height))
+        self.pixel_ratio = pixel_ratio
+        self.columns = max(1, math.ceil(width / self.chunk_width))
+        self.rows = max(1, math.ceil(height / self.chunk_height))
+
+        self.program = ctx.program(vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER)
+        self.program["layer"] = 0
+        corners = np.array([0, 0, 1, 0, 0, 1, 1, 1], dtype=np.float32)
+        self.geometry = ctx.geometry([BufferDescription(ctx.buffer(data=corners), "2f", ["in_corner"])],
+                                     mode=ctx.TRIANGLE_STRIP)
+
+    def chunk_rect(self, col, row):
+        # последний кусок добивается до целого пикселя; лишнее в нём прозрачно
+        x, y = col * self.chunk_width, row * self.chunk_height
+        return (x, y, min(self.chunk_width, math.ceil(self.width - x)),
+                min(self.chunk_height, math.ceil(self.height - y)))
+
+    def visible(self, left, bottom, right, top):
+        first_col = max(0, int(left // self.chunk_width))
+        last_col = min(self.columns - 1, int(right // self.chunk_width))
+        first_row = max(0, int(bottom // self.chunk_height))
+        last_row = min(self.rows - 1, int(top // self.chunk_height))
+        return [(self, col, row) for row in range(first_row, last_row + 1) for col in range(first_col, last_col + 1)]
+
+    def chunks_for_view(self, view_width, view_height):
+        # Сколько кусков может задеть окно такого размера в худшем положении
+        return ((min(self.columns, math.ceil(view_width / self.chunk_width) + 1))
+                * min(self.rows, math.ceil(view_height / self.chunk_height) + 1))
+
+    def bake(self, col, row):
+        ctx = self.ctx
+        x, y, width, height = self.chunk_rect(col, row)
+        size = max(1, math.ceil(width * self.pixel_ratio)), max(1, math.ceil(height * self.pixel_ratio))
+        texture = ctx.texture(size, components=4, wrap_x=ctx.CLAMP_TO_EDGE, wrap_y=ctx.CLAMP_TO_EDGE,
+                              filter=(ctx.NEAREST, ctx.NEAREST))
+        framebuffer = ctx.framebuffer(color_attachments=[texture])
+        projection, view, blend = ctx.projection_matrix, ctx.view_matrix, ctx.blend_func
+        # Цвет копится premultiplied, альфа - как есть; квад потом кладётся с BLEND_PREMULTIPLIED_ALPHA,
+        # поэтому полупрозрачные края тайлов не темнеют
+        bake_blend = ctx.SRC_ALPHA, ctx.ONE_MINUS_SRC_ALPHA, ctx.ONE, ctx.ONE_MINUS_SRC_ALPHA
+        with framebuffer.activate():
+            framebuffer.clear(color=(0, 0, 0, 0))
+            ctx.projection_matrix = Mat4.orthogonal_projection(x, x + width, y, y + height, -100, 100)
+            ctx.view_matrix = Mat4()
+            for sprite_list in self.build(x, y, width, height):
+                sprite_list.draw(blend_function=bake_blend)
+        ctx.projection_matrix, ctx.view_matrix, ctx.blend_func = projection, view, blend
+        framebuffer.delete()
+        return texture
+
+    def chunk(self, key):
+        texture = chunk_pool.get(key)
+        if texture is None:
+            texture = self.bake(key[1], key[2])
+            chunk_pool.put(key, texture)
+        return texture
+
+    def prepare(self, left, bottom, right, top):
+        # Заранее печёт куски прямоугольника, например пока идёт отсчёт перед стартом
+        for key in self.visible(left, bottom, right, top):
+            self.chunk(key)
+
+    def draw(self, left, bottom, right, top):
+        # Рисует куски, задевающие видимый прямоугольник мира
+        ctx = self.ctx
+        drawn = self.visible(left, bottom, right, top)
+        with ctx.enabled(ctx.BLEND):
+            ctx.blend_func = ctx.BLEND_PREMULTIPLIED_ALPHA
+            for key in drawn:
+                texture = self.chunk(key)
+                self.program["rect"] = self.chunk_rect(key[1], key[2])
+                texture.use(0)
+                self.geometry.render(self.program)
+            ctx.blend_func = ctx.BLEND_DEFAULT
+        chunk_pool.evict(set(drawn))
+
+    def release(self):
+        chunk_pool.drop(self)
@@ -0,0 +1,208 @@
+import functools
+import heapq
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import arcade
+
+import assets
+
+PREFETCH_WORKERS = 2
+UPLOADS_PER_FRAME = 2
+
+PRIORITY_HOVER = 0
+PRIORITY_NORMAL = 1
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+@functools.lru_cache(maxsize=None)
+def scene_assets():
+    # Что понадобится каждой сцене сразу после перехода;
+    # (путь, масштаб) - текстура, которую сцена грузит уменьшенной.
+    # Масштабы берутся из самих сцен, иначе ключ кэша разойдётся с тем, что сцена попросит.
+    # Импорт здесь, а не наверху модуля: сцены импортируют interface, а он - prefetch
+    import croco_game
+    import races_game
+
+    buttons = [
+        ("Assets/images/menu_icon.png", assets.MENU_ICON_SCALE),
+        ("Assets/images/vor.png", assets.RESTART_ICON_SCALE),
+    ]
+    return {
+        "snakes": [
+            "Assets/images/snakes_menu_bg.png",
+            "Assets/sound/snake_sounds/eat.wav",
+            "Assets/sound/snake_sounds/snake_music.mp3",
+            "Assets/sound/snake_sounds/over_sound.mp3",
+        ],
+        "tanks": [
+            "Assets/images/tank_red.png",
+            "Assets/images/tank_blue.png",
+            "Assets/images/place_of_tanks.png",
+            *buttons,
+            ":resources:/images/topdown_tanks/tankRed_barrel1.png",
+            ":resources:/images/topdown_tanks/tankBlue_barrel1.png",
+        ],
+        "croco": [
+            ("Assets/images/croco_close.png", croco_game.CROCO_SCALE),
+            ("Assets/images/croco_open.png", croco_game.CROCO_SCALE),
+            ("Assets/images/teeth.png", croco_game.TEETH_SCALE),
+            ("Assets/images/teeth_pressed.png", croco_game.TEETH_SCALE),
+            "Assets/images/blue_angle.png",
+            "Assets/images/red_angle.png",
+            *buttons,
+            "Assets/sound/button-dry-clear-close-bright.wav",
+            "Assets/sound/background_crocodile.mp3",
+            ":resources:sounds/gameover2.wav",
+            ":resources:sounds/upgrade1.wav",
+        ],
+        "races": [
+            *[(path, races_game.CARS_SCALE) for path in races_game.CAR_TEXTURES],
+            "Assets/images/blue_angle.png",
+            "Assets/images/red_angle.png",
+            *buttons,
+            "Assets/sound/start_car.wav",
+            "Assets/sound/drive_car.wav",
+            "Assets/sound/finish.wav",
+            "Assets/sound/win.wav",
+            ":resources:sounds/upgrade1.wav",
+        ],
+    }
+
+
+class AssetPrefetcher:
+    def __init__(self, workers=PREFETCH_WORKERS):
+        self.workers = workers
+        self.executor = None
+        self.lock = threading.Lock()
+        self.heap = []
+        self.counter = itertools.count()
+        self.pending = {}
+        self.done = set()
+        # взятые потоками, но ещё не готовые: повторный запрос их не ставит в очередь
+        self.in_flight = set()
+        self.active_workers = 0
+        self.ready = deque()
+        self.bytes_loaded = 0
+        self.failed = []
+
+    def request_scene(self, scene, priority=PRIORITY_NORMAL):
+        with self.lock:
+            for entry in scene_assets().get(scene, []):
+                if entry in self.done or entry in self.in_flight or self.pending.get(entry, priority + 1) <= priority:
+                    continue
+                key = assets.resolve_path(entry) if isinstance(entry, str) else None
+                if key in assets.texture_cache or key in assets.sound_cache:
+                    self.done.add(entry)
+                    continue
+                self.pending[entry] = priority
+                heapq.heappush(self.heap, (priority, next(self.counter), entry))
+        self.start_workers()
+
+    def request_all(self):
+        for scene in scene_assets():
+            self.request_scene(scene)
+
+    def prioritize(self, scene):
+        self.request_scene(scene, PRIORITY_HOVER)
+
+    def start_workers(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch")
+        with self.lock:
+            missing = min(self.workers, len(self.pending)) - self.active_workers
+            self.active_workers += max(0, missing)
+        for _ in range(missing):
+            self.executor.submit(self.work)
+
+    def next_entry(self):
+        with self.lock:
+            while self.heap:
+                priority, _, entry = heapq.heappop(self.heap)
+                # устаревшая запись после повышения приоритета
+                if self.pending.get(entry) != priority:
+                    continue
+                del self.pending[entry]
+                self.in_flight.add(entry)
+                return entry
+            self.active_workers -= 1
+            return None
+
+    def work(self):
+        while True:
+            entry = self.next_entry()
+            if entry is None:
+                return
+            try:
+                self.load(entry)
+            except Exception as error:
+                self.failed.append((entry, error))
+            finally:
+                with self.lock:
+                    self.in_flight.discard(entry)
+                    self.done.add(entry)
+
+    def load(self, entry):
+        if isinstance(entry, tuple):
+            self.load_scaled(*entry)
+            return
+
+        path = entry
+        key = assets.resolve_path(path)
+        size = assets.asset_size(path)
+
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            texture = arcade.Texture(assets.decode_image(path), hash=key)
+            texture.hit_box_points
+            self.ready.append((key, texture))
+        else:
+            assets.sound_cache[key] = assets.decode_sound(path)
+
+        with self.lock:
+            self.bytes_loaded += size
+
+    def load_scaled(self, path, scale):
+        size = assets.scaled_size(path, scale)
+        if size is None:
+            self.load(path)
+            return
+        key = assets.scaled_key(path, size)
+        texture = arcade.Texture(assets.decode_scaled_image(path, size), hash=key)
+        texture.hit_box_points
+        self.ready.append((key, texture))
+        with self.lock:
+            self.bytes_loaded += assets.asset_size(path)
+
+    def pump(self, max_uploads=UPLOADS_PER_FRAME):
+        # Загрузка в GL только из главного потока и понемногу за кадр
+        atlas = arcade.get_window().ctx.default_atlas
+        for _ in range(min(max_uploads, len(self.ready))):
+            key, texture = self.ready.popleft()
+            if key in assets.texture_cache:
+                continue
+            atlas.add(texture)
+            assets.texture_cache.put(key, texture)
+
+    def queue_depth(self):
+        with self.lock:
+            return len(self.pending) + len(self.in_flight) + len(self.ready)
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth(),
+            "bytes_loaded": self.bytes_loaded,
+            "failed": len(self.failed),
+        }
+
+    def shutdown(self):
+        with self.lock:
+            self.heap.clear()
+            self.pending.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+
+prefetcher = AssetPrefetcher()
@@ -0,0 +1,228 @@
+import csv
+import os
+import time
+from collections import deque
+
+import arcade
+from arcade.gl import Geometry
+
+import hud
+
+TOGGLE_KEY = arcade.key.F3
+DUMP_KEY = arcade.key.F4
+HISTORY_SECONDS = 10
+HISTORY_FRAMES = 60 * HISTORY_SECONDS
+GRAPH_FRAMES = 240
+AVERAGE_FRAMES = 60
+# GPU-запросы читаются с отставанием на столько кадров, чтобы не ждать видеокарту
+GPU_QUERY_LAG = 3
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+GRAPH_WIDTH = 480
+GRAPH_HEIGHT = 120
+GRAPH_MS = 33.3
+MARGIN = 10
+BUDGET_MS = 1000 / 60
+
+
+class Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter() if self.profiler.enabled else None
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            self.profiler.add(self.name, time.perf_counter() - self.start)
+            self.start = None
+
+
+class FrameProfiler:
+    # Выключенный профайлер стоит одну проверку флага на фазу и на событие окна;
+    # подмена Geometry.render и SpriteList.draw ставится только на время включения
+    def __init__(self):
+        self.enabled = False
+        self.phases = {}
+        self.phase_names = []
+        self.current = {}
+        self.history = deque(maxlen=HISTORY_FRAMES)
+        self.draw_calls = 0
+        self.sprites = 0
+        self.queries = deque()
+        self.free_queries = []
+        self.gpu_ms = 0.0
+        self.update_time = 0.0
+        self.in_update = False
+        self.frame_start = None
+        self.scene = None
+        self.hud = None
+        self.original_render = None
+        self.original_sprite_draw = None
+
+    def phase(self, name):
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase(self, name)
+            self.phase_names.append(name)
+        return phase
+
+    def add(self, name, seconds):
+        self.current[name] = self.current.get(name, 0.0) + seconds
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.history.clear()
+        self.current = {}
+        self.update_time = 0.0
+        self.frame_start = None
+        self.install_counters()
+
+    def disable(self):
+        self.enabled = False
+        self.remove_counters()
+        self.queries.clear()
+        self.free_queries.clear()
+
+    def install_counters(self):
+        profiler = self
+        self.original_render = render = Geometry.render
+        self.original_sprite_draw = sprite_draw = arcade.SpriteList.draw
+
+        def counted_render(geometry, *args, **kwargs):
+            profiler.draw_calls += 1
+            return render(geometry, *args, **kwargs)
+
+        def counted_sprite_draw(sprite_list, *args, **kwargs):
+            profiler.sprites += len(sprite_list)
+            return sprite_draw(sprite_list, *args, **kwargs)
+
+        Geometry.render = counted_render
+        arcade.SpriteList.draw = counted_sprite_draw
+
+    def remove_counters(self):
+        if self.original_render is not None:
+            Geometry.render = self.original_render
+            arcade.SpriteList.draw = self.original_sprite_draw
+            self.original_render = self.original_sprite_draw = None
+
+    def measure_update(self, dispatch, *args):
+        # replay подаёт on_update изнутри on_update - вложенные не считаем дважды
+        if self.in_update:
+            return dispatch("on_update", *args)
+        if self.frame_start is None:
+            self.frame_start = time.perf_counter()
+        self.in_update = True
+        start = time.perf_counter()
+        try:
+            return dispatch("on_update", *args)
+        finally:
+            self.update_time += time.perf_counter() - start
+            self.in_update = False
+
+    def measure_draw(self, window, dispatch):
+        if self.free_queries:
+            query = self.free_queries.pop()
+        else:
+            query = window.ctx.query(samples=False, primitives=False)
+        draw_calls, sprites = self.draw_calls, self.sprites
+        start = time.perf_counter()
+        with query:
+            result = dispatch("on_draw")
+        draw_time = time.perf_counter() - start
+        self.queries.append(query)
+        if len(self.queries) > GPU_QUERY_LAG:
+            # time_elapsed в наносекундах
+            finished = self.queries.popleft()
+            self.gpu_ms = finished.time_elapsed / 1e6
+            self.free_queries.append(finished)
+
+        now = time.perf_counter()
+        self.history.append({
+            "time": now,
+            "frame_ms": (now - (self.frame_start or start)) * 1000,
+            "update_ms": self.update_time * 1000,
+            "draw_ms": draw_time * 1000,
+            "gpu_ms": self.gpu_ms,
+            "draw_calls": self.draw_calls - draw_calls,
+            "sprites": self.sprites - sprites,
+            **{name: seconds * 1000 for name, seconds in self.current.items()},
+        })
+        self.current = {}
+        self.update_time = 0.0
+        self.frame_start = now
+        self.draw_overlay(window)
+        return result
+
+    def averages(self):
+        frames = list(self.history)[-AVERAGE_FRAMES:]
+        keys = ["frame_ms", "update_ms", "draw_ms", "gpu_ms", "draw_calls", "sprites"] + self.phase_names
+        return {key: sum(frame.get(key, 0.0) for frame in frames) / len(frames) for key in keys}
+
+    def draw_overlay(self, window):
+        if self.hud is None:
+            self.hud = hud.Hud()
+            self.hud.add("summary", "", MARGIN, 0, arcade.color.WHITE, 11, font_name="Courier New",
+                         multiline=True, width=GRAPH_WIDTH)
+            self.hud.prewarm()
+        if not self.history:
+            return
+
+        top = window.height - MARGIN
+        left = MARGIN
+        bottom = top - GRAPH_HEIGHT
+        arcade.draw_lrbt_rectangle_filled(left, left + GRAPH_WIDTH, bottom - 160, top, (0, 0, 0, 180))
+        budget_y = bottom + GRAPH_HEIGHT * BUDGET_MS / GRAPH_MS
+        arcade.draw_line(left, budget_y, left + GRAPH_WIDTH, budget_y, arcade.color.DARK_GREEN, 1)
+
+        frames = list(self.history)[-GRAPH_FRAMES:]
+        step = GRAPH_WIDTH / GRAPH_FRAMES
+        for key, color in [("frame_ms", arcade.color.YELLOW), ("update_ms", arcade.color.CYAN),
+                           ("gpu_ms", arcade.color.MAGENTA)]:
+            points = [(left + i * step, bottom + min(frame[key], GRAPH_MS) / GRAPH_MS * GRAPH_HEIGHT)
+                      for i, frame in enumerate(frames)]
+            if len(points) > 1:
+                arcade.draw_line_strip(points, color, 1)
+
+        average = self.averages()
+        lines = [
+            f"{self.scene or '-'}  {1000 / max(average['frame_ms'], 0.001):5.1f} fps",
+            f"frame {average['frame_ms']:6.2f}  update {average['update_ms']:6.2f}  "
+            f"draw {average['draw_ms']:6.2f}  gpu {average['gpu_ms']:6.2f} ms",
+            f"draw calls {average['draw_calls']:6.0f}  sprites {average['sprites']:7.0f}",
+        ]
+        lines += [f"  {name:12} {average[name]:6.2f} ms" for name in self.phase_names if average[name] > 0]
+        lines.append("F3 hide  F4 dump csv")
+        summary = self.hud.set("summary", "\n".join(lines))
+        summary.y = bottom - 14
+        self.hud.draw("summary")
+
+    def dump_csv(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(PROFILE_DIR, f"frames-{self.scene or 'window'}-{stamp}.csv")
+        columns = ["time", "frame_ms", "update_ms", "draw_ms", "gpu_ms", "draw_calls", "sprites"] + self.phase_names
+        start = self.history[0]["time"] if self.history else 0.0
+        with open(path, "w", newline="") as out:
+            writer = csv.writer(out)
+            writer.writerow(columns)
+            for frame in self.history:
+                row = [frame.get(column, 0.0) for column in columns]
+                row[0] = frame["time"] - start
+                writer.writerow([f"{value:.3f}" for value in row])
+        return path
+
+
+profiler = FrameProfiler()
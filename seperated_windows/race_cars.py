@@ -0,0 +1,177 @@
+import numpy as np
+
+import race_maps
+
+CAR_SPEED = 5
+CAR_REVERSE_SPEED = 2
+MAX_STEERING_ANGLE = 45
+# Руль без нажатия возвращается к центру с этим множителем за кадр
+STEERING_RETURN = 0.7
+TURN_RATE = 1.5
+
+# Доля скорости по типу поверхности, индекс - код из race_maps; на траве машины вязнут
+SURFACE_SPEED = np.zeros(3)
+SURFACE_SPEED[race_maps.SURFACE_GRASS] = 0.6
+SURFACE_SPEED[race_maps.SURFACE_ROAD] = 1.0
+
+# Бот не дёргает руль, пока направление поля расходится с его курсом меньше чем на столько градусов
+BOT_DEADZONE = 8
+# Бот, который столько кадров почти не сдвинулся, столько же кадров сдаёт назад
+BOT_STUCK_SPEED = 0.5
+BOT_STUCK_FRAMES = 20
+BOT_BACKING_FRAMES = 30
+
+
+def car_outline(sprite):
+    # Вершины хитбокса и середины его сторон, без поворота: тайл стены уже машины не проскочит между точками
+    points = [(x * sprite.scale_x, y * sprite.scale_y) for x, y in sprite.texture.hit_box_points]
+    midpoints = [((x1 + x2) / 2, (y1 + y2) / 2) for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1])]
+    return points + midpoints
+
+
+def crossed(segments, from_x, from_y, to_x, to_y):
+    # Для каждой машины: путь за кадр перешёл на другую сторону прямой чекпоинта,
+    # и концы отрезка чекпоинта лежат по разные стороны пути
+    x1, y1, x2, y2 = segments.T
+    side_dx, side_dy = x2 - x1, y2 - y1
+    side_from = side_dx * (from_y - y1) - side_dy * (from_x - x1) > 0
+    side_to = side_dx * (to_y - y1) - side_dy * (to_x - x1) > 0
+    path_x, path_y = to_x - from_x, to_y - from_y
+    start = path_x * (y1 - from_y) - path_y * (x1 - from_x)
+    end = path_x * (y2 - from_y) - path_y * (x2 - from_x)
+    return (side_from != side_to) & (start * end <= 0)
+
+
+class Cars:
+    # Всё состояние машин гонки - по массиву на поле; кадр считается одним шагом для всех машин.
+    # Спрайты только показывают результат. Угол - как у arcade: градусы по часовой, 0 - вверх
+    def __init__(self, positions, outlines, angles=None):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        self.count = len(positions)
+        self.x = positions[:, 0].copy()
+        self.y = positions[:, 1].copy()
+        self.last_x = self.x.copy()
+        self.last_y = self.y.copy()
+        self.angle = np.zeros(self.count) if angles is None else np.array(angles, dtype=np.float64)
+        self.steering = np.zeros(self.count)
+        # скорость за прошлый шаг с учётом поверхности, назад - отрицательная
+        self.speed = np.zeros(self.count)
+
+        # Ввод контроллеров на этот кадр: руль -1..1 и задний ход
+        self.steer = np.zeros(self.count)
+        self.reverse = np.zeros(self.count, dtype=bool)
+
+        self.laps = np.zeros(self.count, dtype=np.int32)
+        # старт стоит за линией финиша: первое её пересечение круг не закрывает
+        self.started = np.zeros(self.count, dtype=bool)
+        self.current_checkpoint = np.zeros(self.count, dtype=np.int32)
+        self.checkpoints_passed = np.zeros(self.count, dtype=np.int32)
+
+        # Контуры разной длины добиваются последней точкой, чтобы лечь в один массив (машина, точка, xy)
+        size = max(len(outline) for outline in outlines)
+        self.outlines = np.array([outline + outline[-1:] * (size - len(outline)) for outline in outlines],
+                                 dtype=np.float64)
+
+    def outline_offsets(self, angle_rad):
+        # Поворот по часовой: локальное (0, 1) уходит в (sin, cos) - туда же, куда едет машина
+        cos, sin = np.cos(angle_rad)[:, None], np.sin(angle_rad)[:, None]
+        local_x, local_y = self.outlines[..., 0], self.outlines[..., 1]
+        return local_x * cos + local_y * sin, local_y * cos - local_x * sin
+
+    def blocked(self, race_map, x, y, offset_x, offset_y):
+        surfaces = race_map.surfaces(x[:, None] + offset_x, y[:, None] + offset_y)
+        return (surfaces == race_maps.SURFACE_WALL).any(axis=1)
+
+    def step(self, delta_time, race_map):
+        self.steering = np.where(self.steer != 0, self.steer * MAX_STEERING_ANGLE, self.steering * STEERING_RETURN)
+        np.clip(self.steering, -MAX_STEERING_ANGLE, MAX_STEERING_ANGLE, out=self.steering)
+        self.angle += self.steering * delta_time * TURN_RATE
+        angle_rad = np.radians(self.angle)
+
+        speed = np.where(self.reverse, -CAR_REVERSE_SPEED, CAR_SPEED)
+        self.speed = speed * SURFACE_SPEED[race_map.surfaces(self.x, self.y)]
+        offset_x, offset_y = self.outline_offsets(angle_rad)
+
+        # Как PhysicsEngineSimple: шаг по x, затем по y, упёршийся шаг откатывается
+        self.last_x[:] = self.x
+        self.last_y[:] = self.y
+        new_x = self.x + np.sin(angle_rad) * self.speed
+        self.x = np.where(self.blocked(race_map, new_x, self.y, offset_x, offset_y), self.x, new_x)
+        new_y = self.y + np.cos(angle_rad) * self.speed
+        self.y = np.where(self.blocked(race_map, self.x, new_y, offset_x, offset_y), self.y, new_y)
+
+    def check_checkpoints(self, segments):
+        # segments: (x1, y1, x2, y2) по чекпоинтам, последний - финиш.
+        # Смотрим только следующий ожидаемый чекпоинт и финиш; возвращает машины, закрывшие круг
+        required = len(segments) - 1
+        path = self.last_x, self.last_y, self.x, self.y
+        hit = (self.checkpoints_passed < required) & crossed(segments[self.current_checkpoint], *path)
+        self.current_checkpoint[hit] += 1
+        self.checkpoints_passed[hit] += 1
+        self.current_checkpoint[self.current_checkpoint >= required] = 0
+
+        finish = crossed(segments[-1:], *path)
+        lap = (self.checkpoints_passed >= required) & finish
+        self.started |= finish
+        self.checkpoints_passed[lap] = 0
+        self.current_checkpoint[lap] = 0
+        self.laps[lap] += 1
+        return np.nonzero(lap)[0]
+
+    def sync_sprites(self, sprites):
+        for sprite, x, y, angle in zip(sprites, self.x.tolist(), self.y.tolist(), self.angle.tolist()):
+            sprite.position = x, y
+            sprite.angle = angle
+
+
+class KeyboardController:
+    def __init__(self, car, left, right, reverse):
+        self.car = car
+        self.left = left
+        self.right = right
+        self.reverse = reverse
+        self.pressed = set()
+
+    def on_key_press(self, key):
+        if key in (self.left, self.right, self.reverse):
+            self.pressed.add(key)
+            return True
+        return False
+
+    def on_key_release(self, key):
+        if key in self.pressed:
+            self.pressed.remove(key)
+            return True
+        return False
+
+    def control(self, cars, race):
+        left, right = self.left in self.pressed, self.right in self.pressed
+        cars.steer[self.car] = -1 if left and not right else 1 if right and not left else 0
+        cars.reverse[self.car] = self.reverse in self.pressed
+
+
+class BotController:
+    # Ведёт сразу все свои машины по полю расстояний трассы (race_track):
+    # курс берётся из клетки под машиной, так что бот стоит O(1) за кадр
+    def __init__(self, cars):
+        self.cars = np.asarray(cars, dtype=np.int64)
+        self.stuck = np.zeros(len(self.cars), dtype=np.int32)
+        self.backing = np.zeros(len(self.cars), dtype=np.int32)
+
+    def control(self, cars, race):
+        index = self.cars
+        if not len(index):
+            return
+        turn = (race.track.heading(cars, index) - cars.angle[index] + 180) % 360 - 180
+        # в клетках без курса (nan) руль прямо
+        steer = np.where(np.abs(turn) > BOT_DEADZONE, np.sign(turn), 0)
+
+        # упёрся в стену - сдаёт назад, поворачивая к курсу
+        moved = np.hypot(cars.x[index] - cars.last_x[index], cars.y[index] - cars.last_y[index])
+        self.stuck = np.where(moved < BOT_STUCK_SPEED, self.stuck + 1, 0)
+        self.backing[self.stuck > BOT_STUCK_FRAMES] = BOT_BACKING_FRAMES
+        backing = self.backing > 0
+        self.backing[backing] -= 1
+
+        cars.steer[index] = steer
+        cars.reverse[index] = backing
@@ -0,0 +1,543 @@
+import argparse
+import base64
+import functools
+import hashlib
+import json
+import math
+import os
+import posixpath
+import re
+import time
+import xml.etree.ElementTree as ET
+import zlib
+
+import arcade
+import numpy as np
+from PIL import Image
+
+import assets
+from layer_baker import BakedLayer
+
+MAPS_DIR = "Assets/maps"
+LAYERS = ["ground", "road", "fance", "on_finish", "finish", "collusion"]
+COLLISION_LAYERS = ["fance", "collusion"]
+ROAD_LAYERS = ["road", "finish"]
+# Машины рисуются между этими двумя группами слоёв
+BELOW_LAYERS = ["ground", "road"]
+ABOVE_LAYERS = ["finish", "on_finish", "fance"]
+# Сторона куска запекания в тайлах: кадр рисует только куски, видимые в окне камеры
+CHUNK_TILES = 16
+
+# Скомпилированные карты, ключ: хэш tmx + tsx; при смене формата старые файлы не подходят
+FORMAT_VERSION = 4
+MAP_CACHE_DIR = os.environ.get("MAP_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "two_player_games", "maps")
+
+# Слой объектов гонки: точки type="spawn" и прямоугольники type="checkpoint" по порядку имени,
+# плюс один type="finish". Курс старта - rotation точки в Tiled или свойство heading,
+# в градусах по часовой от направления вверх, как угол машины
+RACE_LAYER = "race"
+
+# Каталог: метаданные и миниатюры всех карт, чтобы меню не разбирало TMX
+CATALOG_VERSION = 1
+CATALOG_NAME = "catalog.json"
+THUMBNAIL_SIZE = (220, 120)
+
+# Старшие биты gid в TMX - флаги отражения
+GID_MASK = 0x1FFFFFFF
+
+# Тип поверхности в клетке маски; всё за краем карты - стена
+SURFACE_GRASS = 0
+SURFACE_ROAD = 1
+SURFACE_WALL = 2
+
+
+def map_asset(name):
+    return f"{MAPS_DIR}/{name}.tmx"
+
+
+def relative_asset(base_path, source):
+    # Пути в TMX/TSX - относительно их собственной папки
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_path), source))
+
+
+def read_asset(path):
+    with assets.open_asset(path) as file:
+        return file.read()
+
+
+@functools.lru_cache(maxsize=None)
+def map_digest(name):
+    # Правка карты или её тайлсета даёт новый ключ; XML здесь не разбирается
+    path = map_asset(name)
+    data = read_asset(path)
+    digest = hashlib.sha1(f"v{FORMAT_VERSION}".encode())
+    digest.update(data)
+    for source in re.findall(rb'<tileset[^>]*source="([^"]+)"', data):
+        digest.update(read_asset(relative_asset(path, source.decode())))
+    return digest.hexdigest()
+
+
+def decode_layer(data, width, height):
+    encoding = data.get("encoding")
+    text = data.text.strip()
+    if encoding == "csv":
+        gids = np.array([int(value) for value in text.split(",")], dtype=np.uint32)
+    elif encoding == "base64":
+        raw = base64.b64decode(text)
+        if data.get("compression") == "zlib":
+            raw = zlib.decompress(raw)
+        elif data.get("compression"):
+            raise ValueError(f"unsupported layer compression {data.get('compression')!r}")
+        gids = np.frombuffer(raw, dtype="<u4").astype(np.uint32)
+    else:
+        raise ValueError(f"unsupported layer encoding {encoding!r}")
+    return (gids & GID_MASK).reshape(height, width)
+
+
+class CompiledMap:
+    # Всё, что нужно для сборки карты без TMX: размеры, тайлсет, сетки gid и маска поверхностей
+    def __init__(self, width, height, tile_width, tile_height, tileset, layers, surface, objects):
+        self.width = width
+        self.height = height
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.tileset = tileset
+        self.layers = layers
+        self.surface = surface
+        # объекты гонки в пикселях карты, y сверху вниз, как в TMX
+        self.objects = objects
+
+    @property
+    def pixel_width(self):
+        return self.width * self.tile_width
+
+    @property
+    def pixel_height(self):
+        return self.height * self.tile_height
+
+    def fit_scale(self, width, height):
+        return min(width / self.pixel_width, height / self.pixel_height)
+
+    def meta(self):
+        return {
+            "version": FORMAT_VERSION,
+            "width": self.width,
+            "height": self.height,
+            "tile_width": self.tile_width,
+            "tile_height": self.tile_height,
+            "tileset": self.tileset,
+            "layers": list(self.layers),
+            "objects": self.objects,
+        }
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as out:
+            np.savez(out, meta=np.array(json.dumps(self.meta())), surface=self.surface,
+                     **{f"layer_{name}": grid for name, grid in self.layers.items()})
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["version"] != FORMAT_VERSION:
+                raise ValueError(f"{path}: compiled map format {meta['version']}")
+            layers = {name: data[f"layer_{name}"] for name in meta["layers"]}
+            return cls(meta["width"], meta["height"], meta["tile_width"], meta["tile_height"],
+                       meta["tileset"], layers, data["surface"], meta["objects"])
+
+
+def object_order(node):
+    name = node.get("name", "")
+    return (0, int(name)) if name.isdigit() else (1, int(node.get("id", 0)))
+
+
+def read_race_objects(root):
+    spawns, checkpoints, finish = [], [], None
+    for group in root.iter("objectgroup"):
+        if group.get("name") != RACE_LAYER:
+            continue
+        for node in group.iter("object"):
+            # в разных версиях Tiled класс объекта пишется в type или в class
+            kind = node.get("type") or node.get("class")
+            rect = [float(node.get(key, 0)) for key in ("x", "y", "width", "height")]
+            if kind == "spawn":
+                heading = float(node.get("rotation", 0))
+                for prop in node.iter("property"):
+                    if prop.get("name") == "heading":
+                        heading = float(prop.get("value"))
+                spawns.append((object_order(node), rect[:2] + [heading]))
+            elif kind == "checkpoint":
+                checkpoints.append((object_order(node), rect))
+            elif kind == "finish":
+                finish = rect
+    return {
+        "spawns": [point for _, point in sorted(spawns)],
+        "checkpoints": [rect for _, rect in sorted(checkpoints)],
+        "finish": finish,
+    }
+
+
+def compile_map(name):
+    path = map_asset(name)
+    root = ET.fromstring(read_asset(path))
+    width, height = int(root.get("width")), int(root.get("height"))
+
+    tilesets = root.findall("tileset")
+    if len(tilesets) != 1:
+        raise ValueError(f"{name}: expected one tileset, got {len(tilesets)}")
+    tileset_ref = tilesets[0]
+    tileset_node = tileset_ref
+    tileset_path = path
+    if tileset_ref.get("source"):
+        tileset_path = relative_asset(path, tileset_ref.get("source"))
+        tileset_node = ET.fromstring(read_asset(tileset_path))
+    image = tileset_node.find("image")
+    tileset = {
+        "image": relative_asset(tileset_path, image.get("source")),
+        "firstgid": int(tileset_ref.get("firstgid")),
+        "columns": int(tileset_node.get("columns")),
+        "spacing": int(tileset_node.get("spacing", 0)),
+        "margin": int(tileset_node.get("margin", 0)),
+    }
+
+    layers = {}
+    for layer in root.iter("layer"):
+        layers[layer.get("name")] = decode_layer(layer.find("data"), width, height)
+
+    # Строки маски сверху вниз, как в TMX
+    surface = np.full((height, width), SURFACE_GRASS, dtype=np.uint8)
+    for layer_name in ROAD_LAYERS:
+        if layer_name in layers:
+            surface[layers[layer_name] > 0] = SURFACE_ROAD
+    for layer_name in COLLISION_LAYERS:
+        if layer_name in layers:
+            surface[layers[layer_name] > 0] = SURFACE_WALL
+
+    return CompiledMap(width, height, int(root.get("tilewidth")), int(root.get("tileheight")),
+                       tileset, layers, surface, read_race_objects(root))
+
+
+_compiled = {}
+
+
+def load_compiled(name):
+    digest = map_digest(name)
+    compiled = _compiled.get(digest)
+    if compiled is not None:
+        return compiled
+
+    cache_path = os.path.join(MAP_CACHE_DIR, f"{digest}.npz")
+    try:
+        compiled = CompiledMap.load(cache_path)
+    except (OSError, ValueError, KeyError):
+        compiled = compile_map(name)
+        compiled.save(cache_path)
+    _compiled[digest] = compiled
+    return compiled
+
+
+@functools.lru_cache(maxsize=None)
+def tileset_image(path):
+    return assets.decode_image(path)
+
+
+_tile_textures = {}
+
+
+def tile_texture(compiled, gid):
+    tileset = compiled.tileset
+    key = f"{tileset['image']}#{gid}"
+    texture = _tile_textures.get(key)
+    if texture is None:
+        index = gid - tileset["firstgid"]
+        col, row = index % tileset["columns"], index // tileset["columns"]
+        x = tileset["margin"] + col * (compiled.tile_width + tileset["spacing"])
+        y = tileset["margin"] + row * (compiled.tile_height + tileset["spacing"])
+        image = tileset_image(tileset["image"])
+        texture = arcade.Texture(image.crop((x, y, x + compiled.tile_width, y + compiled.tile_height)), hash=key)
+        _tile_textures[key] = texture
+    return texture
+
+
+class RaceMap:
+    # Карта, собранная под конкретный масштаб: маска поверхностей и запекаемые кусками слои.
+    # Спрайты тайлов создаются только для запекаемого куска, так что память и кадр
+    # не растут с размером карты. Тайлы не сдвигаются к центру окна - так же их ставил arcade.load_tilemap
+    def __init__(self, compiled, scale, digest):
+        self.compiled = compiled
+        self.scale = scale
+        self.digest = digest
+        self.tile_width = compiled.tile_width * scale
+        self.tile_height = compiled.tile_height * scale
+        self.width = compiled.pixel_width * scale
+        self.height = compiled.pixel_height * scale
+        self.surface = compiled.surface
+        self.below = None
+        self.above = None
+
+    def build_layer(self, grid, x, y, width, height):
+        # Спрайты тайлов, задевающих прямоугольник мира; края кусков не совпадают с тайлами,
+        # лишнее обрежет сам кадровый буфер куска
+        sprite_list = arcade.SpriteList()
+        rows = self.compiled.height
+        first_col, last_col = max(0, int(x // self.tile_width)), math.ceil((x + width) / self.tile_width)
+        # строки сетки идут сверху, мир - снизу
+        first_row = max(0, rows - math.ceil((y + height) / self.tile_height))
+        last_row = rows - int(y // self.tile_height)
+        chunk = grid[first_row:last_row, first_col:last_col]
+        for chunk_row, chunk_col in zip(*np.nonzero(chunk)):
+            grid_row, grid_col = first_row + int(chunk_row), first_col + int(chunk_col)
+            sprite = arcade.Sprite(tile_texture(self.compiled, int(grid[grid_row, grid_col])), scale=self.scale)
+            sprite.center_x = (grid_col + 0.5) * self.tile_width
+            sprite.center_y = (rows - grid_row - 0.5) * self.tile_height
+            sprite_list.append(sprite)
+        return sprite_list
+
+    def chunk_builder(self, layer_names):
+        layers = [self.compiled.layers[name] for name in layer_names if name in self.compiled.layers]
+        return lambda x, y, width, height: [self.build_layer(grid, x, y, width, height) for grid in layers]
+
+    def bake(self, window):
+        # Один раз на карту и масштаб; куски печёт сам BakedLayer, когда они попадают в кадр
+        if self.below is None:
+            ratio = window.get_pixel_ratio()
+            chunk = CHUNK_TILES * self.tile_width, CHUNK_TILES * self.tile_height
+            self.below = BakedLayer(window.ctx, self.chunk_builder(BELOW_LAYERS), self.width, self.height,
+                                    *chunk, ratio)
+            self.above = BakedLayer(window.ctx, self.chunk_builder(ABOVE_LAYERS), self.width, self.height,
+                                    *chunk, ratio)
+        return self.below, self.above
+
+    def release(self):
+        # Карта больше не на экране: её куски уходят из общего пула
+        if self.below is not None:
+            self.below.release()
+            self.above.release()
+            self.below = self.above = None
+
+    def surface_at(self, x, y):
+        col = int(x // self.tile_width)
+        row = self.compiled.height - 1 - int(y // self.tile_height)
+        if 0 <= col < self.compiled.width and 0 <= row < self.compiled.height:
+            return self.surface[row, col]
+        return SURFACE_WALL
+
+    def cells(self, xs, ys, clip=False):
+        # Строка (сверху) и столбец клетки для массивов точек; clip прижимает точки за краем к крайним клеткам
+        cols = np.floor(np.asarray(xs) / self.tile_width).astype(np.int64)
+        rows = self.compiled.height - 1 - np.floor(np.asarray(ys) / self.tile_height).astype(np.int64)
+        inside = (cols >= 0) & (cols < self.compiled.width) & (rows >= 0) & (rows < self.compiled.height)
+        if clip:
+            np.clip(rows, 0, self.compiled.height - 1, out=rows)
+            np.clip(cols, 0, self.compiled.width - 1, out=cols)
+        return rows, cols, inside
+
+    def surfaces(self, xs, ys):
+        # То же, что surface_at, для массивов точек любой формы
+        rows, cols, inside = self.cells(xs, ys)
+        result = np.full(np.shape(cols), SURFACE_WALL, dtype=np.uint8)
+        result[inside] = self.surface[rows[inside], cols[inside]]
+        return result
+
+    def world_point(self, x, y):
+        # Из пикселей TMX (y вниз) в мир (y вверх)
+        return x * self.scale, self.height - y * self.scale
+
+    def spawn_points(self):
+        # (x, y, курс) в мире; поворот карты не меняет курс - ось y переворачивается вместе с ним
+        return [(*self.world_point(x, y), heading) for x, y, heading in self.compiled.objects["spawns"]]
+
+    def checkpoint_rects(self):
+        # (x, y, ширина, высота) в мире от левого нижнего угла; последний - финиш
+        objects = self.compiled.objects
+        rects = objects["checkpoints"] + ([objects["finish"]] if objects["finish"] else [])
+        return [(*self.world_point(x, y + height), width * self.scale, height * self.scale)
+                for x, y, width, height in rects]
+
+
+_built = {}
+
+
+def load_map(name, width, height, min_scale=0.0):
+    # Карта, вписанная в окно width x height, но не мельче min_scale - тогда она больше окна
+    # и её показывают камеры; при рестарте та же сборка без разбора и без I/O
+    compiled = load_compiled(name)
+    scale = max(compiled.fit_scale(width, height), min_scale)
+    digest = map_digest(name)
+    key = (digest, scale)
+    race_map = _built.get(key)
+    if race_map is None:
+        race_map = _built[key] = RaceMap(compiled, scale, digest)
+    for other in _built.values():
+        if other is not race_map:
+            other.release()
+    return race_map
+
+
+def discover_maps():
+    # Все .tmx под MAPS_DIR - на диске и в архиве ассетов; имя - путь без расширения
+    names = set()
+    root = assets.resource_path(MAPS_DIR)
+    for folder, _, files in os.walk(root):
+        for file_name in files:
+            if file_name.endswith(".tmx"):
+                relative = os.path.relpath(os.path.join(folder, file_name), root)
+                names.add(relative.replace(os.sep, "/")[:-len(".tmx")])
+    archive = assets.get_archive()
+    if archive is not None:
+        prefix = MAPS_DIR + "/"
+        names.update(entry[len(prefix):-len(".tmx")] for entry in archive.entries
+                     if entry.startswith(prefix) and entry.endswith(".tmx"))
+    return sorted(names)
+
+
+def render_thumbnail(compiled, path):
+    # Слои в порядке отрисовки игры, вписанные в THUMBNAIL_SIZE; без GL
+    tile_width, tile_height = compiled.tile_width, compiled.tile_height
+    tileset = compiled.tileset
+    image = tileset_image(tileset["image"])
+    canvas = Image.new("RGBA", (compiled.pixel_width, compiled.pixel_height))
+    tiles = {}
+    for layer_name in BELOW_LAYERS + ABOVE_LAYERS:
+        grid = compiled.layers.get(layer_name)
+        if grid is None:
+            continue
+        for row, col in zip(*np.nonzero(grid)):
+            gid = int(grid[row, col])
+            tile = tiles.get(gid)
+            if tile is None:
+                index = gid - tileset["firstgid"]
+                x = tileset["margin"] + index % tileset["columns"] * (tile_width + tileset["spacing"])
+                y = tileset["margin"] + index // tileset["columns"] * (tile_height + tileset["spacing"])
+                tile = tiles[gid] = image.crop((x, y, x + tile_width, y + tile_height))
+            canvas.alpha_composite(tile, (int(col) * tile_width, int(row) * tile_height))
+    canvas.thumbnail(THUMBNAIL_SIZE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    canvas.save(path)
+
+
+class MapCatalog:
+    # Сводка по картам для выбора: размер, слои, объекты гонки, миниатюра.
+    # Лежит в catalog.json рядом со скомпилированными картами; запись пересобирается,
+    # только когда поменялся хэш карты
+    def __init__(self, path=os.path.join(MAP_CACHE_DIR, CATALOG_NAME)):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path) as file:
+                data = json.load(file)
+            if data.get("version") == CATALOG_VERSION:
+                self.entries = data["maps"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def describe(self, name, digest):
+        # Карта компилируется в локальную переменную и сразу отпускается: в _compiled
+        # попадает только та, на которой реально едут. Любая ошибка разбора - запись
+        # с error, а не падение каталога
+        try:
+            cache_path = os.path.join(MAP_CACHE_DIR, f"{digest}.npz")
+            try:
+                compiled = CompiledMap.load(cache_path)
+            except (OSError, ValueError, KeyError):
+                compiled = compile_map(name)
+                compiled.save(cache_path)
+        except Exception as error:
+            return {"name": name, "digest": digest, "playable": False, "error": f"{type(error).__name__}: {error}"}
+        objects = compiled.objects
+        thumbnail = os.path.join(MAP_CACHE_DIR, "thumbs", f"{digest}.png")
+        if not os.path.exists(thumbnail):
+            try:
+                render_thumbnail(compiled, thumbnail)
+            except Exception as error:
+                print(f"{name}: no thumbnail: {error}")
+                thumbnail = None
+        return {
+            "name": name,
+            "digest": digest,
+            "width": compiled.width,
+            "height": compiled.height,
+            "tile_width": compiled.tile_width,
+            "tile_height": compiled.tile_height,
+            "layers": sorted(compiled.layers),
+            "spawns": len(objects["spawns"]),
+            "checkpoints": len(objects["checkpoints"]),
+            # гонке нужны хотя бы два старта и финиш
+            "playable": len(objects["spawns"]) >= 2 and objects["finish"] is not None,
+            "thumbnail": thumbnail,
+            "error": None,
+        }
+
+    def refresh(self, names=None):
+        names = discover_maps() if names is None else names
+        changed = set(self.entries) - set(names)
+        entries = {}
+        for name in names:
+            try:
+                digest = map_digest(name)
+            except Exception as error:
+                entries[name] = {"name": name, "digest": None, "playable": False,
+                                 "error": f"{type(error).__name__}: {error}"}
+                continue
+            entry = self.entries.get(name)
+            if entry is None or entry["digest"] != digest:
+                entry = self.describe(name, digest)
+                changed.add(name)
+            entries[name] = entry
+        self.entries = entries
+        if changed:
+            self.save()
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as out:
+            json.dump({"version": CATALOG_VERSION, "saved": time.time(), "maps": self.entries}, out, indent=2)
+        os.replace(temp_path, self.path)
+
+    def playable(self):
+        return [name for name, entry in self.entries.items() if entry["playable"]]
+
+
+_catalog = None
+
+
+def get_catalog():
+    global _catalog
+    if _catalog is None:
+        _catalog = MapCatalog().refresh()
+    return _catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile race maps into the map cache")
+    parser.add_argument("maps", nargs="*")
+    parser.add_argument("--force", action="store_true", help="recompile even if cached")
+    parser.add_argument("--catalog", action="store_true", help="rebuild and print the map catalog")
+    args = parser.parse_args()
+
+    if args.catalog:
+        for entry in MapCatalog().refresh(args.maps or None).entries.values():
+            state = "playable" if entry["playable"] else entry["error"] or "no race objects"
+            print(f"{entry['name']}: {state}, {entry.get('spawns', 0)} spawns, "
+                  f"{entry.get('checkpoints', 0)} checkpoints -> {entry.get('thumbnail')}")
+        return
+
+    for name in args.maps or discover_maps():
+        cache_path = os.path.join(MAP_CACHE_DIR, f"{map_digest(name)}.npz")
+        if args.force or not os.path.exists(cache_path):
+            compile_map(name).save(cache_path)
+        compiled = load_compiled(name)
+        tiles = {layer: int(np.count_nonzero(grid)) for layer, grid in compiled.layers.items()}
+        surfaces = {kind: int(np.count_nonzero(compiled.surface == value))
+                    for kind, value in [("grass", SURFACE_GRASS), ("road", SURFACE_ROAD), ("wall", SURFACE_WALL)]}
+        print(f"{name}: {compiled.width}x{compiled.height} tiles, {tiles}, surface {surfaces} -> {cache_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import hashlib
+import heapq
+import math
+import os
+
+import numpy as np
+
+import race_maps
+
+# Цена шага по клетке: по траве машина едет медленнее, значит и путь «длиннее»
+SURFACE_COST = {race_maps.SURFACE_ROAD: 1.0, race_maps.SURFACE_GRASS: 1 / 0.6}
+# (строка, столбец, длина шага) - восемь соседей клетки
+NEIGHBOURS = [(-1, 0, 1.0), (1, 0, 1.0), (0, -1, 1.0), (0, 1, 1.0),
+              (-1, -1, math.sqrt(2)), (-1, 1, math.sqrt(2)), (1, -1, math.sqrt(2)), (1, 1, math.sqrt(2))]
+# Клетки, откуда до цели не доехать: конечное число, чтобы рейтинг не ломался на inf
+UNREACHABLE = 1.0e6
+# Формат полей в кэше на диске; при смене алгоритма старые файлы не подходят
+TRACK_FORMAT_VERSION = 1
+
+
+def line_cells(race_map, segment):
+    # Клетки, через которые проходит отрезок чекпоинта
+    x1, y1, x2, y2 = segment
+    step = min(race_map.tile_width, race_map.tile_height) / 4
+    t = np.linspace(0.0, 1.0, max(2, int(math.hypot(x2 - x1, y2 - y1) / step) + 2))
+    rows, cols, inside = race_map.cells(x1 + (x2 - x1) * t, y1 + (y2 - y1) * t)
+    return set(zip(rows[inside].tolist(), cols[inside].tolist()))
+
+
+def neighbours(passable, row, col):
+    height, width = passable.shape
+    for d_row, d_col, length in NEIGHBOURS:
+        next_row, next_col = row + d_row, col + d_col
+        if not (0 <= next_row < height and 0 <= next_col < width and passable[next_row, next_col]):
+            continue
+        # по диагонали - только если не срезаем угол стены
+        if d_row and d_col and not (passable[row, next_col] and passable[next_row, col]):
+            continue
+        yield next_row, next_col, d_row, d_col, length
+
+
+def distance_field(surface, passable, sources):
+    # Дейкстра от клеток цели по проходимым клеткам
+    distances = np.full(surface.shape, np.inf)
+    heap = []
+    for row, col in sources:
+        if passable[row, col]:
+            distances[row, col] = 0.0
+            heap.append((0.0, row, col))
+    heapq.heapify(heap)
+    while heap:
+        distance, row, col = heapq.heappop(heap)
+        if distance > distances[row, col]:
+            continue
+        for next_row, next_col, _, _, length in neighbours(passable, row, col):
+            next_distance = distance + length * SURFACE_COST[surface[next_row, next_col]]
+            if next_distance < distances[next_row, next_col]:
+                distances[next_row, next_col] = next_distance
+                heapq.heappush(heap, (next_distance, next_row, next_col))
+    return distances
+
+
+def heading(d_row, d_col):
+    # Строки идут сверху вниз; угол как у arcade - по часовой от направления вверх
+    return math.degrees(math.atan2(d_col, -d_row))
+
+
+def flow_headings(distances, passable, line, next_distances):
+    # Куда ехать из каждой клетки: взвешенная сумма направлений к соседям, которые ближе к цели.
+    # С клеток самой цели - к соседу, с которого ближе до следующего чекпоинта, то есть через линию вперёд
+    headings = np.full(distances.shape, np.nan)
+    for row, col in zip(*np.nonzero(np.isfinite(distances))):
+        row, col = int(row), int(col)
+        sum_x = sum_y = 0.0
+        if (row, col) in line:
+            best = None
+            for next_row, next_col, d_row, d_col, _ in neighbours(passable, row, col):
+                value = next_distances[next_row, next_col]
+                if (next_row, next_col) not in line and np.isfinite(value) and (best is None or value < best[0]):
+                    best = value, d_row, d_col
+            if best is not None:
+                headings[row, col] = heading(best[1], best[2])
+            continue
+        for next_row, next_col, d_row, d_col, length in neighbours(passable, row, col):
+            gain = (distances[row, col] - distances[next_row, next_col]) / length
+            if gain > 0:
+                sum_x += gain * d_col / length
+                sum_y += gain * -d_row / length
+        if sum_x or sum_y:
+            headings[row, col] = math.degrees(math.atan2(sum_x, sum_y))
+    return headings
+
+
+def compute_fields(surface, lines):
+    # Поле расстояний до каждого чекпоинта (последний - финиш) по клеткам карты.
+    # Линия предыдущего чекпоинта в поле закрыта, поэтому путь ведёт вперёд по кругу, а не назад.
+    # Зависит только от сетки карты и клеток линий, не от масштаба окна
+    open_cells = surface != race_maps.SURFACE_WALL
+    count = len(lines)
+
+    fields = []
+    for target in range(count):
+        passable = open_cells.copy()
+        if count > 1:
+            for row, col in lines[target - 1]:
+                passable[row, col] = False
+        fields.append((passable, distance_field(surface, passable, lines[target])))
+
+    distances_out = np.empty((count,) + surface.shape)
+    headings = np.empty((count,) + surface.shape)
+    legs = np.empty(count)
+    for target, (passable, distances) in enumerate(fields):
+        next_distances = fields[(target + 1) % count][1]
+        headings[target] = flow_headings(distances, passable, lines[target], next_distances)
+        # Длина участка: от линии предыдущего чекпоинта до этого
+        legs[target] = min((distances[next_row, next_col]
+                            for row, col in lines[target - 1]
+                            for next_row, next_col, _, _, _ in neighbours(passable, row, col)),
+                           default=0.0)
+        distances_out[target] = np.where(np.isfinite(distances), distances, UNREACHABLE)
+    return distances_out, headings, np.where(np.isfinite(legs), legs, 0.0)
+
+
+class TrackField:
+    # Поля race_track, привязанные к собранной карте: для машины всё берётся из клетки под ней - O(1)
+    def __init__(self, race_map, distances, headings, legs):
+        self.race_map = race_map
+        self.distances = distances
+        self.headings = headings
+        # after[k] - сколько ещё ехать до финиша, когда чекпоинт k взят
+        self.after = np.concatenate([np.cumsum(legs[::-1])[::-1][1:], [0.0]])
+        self.lap_length = float(legs.sum())
+
+    def targets(self, cars, index=slice(None)):
+        # До первого пересечения финиша машина едет к нему - старт стоит за линией
+        finish = len(self.after) - 1
+        to_finish = ~cars.started[index] | (cars.checkpoints_passed[index] >= finish)
+        return np.where(to_finish, finish, cars.current_checkpoint[index])
+
+    def heading(self, cars, index):
+        rows, cols, _ = self.race_map.cells(cars.x[index], cars.y[index], clip=True)
+        return self.headings[self.targets(cars, index), rows, cols]
+
+    def progress(self, cars):
+        rows, cols, _ = self.race_map.cells(cars.x, cars.y, clip=True)
+        targets = self.targets(cars)
+        remaining = self.distances[targets, rows, cols] + self.after[targets]
+        remaining += np.where(cars.started, 0.0, self.lap_length)
+        return (cars.laps + 1) * self.lap_length - remaining
+
+    def places(self, cars):
+        order = np.argsort(-self.progress(cars), kind="stable")
+        places = np.empty(cars.count, dtype=np.int32)
+        places[order] = np.arange(1, cars.count + 1)
+        return places
+
+
+# Поля по ключу (хэш карты, клетки линий); на диске - рядом со скомпилированными картами
+_fields = {}
+
+
+def track_key(digest, lines):
+    key = hashlib.sha1(f"{TRACK_FORMAT_VERSION}:{digest}".encode())
+    for line in lines:
+        key.update(repr(sorted(line)).encode())
+        key.update(b";")
+    return key.hexdigest()
+
+
+def load_fields(digest, surface, lines):
+    key = track_key(digest, lines)
+    fields = _fields.get(key)
+    if fields is not None:
+        return fields
+    cache_path = os.path.join(race_maps.MAP_CACHE_DIR, "tracks", f"{key}.npz")
+    try:
+        with np.load(cache_path) as data:
+            fields = data["distances"], data["headings"], data["legs"]
+    except (OSError, ValueError, KeyError):
+        fields = compute_fields(surface, lines)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as out:
+            np.savez(out, distances=fields[0], headings=fields[1], legs=fields[2])
+        os.replace(temp_path, cache_path)
+    _fields[key] = fields
+    return fields
+
+
+def load_track(race_map, segments):
+    # Дейкстра считается один раз на карту и набор чекпоинтов - потом берётся из памяти или с диска,
+    # при любом размере окна и после перезапуска
+    lines = [line_cells(race_map, segment) for segment in segments]
+    return TrackField(race_map, *load_fields(race_map.digest, race_map.surface, lines))
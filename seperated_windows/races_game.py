@@ -1,59 +1,53 @@
-import os
-import sys
 import arcade
-import math
+import copy
+import os
 import random
+import numpy as np
 from arcade.gui import UIManager, UITextureButton, UIAnchorLayout, UIBoxLayout
-from croco_game import resource_path
+import assets
+import confetti
+import hud
+import layer_baker
+from profiler import profiler
+import race_cars
+import race_maps
+import race_track
+import replay
+import scenes
 
 CARS_SCALE = 0.4
-CAR_SPEED = 5
-CAR_REVERSE_SPEED = 2
 ROTATION_SPEED = 3
 WINNING_LAPS = 3
 
-# (x, y, ширина, высота)
-MAP1_CUSTOM_CHECKPOINTS = [(1116, 539, 562, 8), (254, 543, 548, 8)]
-MAP2_CUSTOM_CHECKPOINTS = [(1352, 108, 8, 250), (836, 417, 318, 8), (114, 541, 372, 8)]
-
-MAP_CONFIGS = {
-    "map1": {"red_car_x": 436, "blue_car_x": 610, "both_car_y": 489, "custom_checkpoints": MAP1_CUSTOM_CHECKPOINTS},
-    "map2": {"red_car_x": 226, "blue_car_x": 366, "both_car_y": 489, "custom_checkpoints": MAP2_CUSTOM_CHECKPOINTS}
-}
-
-
-class SimpleConfettiParticle:
-    def __init__(self, x, y, color, player_index):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.size = random.randint(4, 12)
-        self.speed_x = random.uniform(-4, 4)
-        self.speed_y = random.uniform(4, 12)
-        self.gravity = 0.3
-        self.life = 1.0
-        self.decay = random.uniform(0.005, 0.015)
-        self.player_index = player_index
-
-    def update(self):
-        self.x += self.speed_x
-        self.y += self.speed_y
-        self.speed_y -= self.gravity
-        self.life -= self.decay
-        self.speed_x *= 0.995
-        return self.life > 0
-
-    def draw(self):
-        alpha = int(self.life * 255)
-        arcade.draw_circle_filled(self.x, self.y, self.size,
-                                  (self.color[0], self.color[1], self.color[2], alpha))
+# Машины игроков идут первыми: влево, вправо, назад
+PLAYER_KEYS = [
+    (arcade.key.A, arcade.key.D, arcade.key.S),
+    (arcade.key.LEFT, arcade.key.RIGHT, arcade.key.DOWN),
+]
+CAR_TEXTURES = ["Assets/images/car_red_tires.png", "Assets/images/car_cyan_tires.png"]
+BOT_TINTS = [(255, 255, 255), (255, 220, 120), (170, 255, 170), (255, 170, 255), (200, 200, 200)]
+# RACE_BOTS=N - добавить N машин-ботов (вечеринка, демо ИИ)
+RACE_BOTS = int(os.environ.get("RACE_BOTS", 0))
+# RACE_MAP=имя - играть только эту карту из каталога, например map2
+RACE_MAP = os.environ.get("RACE_MAP")
+
+# Карта мельче этого масштаба не вписывается в окно, а ездит под камерами игроков
+MIN_MAP_SCALE = 1.25
+# RACE_SPLIT=vertical|horizontal - как делить экран; по умолчанию вдоль длинной стороны окна
+RACE_SPLIT = os.environ.get("RACE_SPLIT")
+SPLIT_LINE_WIDTH = 4
+
+# Стартовая решётка: полосы с шагом в треть расстояния между машинами игроков, ряды назад от старта
+SPAWN_LANES = [0, 3, 1, 2, -1, 4, -2, 5]
+SPAWN_ROW_GAP = 40
+SPAWN_MAX_ROWS = 30
 
 
 class BlueAngle(arcade.Sprite):
     def __init__(self, screen_width, screen_height):
         super().__init__()
         self.scale = 1
-        self.texture = arcade.load_texture(resource_path("Assets/images/blue_angle.png"))
+        self.texture = assets.load_texture("Assets/images/blue_angle.png")
         self.center_x = screen_width - 70
         self.center_y = screen_height - 70
 
@@ -62,72 +56,39 @@ class RedAngle(arcade.Sprite):
     def __init__(self, screen_width, screen_height):
         super().__init__()
         self.scale = 1
-        self.texture = arcade.load_texture(resource_path("Assets/images/red_angle.png"))
+        self.texture = assets.load_texture("Assets/images/red_angle.png")
         self.center_x = 70
         self.center_y = 70
 
 
 class Checkpoint:
+    # Полоса чекпоинта хранится отрезком по её длинной оси: засчитывается пересечение
+    # пути машины за кадр, а не попадание центра в тонкую полосу
     def __init__(self, x, y, width, height, checkpoint_id, is_finish_line=False):
-        self.center_x = x + width / 2
-        self.center_y = y + height / 2
-        self.width = width
-        self.height = height
+        if width >= height:
+            self.x1, self.y1 = x, y + height / 2
+            self.x2, self.y2 = x + width, y + height / 2
+        else:
+            self.x1, self.y1 = x + width / 2, y
+            self.x2, self.y2 = x + width / 2, y + height
         self.checkpoint_id = checkpoint_id
         self.is_finish_line = is_finish_line
         self.color = arcade.color.RED if is_finish_line else arcade.color.YELLOW
 
-    def contains_point(self, point_x, point_y):
-        left = self.center_x - self.width / 2
-        right = self.center_x + self.width / 2
-        bottom = self.center_y - self.height / 2
-        top = self.center_y + self.height / 2
-        return left <= point_x <= right and bottom <= point_y <= top
 
-
-class RedCar(arcade.Sprite):
-    def __init__(self, spawn_x, spawn_y):
+class CarSprite(arcade.Sprite):
+    def __init__(self, texture_path, spawn_x, spawn_y, color=arcade.color.WHITE):
         super().__init__()
-        self.texture = arcade.load_texture(resource_path("Assets/images/car_red_tires.png"))
-        self.speed = CAR_SPEED
-        self.reverse_speed = CAR_REVERSE_SPEED
-        self.scale = CARS_SCALE
+        self.texture, self.scale = assets.load_texture_scaled(texture_path, CARS_SCALE)
         self.center_x = spawn_x
         self.center_y = spawn_y
-        self.steering_angle = 0
-        self.can_move = False
-        self.has_started = False
-        self.laps = 0
-        self.is_winner = False
-        self.winner_timer = 3.0
-        self.is_reversing = False
-        self.current_checkpoint = 0
-        self.checkpoints_passed = 0
-
-
-class BlueCar(arcade.Sprite):
-    def __init__(self, spawn_x, spawn_y):
-        super().__init__()
-        self.texture = arcade.load_texture(resource_path("Assets/images/car_cyan_tires.png"))
-        self.speed = CAR_SPEED
-        self.reverse_speed = CAR_REVERSE_SPEED
-        self.scale = CARS_SCALE
-        self.center_x = spawn_x
-        self.center_y = spawn_y
-        self.steering_angle = 0
-        self.can_move = False
-        self.has_started = False
-        self.laps = 0
-        self.is_winner = False
-        self.winner_timer = 3.0
-        self.is_reversing = False
-        self.current_checkpoint = 0
-        self.checkpoints_passed = 0
-
-
-class Races(arcade.Window):
+        self.color = color
+
+
+class Races(arcade.View):
     def __init__(self):
-        super().__init__(fullscreen=True, title="Гонки")
+        super().__init__()
+        self.rng = random.Random()
         self.current_map = None
         self.countdown_timer = 3.0
         self.is_countdown_active = True
@@ -147,8 +108,18 @@ class Races(arcade.Window):
         self.load_sounds()
 
         self.checkpoints = []
+        self.checkpoint_segments = None
         self.finish_line = None
-        self.confetti_particles = []
+        self.bot_count = RACE_BOTS
+        self.cars = None
+        self.track = None
+        self.places = None
+        self.controllers = []
+        self.keyboard = []
+        # камера на игрока, если карта больше окна; иначе одна на всё окно
+        self.cameras = []
+        self.camera_cars = []
+        self.confetti = confetti.ConfettiSystem()
         self.confetti_active = False
         self.confetti_spawn_timer = 0
         self.winner_index = None
@@ -157,36 +128,63 @@ class Races(arcade.Window):
         self.restart_button = None
         self.menu_button = None
         self.setup_ui()
+
+        self.hud = hud.Hud()
+        self.hud.add("countdown", "3", 0, 0, arcade.color.WHITE, 200, charset=hud.DIGITS,
+                     anchor_x="center", anchor_y="center", bold=True)
+        self.hud.add("hint", "Красная машина: A/D/S | Синяя машина: ←/→/↓ ", 0, 0,
+                     arcade.color.LIGHT_GRAY, 20, charset=hud.LATIN + hud.CYRILLIC + hud.ARROWS,
+                     anchor_x="center", anchor_y="center")
+        self.hud.add("go", "GO!", 0, 0, (0, 255, 0, 255), 180, charset="",
+                     anchor_x="center", anchor_y="center", bold=True)
+        # место в гонке у индикаторов кругов игроков
+        self.hud.add("red_place", "1/2", 0, 0, arcade.color.WHITE, 18, charset=hud.DIGITS + "/", bold=True)
+        self.hud.add("blue_place", "2/2", 0, 0, arcade.color.WHITE, 18, charset=hud.DIGITS + "/", bold=True,
+                     anchor_x="right", anchor_y="top")
+        self.hud.prewarm()
+
+    def on_show_view(self):
+        self.window.set_caption("Гонки")
+        arcade.set_background_color(arcade.color.BLACK)
+        self.manager.enable()
+        self.layout_hud()
         self.setup()
 
+    def on_resize(self, width, height):
+        super().on_resize(width, height)
+        self.layout_hud()
+        if self.cars is not None:
+            self.setup_cameras()
+
+    def layout_hud(self):
+        self.hud["countdown"].position = self.window.width // 2, self.window.height // 2
+        self.hud["hint"].position = self.window.width // 2, self.window.height // 2 - 100
+        self.hud["go"].position = self.window.width // 2, self.window.height // 2
+        self.hud["red_place"].position = 110, 140
+        self.hud["blue_place"].position = self.window.width - 110, self.window.height - 140
+
+    def on_hide_view(self):
+        self.stop_drive_sound()
+        self.manager.disable()
+
     def setup_ui(self):
         self.manager = UIManager()
-        self.manager.enable()
         anchor_layout = UIAnchorLayout()
         box_layout = UIBoxLayout(vertical=False, space_between=30)
         anchor_layout.add(box_layout)
         self.manager.add(anchor_layout)
 
-        self.menu_button = UITextureButton(
-            texture=arcade.load_texture(resource_path("Assets/images/menu_icon.png")),
-            scale=0.2
-        )
+        menu_texture, menu_scale = assets.load_texture_scaled("Assets/images/menu_icon.png", assets.MENU_ICON_SCALE)
+        self.menu_button = UITextureButton(texture=menu_texture, scale=menu_scale)
 
         def on_menu_click(event):
-            self.stop_drive_sound()
-            self.manager.disable()
-            self.close()
-            import interface
-            menu_window = interface.MyGame()
-            arcade.run()
+            self.window.show_scene("menu")
 
         self.menu_button.on_click = on_menu_click
         box_layout.add(self.menu_button)
 
-        self.restart_button = UITextureButton(
-            texture=arcade.load_texture(resource_path("Assets/images/vor.png")),
-            scale=0.8
-        )
+        restart_texture, restart_scale = assets.load_texture_scaled("Assets/images/vor.png", assets.RESTART_ICON_SCALE)
+        self.restart_button = UITextureButton(texture=restart_texture, scale=restart_scale)
         self.restart_button.on_click = self.restart_game
         box_layout.add(self.restart_button)
 
@@ -198,27 +196,27 @@ class Races(arcade.Window):
 
     def load_sounds(self):
         try:
-            self.start_sound = arcade.load_sound(resource_path("Assets/sound/start_car.wav"))
+            self.start_sound = assets.load_sound("Assets/sound/start_car.wav")
         except:
             pass
 
         try:
-            self.drive_sound = arcade.load_sound(resource_path("Assets/sound/drive_car.wav"))
+            self.drive_sound = assets.load_sound("Assets/sound/drive_car.wav")
         except:
             pass
 
         try:
-            self.finish_sound = arcade.load_sound(resource_path("Assets/sound/finish.wav"))
+            self.finish_sound = assets.load_sound("Assets/sound/finish.wav")
         except:
             pass
 
         try:
-            self.win_sound = arcade.load_sound(resource_path("Assets/sound/win.wav"))
+            self.win_sound = assets.load_sound("Assets/sound/win.wav")
         except:
             pass
 
         try:
-            self.confetti_sound = arcade.load_sound(":resources:sounds/upgrade1.wav")
+            self.confetti_sound = assets.load_sound(":resources:sounds/upgrade1.wav")
         except:
             pass
 
@@ -247,119 +245,93 @@ class Races(arcade.Window):
         if self.confetti_sound:
             arcade.play_sound(self.confetti_sound, volume=1.0)
 
-    def create_checkpoints(self, offset_x, offset_y):
+    def create_checkpoints(self, rects):
+        # rects - из слоя объектов карты, последний - финиш
         self.checkpoints = []
         self.finish_line = None
 
-        checkpoints_data = MAP1_CUSTOM_CHECKPOINTS if self.current_map == "map1" else MAP2_CUSTOM_CHECKPOINTS
-
-        for i, (x, y, width, height) in enumerate(checkpoints_data):
-            is_finish_line = (i == len(checkpoints_data) - 1)
-            checkpoint = Checkpoint(x + offset_x, y + offset_y, width, height, i, is_finish_line)
+        for i, (x, y, width, height) in enumerate(rects):
+            is_finish_line = (i == len(rects) - 1)
+            checkpoint = Checkpoint(x, y, width, height, i, is_finish_line)
             self.checkpoints.append(checkpoint)
             if is_finish_line:
                 self.finish_line = checkpoint
+        self.checkpoint_segments = np.array([(checkpoint.x1, checkpoint.y1, checkpoint.x2, checkpoint.y2)
+                                             for checkpoint in self.checkpoints])
 
-    def check_checkpoints(self, car):
-        if not car.can_move or self.game_over:
-            return
-
-        for checkpoint in self.checkpoints:
-            if checkpoint.contains_point(car.center_x, car.center_y):
-                if checkpoint.is_finish_line:
-                    if car.checkpoints_passed >= len(self.checkpoints) - 1:
-                        car.checkpoints_passed = 0
-                        car.current_checkpoint = 0
-                        car.laps += 1
-                        self.play_finish_sound()
+    def finish_lap(self, car):
+        self.play_finish_sound()
 
-                        if car.laps >= WINNING_LAPS:
-                            car.is_winner = True
-                            self.game_over = True
-                            self.winner_index = 0 if car == self.red_player else 1
-                            self.play_win_sound()
+        if self.cars.laps[car] >= WINNING_LAPS:
+            self.game_over = True
+            self.winner = int(car)
+            # конфетти и победные цвета - по цвету машины игрока; победа бота - без праздника
+            if self.winner < len(PLAYER_KEYS):
+                self.winner_index = self.winner
+                self.play_win_sound()
+                self.create_confetti_explosion(self.winner_index)
 
-                            self.create_confetti_explosion(self.winner_index)
+            self.menu_button.visible = True
+            self.restart_button.visible = True
 
-                            self.menu_button.visible = True
-                            self.restart_button.visible = True
-
-                            self.red_player.can_move = False
-                            self.blue_player.can_move = False
-                            self.stop_drive_sound()
-
-                elif checkpoint.checkpoint_id == car.current_checkpoint:
-                    car.current_checkpoint += 1
-                    car.checkpoints_passed += 1
-
-                    if car.current_checkpoint >= len(self.checkpoints) - 1:
-                        car.current_checkpoint = 0
+            self.stop_drive_sound()
 
     def create_confetti_explosion(self, player_index):
         self.confetti_active = True
         self.play_confetti_sound()
 
-        colors = [
-            [(255, 0, 0), (178, 34, 34), (220, 20, 60), (255, 69, 0),
-             (255, 140, 0), (255, 99, 71), (255, 20, 147), (255, 215, 0)],
-            [(0, 0, 255), (0, 0, 139), (65, 105, 225), (70, 130, 180),
-             (100, 149, 237), (30, 144, 255), (138, 43, 226), (0, 255, 255)]
-        ][player_index]
+        colors = confetti.PLAYER_COLORS[player_index]
 
         for _ in range(5):
-            spawn_x = random.randint(100, self.width - 100)
-            spawn_y = random.randint(100, self.height - 100)
-            for _ in range(80):
-                self.confetti_particles.append(SimpleConfettiParticle(
-                    spawn_x, spawn_y, random.choice(colors), player_index
-                ))
+            spawn_x = random.randint(100, self.window.width - 100)
+            spawn_y = random.randint(100, self.window.height - 100)
+            self.confetti.emit(spawn_x, spawn_y, 80, colors)
 
     def update_confetti(self, delta_time):
         if not self.confetti_active:
             return
 
-        self.confetti_particles = [p for p in self.confetti_particles if p.update()]
+        self.confetti.update()
         self.confetti_spawn_timer += delta_time
 
         if self.confetti_spawn_timer > 0.3 and self.winner_index is not None:
             self.confetti_spawn_timer = 0
 
-            colors = [
-                [(255, 0, 0), (255, 69, 0), (255, 140, 0), (255, 215, 0)],
-                [(0, 0, 255), (65, 105, 225), (30, 144, 255), (0, 255, 255)]
-            ][self.winner_index]
+            colors = confetti.RAIN_COLORS[self.winner_index]
 
             for _ in range(3):
-                spawn_x = random.randint(0, self.width)
-                spawn_y = self.height
-                for _ in range(2):
-                    self.confetti_particles.append(SimpleConfettiParticle(
-                        spawn_x, spawn_y, random.choice(colors), self.winner_index
-                    ))
+                spawn_x = random.randint(0, self.window.width)
+                spawn_y = self.window.height
+                self.confetti.emit(spawn_x, spawn_y, 2, colors)
 
     def draw_lap_indicators(self):
         red_start_x, red_start_y = 120, 120
-        blue_start_x, blue_start_y = self.width - 120, self.height - 120
+        blue_start_x, blue_start_y = self.window.width - 120, self.window.height - 120
         circle_radius, circle_spacing = 10, 25
 
         for i in range(WINNING_LAPS):
             red_x = red_start_x + i * circle_spacing
             blue_x = blue_start_x - i * circle_spacing
 
-            if i < self.red_player.laps:
+            if i < self.cars.laps[0]:
                 arcade.draw_circle_filled(red_x, red_start_y, circle_radius, arcade.color.RED)
                 arcade.draw_circle_outline(red_x, red_start_y, circle_radius, arcade.color.WHITE, 2)
             else:
                 arcade.draw_circle_outline(red_x, red_start_y, circle_radius, arcade.color.WHITE, 2)
 
-            if i < self.blue_player.laps:
+            if i < self.cars.laps[1]:
                 arcade.draw_circle_filled(blue_x, blue_start_y, circle_radius, arcade.color.CYAN)
                 arcade.draw_circle_outline(blue_x, blue_start_y, circle_radius, arcade.color.WHITE, 2)
             else:
                 arcade.draw_circle_outline(blue_x, blue_start_y, circle_radius, arcade.color.WHITE, 2)
 
+        self.hud.set("red_place", f"{self.places[0]}/{self.cars.count}")
+        self.hud.set("blue_place", f"{self.places[1]}/{self.cars.count}")
+        self.hud.draw("red_place", "blue_place")
+
     def setup(self):
-        self.current_map = random.choice(["map1", "map2"])
+        self.rng.seed(replay.match_seed())
+        self.current_map = self.pick_map()
         self.countdown_timer = 3.0
         self.is_countdown_active = True
         self.countdown_text = "3"
@@ -368,7 +340,7 @@ class Races(arcade.Window):
         self.game_over = False
         self.winner = None
 
-        self.confetti_particles = []
+        self.confetti.clear()
         self.confetti_active = False
         self.confetti_spawn_timer = 0
         self.winner_index = None
@@ -378,105 +350,164 @@ class Races(arcade.Window):
         if hasattr(self, 'menu_button') and self.menu_button:
             self.menu_button.visible = False
 
-        map_config = MAP_CONFIGS[self.current_map]
-        map_path = resource_path(f"Assets/maps/{self.current_map}.tmx")
-
-        tile_map = arcade.load_tilemap(map_path, scaling=1.0)
-        map_width_pixels = tile_map.width * tile_map.tile_width
-        map_height_pixels = tile_map.height * tile_map.tile_height
-
-        scale_x = self.width / map_width_pixels
-        scale_y = self.height / map_height_pixels
-        final_scale = min(scale_x, scale_y)
-
-        tile_map = arcade.load_tilemap(map_path, scaling=final_scale)
+        self.load_race_map()
 
-        self.ground_list = tile_map.sprite_lists["ground"]
-        self.road_list = tile_map.sprite_lists["road"]
-        self.fance_list = tile_map.sprite_lists["fance"]
-        self.on_finish_list = tile_map.sprite_lists["on_finish"]
-        self.finish_list = tile_map.sprite_lists["finish"]
-        self.collision_list = tile_map.sprite_lists["collusion"]
+    def load_race_map(self):
+        # TMX разбирается один раз и кэшируется на диске; рестарт берёт готовую сборку
+        race_map = race_maps.load_map(self.current_map, self.window.width, self.window.height, MIN_MAP_SCALE)
+        self.race_map = race_map
+        self.map_below, self.map_above = race_map.bake(self.window)
 
-        scaled_map_width = map_width_pixels * final_scale
-        scaled_map_height = map_height_pixels * final_scale
-        offset_x = (self.width - scaled_map_width) / 2
-        offset_y = (self.height - scaled_map_height) / 2
+        self.create_cars(race_map.spawn_points())
 
-        self.all_collision_list = arcade.SpriteList()
-        for layer in [self.fance_list, self.collision_list]:
-            for sprite in layer:
-                self.all_collision_list.append(sprite)
-
-        self.red_player = RedCar(map_config["red_car_x"] + offset_x, map_config["both_car_y"] + offset_y)
-        self.blue_player = BlueCar(map_config["blue_car_x"] + offset_x, map_config["both_car_y"] + offset_y)
-
-        self.player_list = arcade.SpriteList()
-        self.player_list.append(self.red_player)
-        self.player_list.append(self.blue_player)
-
-        self.physics_engine_red = arcade.PhysicsEngineSimple(self.red_player, self.all_collision_list)
-        self.physics_engine_blue = arcade.PhysicsEngineSimple(self.blue_player, self.all_collision_list)
-
-        self.red_keys_pressed = set()
-        self.blue_keys_pressed = set()
-
-        self.red_angle = RedAngle(self.width, self.height)
-        self.blue_angle = BlueAngle(self.width, self.height)
+        self.red_angle = RedAngle(self.window.width, self.window.height)
+        self.blue_angle = BlueAngle(self.window.width, self.window.height)
         self.angles_list = arcade.SpriteList()
         self.angles_list.append(self.red_angle)
         self.angles_list.append(self.blue_angle)
 
-        self.create_checkpoints(offset_x, offset_y)
-
-    def update_car_movement(self, car, delta_time):
-        if not car.can_move or self.game_over:
-            car.change_x = 0
-            car.change_y = 0
+        self.create_checkpoints(race_map.checkpoint_rects())
+        self.track = race_track.load_track(race_map, self.checkpoint_segments)
+        self.places = self.track.places(self.cars)
+
+        self.setup_cameras()
+        self.update_cameras()
+        # куски вокруг старта печём во время отсчёта, а не на первом кадре гонки
+        for camera in self.cameras:
+            bounds = self.view_bounds(camera)
+            self.map_below.prepare(*bounds)
+            self.map_above.prepare(*bounds)
+
+    def save_state(self):
+        # Для перемотки воспроизведения: карта - по имени, машины и контроллеры - копией
+        return (self.current_map, copy.deepcopy((self.cars, self.controllers)), self.rng.getstate(),
+                self.countdown_timer, self.is_countdown_active, self.countdown_text, self.go_text_timer,
+                self.show_go_text, self.game_over, self.winner, self.winner_index)
+
+    def load_state(self, state):
+        (current_map, cars, rng_state, self.countdown_timer, self.is_countdown_active, self.countdown_text,
+         self.go_text_timer, self.show_go_text, self.game_over, self.winner, self.winner_index) = state
+        if current_map != self.current_map:
+            self.current_map = current_map
+            self.load_race_map()
+        # снимок остаётся нетронутым, чтобы на него можно было вернуться ещё раз
+        self.cars, self.controllers = copy.deepcopy(cars)
+        self.keyboard = self.controllers[:len(PLAYER_KEYS)]
+        self.rng.setstate(rng_state)
+        self.places = self.track.places(self.cars)
+        self.cars.sync_sprites(self.player_list)
+
+        self.confetti.clear()
+        self.confetti_active = self.game_over and self.winner_index is not None
+        self.confetti_spawn_timer = 0
+        self.menu_button.visible = self.game_over
+        self.restart_button.visible = self.game_over
+        self.stop_drive_sound()
+
+    def setup_cameras(self):
+        width, height = self.window.width, self.window.height
+        if self.race_map.width <= width + 1 and self.race_map.height <= height + 1:
+            # карта целиком в окне: мир совпадает с экраном, как раньше
+            self.cameras = [arcade.Camera2D()]
+            self.camera_cars = [None]
+            self.size_chunk_budget()
             return
+        vertical = RACE_SPLIT == "vertical" or RACE_SPLIT != "horizontal" and width >= height
+        if vertical:
+            viewports = [arcade.LBWH(0, 0, width // 2, height),
+                         arcade.LBWH(width // 2, 0, width - width // 2, height)]
+        else:
+            # красный снизу, синий сверху - рядом со своими индикаторами кругов
+            viewports = [arcade.LBWH(0, 0, width, height // 2),
+                         arcade.LBWH(0, height // 2, width, height - height // 2)]
+        self.cameras = [arcade.Camera2D(viewport=viewport) for viewport in viewports]
+        self.camera_cars = list(range(len(viewports)))
+        self.size_chunk_budget()
+
+    def size_chunk_budget(self):
+        # Общий пул кусков держит то, что видят все камеры сразу, с запасом на разворот
+        visible = sum(layer.chunks_for_view(camera.viewport.width, camera.viewport.height)
+                      for camera in self.cameras for layer in (self.map_below, self.map_above))
+        layer_baker.chunk_pool.budget = layer_baker.CHUNK_SLACK * visible
+
+    def update_cameras(self):
+        for camera, car in zip(self.cameras, self.camera_cars):
+            if car is None:
+                camera.position = self.window.width / 2, self.window.height / 2
+                continue
+            # камера держит машину в центре, но не выезжает за край карты
+            half_width, half_height = camera.viewport.width / 2, camera.viewport.height / 2
+            x = min(max(float(self.cars.x[car]), half_width), self.race_map.width - half_width)
+            y = min(max(float(self.cars.y[car]), half_height), self.race_map.height - half_height)
+            if self.race_map.width < camera.viewport.width:
+                x = self.race_map.width / 2
+            if self.race_map.height < camera.viewport.height:
+                y = self.race_map.height / 2
+            # край окна камеры - на целом пикселе мира, иначе куски карты ложатся между пикселями
+            camera.position = round(x - half_width) + half_width, round(y - half_height) + half_height
+
+    def view_bounds(self, camera):
+        x, y = camera.position
+        half_width, half_height = camera.viewport.width / 2, camera.viewport.height / 2
+        return x - half_width, y - half_height, x + half_width, y + half_height
+
+    def pick_map(self):
+        catalog = race_maps.get_catalog()
+        playable = catalog.playable()
+        if RACE_MAP:
+            if RACE_MAP not in playable:
+                entry = catalog.entries.get(RACE_MAP)
+                reason = "not found" if entry is None else entry["error"] or "no spawns or finish in its race layer"
+                raise ValueError(f"RACE_MAP={RACE_MAP!r}: {reason}; playable maps: {', '.join(playable) or 'none'}")
+            return RACE_MAP
+        if not playable:
+            raise RuntimeError(f"no playable race maps in {race_maps.MAPS_DIR}: each needs a "
+                               f"{race_maps.RACE_LAYER!r} object layer with two spawns and a finish")
+        return self.rng.choice(playable)
+
+    def spawn_positions(self, count, anchors, outline):
+        # Решётка за стартом: первые места - машины игроков, полосы вдоль линии между ними,
+        # ряды - назад от курса первого старта; место годится, если контур машины не задевает стен
+        (first_x, first_y, heading), (second_x, second_y, _) = anchors
+        lane_x, lane_y = (second_x - first_x) / 3, (second_y - first_y) / 3
+        angle = np.radians(heading)
+        back_x, back_y = -np.sin(angle) * SPAWN_ROW_GAP, -np.cos(angle) * SPAWN_ROW_GAP
+        # контур повёрнут так же, как race_cars.Cars.outline_offsets
+        offset_x = outline[:, 0] * np.cos(angle) + outline[:, 1] * np.sin(angle)
+        offset_y = outline[:, 1] * np.cos(angle) - outline[:, 0] * np.sin(angle)
+        positions = []
+        for row in range(SPAWN_MAX_ROWS):
+            for lane in SPAWN_LANES:
+                x = first_x + lane * lane_x + row * back_x
+                y = first_y + lane * lane_y + row * back_y
+                surfaces = self.race_map.surfaces(offset_x + x, offset_y + y)
+                if row == 0 and lane in (0, 3) or not (surfaces == race_maps.SURFACE_WALL).any():
+                    positions.append((x, y, heading))
+                if len(positions) == count:
+                    return positions
+        # трасса тесная - лишние машины ставятся друг на друга
+        return [positions[i % len(positions)] for i in range(count)]
+
+    def create_cars(self, spawns):
+        count = len(PLAYER_KEYS) + self.bot_count
+        sprites = []
+        for i in range(count):
+            color = arcade.color.WHITE if i < len(PLAYER_KEYS) else BOT_TINTS[i % len(BOT_TINTS)]
+            sprites.append(CarSprite(CAR_TEXTURES[i % len(CAR_TEXTURES)], 0, 0, color))
+
+        # Старты из карты идут первыми, остальным машинам решётка строится от первых двух
+        outlines = [race_cars.car_outline(sprite) for sprite in sprites]
+        grid = self.spawn_positions(count, spawns[:2], np.array(outlines[0]))
+        positions = spawns[:count] + grid[len(spawns):]
+
+        self.cars = race_cars.Cars([position[:2] for position in positions], outlines,
+                                   [position[2] for position in positions])
+        self.player_list = arcade.SpriteList()
+        self.player_list.extend(sprites)
+        self.cars.sync_sprites(self.player_list)
 
-        max_steering_angle = 45
-
-        if car == self.red_player:
-            if arcade.key.A in self.red_keys_pressed and arcade.key.D not in self.red_keys_pressed:
-                car.steering_angle = -max_steering_angle
-            elif arcade.key.D in self.red_keys_pressed and arcade.key.A not in self.red_keys_pressed:
-                car.steering_angle = max_steering_angle
-            else:
-                car.steering_angle *= 0.7
-
-            if arcade.key.S in self.red_keys_pressed:
-                car.is_reversing = True
-            else:
-                car.is_reversing = False
-
-        elif car == self.blue_player:
-            if arcade.key.LEFT in self.blue_keys_pressed and arcade.key.RIGHT not in self.blue_keys_pressed:
-                car.steering_angle = -max_steering_angle
-            elif arcade.key.RIGHT in self.blue_keys_pressed and arcade.key.LEFT not in self.blue_keys_pressed:
-                car.steering_angle = max_steering_angle
-            else:
-                car.steering_angle *= 0.7
-
-            if arcade.key.DOWN in self.blue_keys_pressed:
-                car.is_reversing = True
-            else:
-                car.is_reversing = False
-
-        car.steering_angle = max(-max_steering_angle, min(max_steering_angle, car.steering_angle))
-
-        speed = -car.reverse_speed if car.is_reversing else car.speed
-        steering_rad = math.radians(car.steering_angle)
-        angle_rad = math.radians(car.angle)
-        new_angle_rad = angle_rad + steering_rad * delta_time * 1.5
-        car.angle = math.degrees(new_angle_rad)
-
-        car.change_x = math.sin(new_angle_rad) * abs(speed)
-        car.change_y = math.cos(new_angle_rad) * abs(speed)
-
-        if speed < 0:
-            car.change_x = -car.change_x
-            car.change_y = -car.change_y
+        self.keyboard = [race_cars.KeyboardController(i, *keys) for i, keys in enumerate(PLAYER_KEYS)]
+        self.controllers = self.keyboard + [race_cars.BotController(range(len(PLAYER_KEYS), count))]
 
     def update_countdown(self, delta_time):
         if not self.is_countdown_active:
@@ -499,91 +530,91 @@ class Races(arcade.Window):
             self.is_countdown_active = False
             self.show_go_text = True
             self.go_text_timer = 1.0
-            self.red_player.can_move = True
-            self.blue_player.can_move = True
-            angle_rad = math.radians(self.red_player.angle)
-            self.red_player.change_x = math.sin(angle_rad) * self.red_player.speed
-            self.red_player.change_y = math.cos(angle_rad) * self.red_player.speed
-
-            angle_rad = math.radians(self.blue_player.angle)
-            self.blue_player.change_x = math.sin(angle_rad) * self.blue_player.speed
-            self.blue_player.change_y = math.cos(angle_rad) * self.blue_player.speed
-
-            if not self.red_player.has_started and not self.blue_player.has_started:
-                self.play_start_sound()
-                self.red_player.has_started = True
-                self.blue_player.has_started = True
+            self.play_start_sound()
 
     def on_draw(self):
         self.clear()
 
-        self.ground_list.draw()
-        self.road_list.draw()
-        self.player_list.draw()
-        self.finish_list.draw()
-        self.on_finish_list.draw()
-        self.fance_list.draw()
+        self.update_cameras()
+        for camera in self.cameras:
+            bounds = self.view_bounds(camera)
+            with camera.activate():
+                with profiler.phase("tilemap"):
+                    self.map_below.draw(*bounds)
+                with profiler.phase("cars"):
+                    self.player_list.draw()
+                with profiler.phase("tilemap"):
+                    self.map_above.draw(*bounds)
+        if len(self.cameras) > 1:
+            viewport = self.cameras[1].viewport
+            if viewport.left > 0:
+                arcade.draw_line(viewport.left, 0, viewport.left, self.window.height,
+                                 arcade.color.BLACK, SPLIT_LINE_WIDTH)
+            else:
+                arcade.draw_line(0, viewport.bottom, self.window.width, viewport.bottom,
+                                 arcade.color.BLACK, SPLIT_LINE_WIDTH)
         self.angles_list.draw()
 
         if not self.is_countdown_active and not self.show_go_text and not self.game_over:
             self.draw_lap_indicators()
 
-        for particle in self.confetti_particles:
-            particle.draw()
+        with profiler.phase("confetti"):
+            self.confetti.draw()
 
         if self.game_over:
-            self.manager.draw()
+            with profiler.phase("ui"):
+                self.manager.draw()
 
         elif self.is_countdown_active:
-            arcade.draw_lrbt_rectangle_filled(0, self.width, 0, self.height, (0, 0, 0, 150))
+            arcade.draw_lrbt_rectangle_filled(0, self.window.width, 0, self.window.height, (0, 0, 0, 150))
 
-            font_size = 200
-            color = arcade.color.WHITE
-
-            arcade.draw_text(self.countdown_text, self.width // 2, self.height // 2, color, font_size,
-                             anchor_x="center", anchor_y="center", bold=True)
-
-            arcade.draw_text("Красная машина: A/D/S | Синяя машина: ←/→/↓ ", self.width // 2, self.height // 2 - 100,
-                             arcade.color.LIGHT_GRAY, 20, anchor_x="center", anchor_y="center")
+            self.hud.set("countdown", self.countdown_text)
+            self.hud.draw("countdown", "hint")
 
         elif self.show_go_text:
-            arcade.draw_lrbt_rectangle_filled(0, self.width, 0, self.height,
+            arcade.draw_lrbt_rectangle_filled(0, self.window.width, 0, self.window.height,
                                               (0, 0, 0, max(0, int(150 * self.go_text_timer))))
 
             alpha = max(0, min(255, int(255 * self.go_text_timer)))
-            arcade.draw_text("GO!", self.width // 2, self.height // 2, (0, 255, 0, alpha), 180,
-                             anchor_x="center", anchor_y="center", bold=True)
+            self.hud["go"].color = (0, 255, 0, alpha)
+            self.hud.draw("go")
 
     def on_update(self, delta_time):
         if self.game_over:
             if self.confetti_active:
-                self.update_confetti(delta_time)
+                with profiler.phase("confetti"):
+                    self.update_confetti(delta_time)
             return
 
         self.update_countdown(delta_time)
 
         if not self.is_countdown_active and not self.show_go_text:
-            self.update_car_movement(self.red_player, delta_time)
-            self.update_car_movement(self.blue_player, delta_time)
-
-            self.physics_engine_red.update()
-            self.physics_engine_blue.update()
-
-            self.check_checkpoints(self.red_player)
-            self.check_checkpoints(self.blue_player)
-
-            if self.red_player.can_move and self.blue_player.can_move:
+            with profiler.phase("physics"):
+                for controller in self.controllers:
+                    controller.control(self.cars, self)
+                self.cars.step(delta_time, self.race_map)
+
+            with profiler.phase("checkpoints"):
+                for car in self.cars.check_checkpoints(self.checkpoint_segments):
+                    self.finish_lap(car)
+                    if self.game_over:
+                        break
+                self.places = self.track.places(self.cars)
+
+            with profiler.phase("sprites"):
+                self.cars.sync_sprites(self.player_list)
+
+            if not self.game_over:
                 self.play_drive_sound()
 
     def on_key_press(self, key, modifiers):
         if self.is_countdown_active:
             return
 
-        if key in [arcade.key.A, arcade.key.D, arcade.key.S]:
-            self.red_keys_pressed.add(key)
-        elif key in [arcade.key.LEFT, arcade.key.RIGHT, arcade.key.DOWN]:
-            self.blue_keys_pressed.add(key)
-        elif key == arcade.key.R:
+        for controller in self.keyboard:
+            if controller.on_key_press(key):
+                return
+        if key == arcade.key.R:
             self.restart_game()
 
     def on_mouse_press(self, x: int, y: int, button: int, modifiers: int):
@@ -595,30 +626,13 @@ class Races(arcade.Window):
         if self.is_countdown_active:
             return
 
-        if key in [arcade.key.A, arcade.key.D, arcade.key.S]:
-            if key in self.red_keys_pressed:
-                self.red_keys_pressed.remove(key)
-
-            if key == arcade.key.S:
-                self.red_player.is_reversing = False
-                angle_rad = math.radians(self.red_player.angle)
-                self.red_player.change_x = math.sin(angle_rad) * self.red_player.speed
-                self.red_player.change_y = math.cos(angle_rad) * self.red_player.speed
-
-        elif key in [arcade.key.LEFT, arcade.key.RIGHT, arcade.key.DOWN]:
-            if key in self.blue_keys_pressed:
-                self.blue_keys_pressed.remove(key)
-
-            if key == arcade.key.DOWN:
-                self.blue_player.is_reversing = False
-                angle_rad = math.radians(self.blue_player.angle)
-                self.blue_player.change_x = math.sin(angle_rad) * self.blue_player.speed
-                self.blue_player.change_y = math.cos(angle_rad) * self.blue_player.speed
+        for controller in self.keyboard:
+            if controller.on_key_release(key):
+                return
 
 
 def main():
-    game = Races()
-    arcade.run()
+    scenes.run("races")
 
 
 if __name__ == "__main__":
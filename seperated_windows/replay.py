@@ -0,0 +1,365 @@
+import argparse
+import bisect
+import random
+import struct
+
+import arcade
+from pyglet.event import EVENT_HANDLED
+
+# Заголовок: magic, seed, размер окна, длина имени сцены; затем имя сцены и тики.
+# В конце файла индекс для перемотки и FOOTER с его смещением.
+MAGIC = b"RPLY0001"
+INDEX_MAGIC = b"RPLYIDX1"
+HEADER = struct.Struct("<8sQHHH")
+INDEX_ENTRY = struct.Struct("<IQd")
+FOOTER = struct.Struct("<QI8s")
+DT = struct.Struct("<d")
+
+# Каждые SEEK_INTERVAL тиков пишется точка индекса (тик, смещение, время матча)
+SEEK_INTERVAL = 300
+FLUSH_BYTES = 64 * 1024
+SEEK_STEP = 10.0
+SPEEDS = [0.25, 0.5, 1, 2, 4, 8, 16, 64]
+
+KEY_PRESS = 1
+KEY_RELEASE = 2
+MOUSE_PRESS = 3
+MOUSE_RELEASE = 4
+
+EVENT_NAMES = {
+    KEY_PRESS: "on_key_press",
+    KEY_RELEASE: "on_key_release",
+    MOUSE_PRESS: "on_mouse_press",
+    MOUSE_RELEASE: "on_mouse_release",
+}
+
+# Служебные клавиши окна (профайлеры) не пишутся и не блокируются при воспроизведении
+PASSTHROUGH_KEYS = (arcade.key.F3, arcade.key.F4, arcade.key.F5)
+
+INPUT_EVENTS = ["on_key_press", "on_key_release", "on_mouse_press", "on_mouse_release",
+                "on_mouse_motion", "on_mouse_drag", "on_mouse_scroll", "on_text", "on_text_motion"]
+
+# Общий генератор сидов матчей: при записи и при воспроизведении
+# его заводят одним и тем же seed, поэтому матчи получают одинаковые сиды
+session = random.Random()
+
+
+def start_session(seed):
+    session.seed(seed)
+    # косметика (машинки в меню, конфетти) тоже повторяется
+    random.seed(seed)
+
+
+def match_seed():
+    return session.getrandbits(63)
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value):
+    return value >> 1 if value % 2 == 0 else -(value >> 1) - 1
+
+
+class Recorder:
+    def __init__(self, path, scene, width, height, seed=None):
+        self.seed = random.SystemRandom().getrandbits(63) if seed is None else seed
+        start_session(self.seed)
+        self.file = open(path, "wb")
+        name = scene.encode("utf-8")
+        self.file.write(HEADER.pack(MAGIC, self.seed, width, height, len(name)) + name)
+        self.offset = self.file.tell()
+        self.buffer = bytearray()
+        self.events = []
+        self.index = []
+        self.tick = 0
+        self.elapsed = 0.0
+        self.last_dt = None
+
+    def on_key_press(self, symbol, modifiers):
+        if symbol not in PASSTHROUGH_KEYS:
+            self.events.append((KEY_PRESS, symbol, modifiers))
+
+    def on_key_release(self, symbol, modifiers):
+        if symbol not in PASSTHROUGH_KEYS:
+            self.events.append((KEY_RELEASE, symbol, modifiers))
+
+    def on_mouse_press(self, x, y, button, modifiers):
+        self.events.append((MOUSE_PRESS, round(x), round(y), button, modifiers))
+
+    def on_mouse_release(self, x, y, button, modifiers):
+        self.events.append((MOUSE_RELEASE, round(x), round(y), button, modifiers))
+
+    def on_update(self, delta_time):
+        # Тик = события с прошлого on_update + сам delta_time; dt пишется точно,
+        # иначе таймеры игр разойдутся при воспроизведении
+        if self.file is None:
+            return
+        if self.tick % SEEK_INTERVAL == 0:
+            self.index.append((self.tick, self.offset + len(self.buffer), self.elapsed))
+            # с точки индекса можно читать отдельно, поэтому dt там пишется всегда
+            self.last_dt = None
+
+        out = self.buffer
+        dt_changed = delta_time != self.last_dt
+        write_varint(out, len(self.events) << 1 | dt_changed)
+        if dt_changed:
+            out += DT.pack(delta_time)
+            self.last_dt = delta_time
+        for kind, *args in self.events:
+            out.append(kind)
+            if kind in (MOUSE_PRESS, MOUSE_RELEASE):
+                x, y, button, modifiers = args
+                args = (zigzag(x), zigzag(y), button, modifiers)
+            for value in args:
+                write_varint(out, value)
+        self.events.clear()
+        self.tick += 1
+        self.elapsed += delta_time
+
+        if len(out) >= FLUSH_BYTES:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.offset += len(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        index_offset = self.offset
+        for entry in self.index:
+            self.file.write(INDEX_ENTRY.pack(*entry))
+        self.file.write(FOOTER.pack(index_offset, len(self.index), INDEX_MAGIC))
+        self.file.close()
+        self.file = None
+
+
+class Replay:
+    def __init__(self, path):
+        with open(path, "rb") as source:
+            self.data = source.read()
+        magic, self.seed, self.width, self.height, name_size = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a replay")
+        self.scene = self.data[HEADER.size:HEADER.size + name_size].decode("utf-8")
+        self.body_start = HEADER.size + name_size
+
+        index_offset, count, index_magic = FOOTER.unpack_from(self.data, len(self.data) - FOOTER.size)
+        if index_magic != INDEX_MAGIC:
+            raise ValueError(f"{path} is truncated: no seek index")
+        self.body_end = index_offset
+        self.index = [INDEX_ENTRY.unpack_from(self.data, index_offset + i * INDEX_ENTRY.size) for i in range(count)]
+        self.index_times = [elapsed for _, _, elapsed in self.index]
+
+    def ticks(self, offset=None):
+        data = self.data
+        pos = self.body_start if offset is None else offset
+        dt = None
+        while pos < self.body_end:
+            header, pos = read_varint(data, pos)
+            if header & 1:
+                dt = DT.unpack_from(data, pos)[0]
+                pos += DT.size
+            events = []
+            for _ in range(header >> 1):
+                kind = data[pos]
+                pos += 1
+                args = []
+                for _ in range(4 if kind in (MOUSE_PRESS, MOUSE_RELEASE) else 2):
+                    value, pos = read_varint(data, pos)
+                    args.append(value)
+                if kind in (MOUSE_PRESS, MOUSE_RELEASE):
+                    args[0], args[1] = unzigzag(args[0]), unzigzag(args[1])
+                events.append((kind, args))
+            yield dt, events
+
+    def seek_point(self, match_time):
+        # Ближайшая точка индекса не позже match_time: (тик, смещение, время)
+        position = bisect.bisect_right(self.index_times, match_time) - 1
+        return self.index[max(0, position)] if self.index else (0, self.body_start, 0.0)
+
+    def duration(self):
+        ticks = elapsed = 0
+        for dt, _ in self.ticks():
+            ticks += 1
+            elapsed += dt
+        return ticks, elapsed
+
+
+class Player:
+    # Стоит поверх всех обработчиков окна: глотает живой ввод и on_update
+    # и вместо них подаёт записанные события с записанным dt
+    def __init__(self, window, replay, speed=1.0):
+        self.window = window
+        self.replay = replay
+        self.speed = speed
+        self.paused = False
+        self.injecting = False
+        self.scale_x = window.width / replay.width
+        self.scale_y = window.height / replay.height
+        self.restart()
+
+    def restart(self):
+        start_session(self.replay.seed)
+        self.stream = self.replay.ticks()
+        self.tick = 0
+        self.elapsed = 0.0
+        self.budget = 0.0
+        self.finished = False
+        # тик точки индекса -> состояние окна и генераторов на этом тике; снимается,
+        # когда воспроизведение проходит точку, если сцена умеет save_state
+        self.snapshots = {}
+
+    def take_snapshot(self):
+        if self.tick % SEEK_INTERVAL or self.tick in self.snapshots:
+            return
+        # тик сразу за последним записанным - в индексе его нет
+        if self.tick // SEEK_INTERVAL >= len(self.replay.index):
+            return
+        state = self.window.save_state()
+        if state is not None:
+            self.snapshots[self.tick] = state, session.getstate(), random.getstate()
+
+    def nearest_snapshot(self, match_time):
+        tick = self.replay.seek_point(match_time)[0]
+        while tick > 0 and tick not in self.snapshots:
+            tick -= SEEK_INTERVAL
+        return tick if tick in self.snapshots else None
+
+    def jump(self, tick):
+        # Читатель переходит прямо на смещение точки индекса, состояние берётся из снимка
+        index_tick, offset, elapsed = self.replay.index[tick // SEEK_INTERVAL]
+        state, session_state, random_state = self.snapshots[index_tick]
+        self.window.load_state(state)
+        session.setstate(session_state)
+        random.setstate(random_state)
+        self.stream = self.replay.ticks(offset)
+        self.tick = index_tick
+        self.elapsed = elapsed
+        self.finished = False
+
+    def inject(self, name, *args):
+        self.injecting = True
+        try:
+            self.window.dispatch_event(name, *args)
+        finally:
+            self.injecting = False
+
+    def play_tick(self):
+        self.take_snapshot()
+        try:
+            dt, events = next(self.stream)
+        except StopIteration:
+            self.finished = True
+            return 0.0
+        for kind, args in events:
+            if kind in (MOUSE_PRESS, MOUSE_RELEASE):
+                x, y, button, modifiers = args
+                args = (x * self.scale_x, y * self.scale_y, button, modifiers)
+            self.inject(EVENT_NAMES[kind], *args)
+        self.inject("on_update", dt)
+        self.tick += 1
+        self.elapsed += dt
+        return dt
+
+    def seek(self, match_time):
+        # С ближайшей точки индекса, где уже есть снимок состояния; без снимка назад - заново
+        # с начала матча. Дальше до match_time - перемотка без отрисовки
+        tick = self.nearest_snapshot(match_time)
+        if tick is not None and (match_time < self.elapsed or tick > self.tick):
+            self.jump(tick)
+        elif match_time < self.elapsed:
+            snapshots = self.snapshots
+            self.window.reset_scenes()
+            self.restart()
+            self.snapshots = snapshots
+            self.window.show_scene(self.replay.scene)
+        while not self.finished and self.elapsed < match_time:
+            self.play_tick()
+        self.budget = 0.0
+
+    def on_update(self, delta_time):
+        if self.injecting:
+            return None
+        if not self.paused:
+            self.budget += delta_time * self.speed
+            while not self.finished and self.budget > 0:
+                self.budget -= self.play_tick()
+        return EVENT_HANDLED
+
+    def on_key_press(self, symbol, modifiers):
+        if self.injecting or symbol in PASSTHROUGH_KEYS:
+            return None
+        if symbol == arcade.key.SPACE:
+            self.paused = not self.paused
+        elif symbol in (arcade.key.PLUS, arcade.key.EQUAL, arcade.key.NUM_ADD):
+            self.speed = SPEEDS[min(bisect.bisect_right(SPEEDS, self.speed), len(SPEEDS) - 1)]
+        elif symbol in (arcade.key.MINUS, arcade.key.NUM_SUBTRACT):
+            self.speed = SPEEDS[max(bisect.bisect_left(SPEEDS, self.speed) - 1, 0)]
+        elif symbol == arcade.key.RIGHT:
+            self.seek(self.elapsed + SEEK_STEP)
+        elif symbol == arcade.key.LEFT:
+            self.seek(max(0.0, self.elapsed - SEEK_STEP))
+        elif symbol == arcade.key.ESCAPE:
+            self.window.close()
+        return EVENT_HANDLED
+
+    def block(self, *args):
+        return None if self.injecting else EVENT_HANDLED
+
+
+for _name in INPUT_EVENTS:
+    if not hasattr(Player, _name):
+        setattr(Player, _name, Player.block)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a recorded match")
+    parser.add_argument("replay")
+    parser.add_argument("--events-from", type=float, default=None, metavar="SECONDS",
+                        help="print recorded input starting at this match time")
+    args = parser.parse_args()
+
+    replay = Replay(args.replay)
+    ticks, elapsed = replay.duration()
+    print(f"scene: {replay.scene}")
+    print(f"seed: {replay.seed}")
+    print(f"window: {replay.width}x{replay.height}")
+    print(f"ticks: {ticks}, {elapsed:.1f} s, {len(replay.data)} bytes")
+    print(f"seek points: {len(replay.index)}")
+
+    if args.events_from is not None:
+        tick, offset, match_time = replay.seek_point(args.events_from)
+        for dt, events in replay.ticks(offset):
+            for kind, values in events:
+                if match_time < args.events_from:
+                    break
+                print(f"{tick:8d} {match_time:9.3f}  {EVENT_NAMES[kind]} {values}")
+            tick += 1
+            match_time += dt
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import arcade
+
+from profiler import PROFILE_DIR
+
+CAPTURE_KEY = arcade.key.F5
+CAPTURE_SECONDS = 10.0
+SAMPLE_INTERVAL = 0.002
+
+
+class StackSampler(threading.Thread):
+    # Отдельный поток раз в SAMPLE_INTERVAL снимает стек главного потока;
+    # пока захват не запущен, потока нет и игра ничего не платит
+    def __init__(self, tags, seconds=CAPTURE_SECONDS, interval=SAMPLE_INTERVAL):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.tags = tags
+        self.seconds = seconds
+        self.interval = interval
+        self.target = threading.main_thread().ident
+        self.counts = Counter()
+        self.labels = {}
+        self.samples = 0
+        self.path = None
+
+    def label(self, code):
+        label = self.labels.get(code)
+        if label is None:
+            label = self.labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def sample(self):
+        frame = sys._current_frames().get(self.target)
+        stack = []
+        while frame is not None:
+            stack.append(self.label(frame.f_code))
+            frame = frame.f_back
+        if stack:
+            self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def run(self):
+        started = time.perf_counter()
+        deadline = started + self.seconds
+        while time.perf_counter() < deadline:
+            self.sample()
+            time.sleep(self.interval)
+        self.tags["duration"] = time.perf_counter() - started
+        self.tags["samples"] = self.samples
+        self.path = self.write()
+        print(f"stack samples written to {self.path}")
+
+    def write(self):
+        # Формат collapsed stacks: "корень;...;лист количество" - его читают
+        # flamegraph.pl, speedscope и inferno; теги лежат рядом в .json
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = "-".join(str(self.tags[key]) for key in ("game", "map") if self.tags.get(key))
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        seconds = self.tags.get("match_time", self.tags["scene_time"])
+        base = os.path.join(PROFILE_DIR, f"stacks-{name or 'window'}-t{seconds:.0f}-{stamp}")
+        with open(base + ".folded", "w") as out:
+            for stack, count in self.counts.most_common():
+                out.write(f"{stack} {count}\n")
+        with open(base + ".json", "w") as out:
+            json.dump(self.tags, out, indent=2, ensure_ascii=False)
+        return base + ".folded"
+
+
+capture = None
+
+
+def start_capture(window, seconds=CAPTURE_SECONDS):
+    global capture
+    if capture is not None and capture.is_alive():
+        return capture
+    view = window.current_view
+    tags = {
+        "game": window.scene_name,
+        "map": getattr(view, "current_map", None),
+        "scene_time": time.perf_counter() - window.scene_started,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "interval": SAMPLE_INTERVAL,
+    }
+    # при записи и воспроизведении есть и время матча - сумма dt, как её видела игра
+    player = window.replay_handler
+    if player is not None and hasattr(player, "elapsed"):
+        tags["match_time"] = player.elapsed
+    capture = StackSampler(tags, seconds)
+    capture.start()
+    return capture
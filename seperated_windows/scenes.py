@@ -0,0 +1,120 @@
+import atexit
+import importlib
+import os
+import time
+
+import arcade
+
+import assets
+import replay
+import sampler
+from profiler import DUMP_KEY, TOGGLE_KEY, profiler
+
+WINDOW_TITLE = "Games for 2 players"
+
+# имя сцены -> (модуль, класс View)
+SCENES = {
+    "menu": ("interface", "MyGame"),
+    "croco": ("croco_game", "CrocoGame"),
+    "races": ("races_game", "Races"),
+    "snakes": ("snakes_battle", "SnakeBattle"),
+    "tanks": ("tanks", "TankGame"),
+}
+
+
+class SceneWindow(arcade.Window):
+    def __init__(self, fullscreen=True, width=1280, height=720):
+        super().__init__(width, height, WINDOW_TITLE, fullscreen=fullscreen)
+        self.scenes = {}
+        self.scene_name = None
+        # момент входа в сцену; время в ней считает только захват профайлера, когда он запущен
+        self.scene_started = time.perf_counter()
+        self.replay_handler = None
+        assets.preload_sprites(self.ctx)
+
+    def get_scene(self, name):
+        view = self.scenes.get(name)
+        if view is None:
+            module_name, class_name = SCENES[name]
+            module = importlib.import_module(module_name)
+            view = getattr(module, class_name)()
+            self.scenes[name] = view
+        return view
+
+    def show_scene(self, name):
+        view = self.get_scene(name)
+        self.scene_name = name
+        self.scene_started = time.perf_counter()
+        profiler.scene = name
+        self.show_view(view)
+        # запись/воспроизведение должны видеть ввод раньше View и UIManager
+        if self.replay_handler is not None:
+            self.remove_handlers(self.replay_handler)
+            self.push_handlers(self.replay_handler)
+        return view
+
+    def dispatch_event(self, event_type, *args):
+        if profiler.enabled:
+            if event_type == "on_update":
+                return profiler.measure_update(super().dispatch_event, *args)
+            if event_type == "on_draw":
+                return profiler.measure_draw(self, super().dispatch_event)
+        return super().dispatch_event(event_type, *args)
+
+    def on_key_press(self, symbol, modifiers):
+        if symbol == TOGGLE_KEY:
+            profiler.toggle()
+        elif symbol == DUMP_KEY and profiler.enabled:
+            print(f"frame profile written to {profiler.dump_csv()}")
+        elif symbol == sampler.CAPTURE_KEY:
+            sampler.start_capture(self)
+
+    def reset_scenes(self):
+        import interface
+        self.scenes.clear()
+        interface.count_of_red = 0
+        interface.count_of_blue = 0
+
+    def save_state(self):
+        # Снимок для перемотки воспроизведения; None - сцена состояние не отдаёт
+        import interface
+        view = self.current_view
+        if not hasattr(view, "save_state"):
+            return None
+        return self.scene_name, view.save_state(), interface.count_of_red, interface.count_of_blue
+
+    def load_state(self, state):
+        import interface
+        scene, view_state, interface.count_of_red, interface.count_of_blue = state
+        view = self.get_scene(scene)
+        if self.current_view is not view:
+            self.show_scene(scene)
+        view.load_state(view_state)
+
+    def start_recording(self, path, scene):
+        recorder = replay.Recorder(path, scene, self.width, self.height)
+        atexit.register(recorder.close)
+        self.replay_handler = recorder
+        return recorder
+
+    def start_playback(self, path, speed=1.0):
+        player = replay.Player(self, replay.Replay(path), speed)
+        self.replay_handler = player
+        return player
+
+
+def run(name="menu"):
+    window = SceneWindow()
+    if os.environ.get("PROFILER"):
+        profiler.enable()
+    # REPLAY_RECORD=путь пишет матч, REPLAY_PLAY=путь проигрывает его (REPLAY_SPEED - скорость)
+    if os.environ.get("REPLAY_PLAY"):
+        player = window.start_playback(os.environ["REPLAY_PLAY"], float(os.environ.get("REPLAY_SPEED", 1)))
+        name = player.replay.scene
+    elif os.environ.get("REPLAY_RECORD"):
+        window.start_recording(os.environ["REPLAY_RECORD"], name)
+    window.show_scene(name)
+    # SAMPLE_PROFILE=секунды - снять стеки сразу после запуска
+    if os.environ.get("SAMPLE_PROFILE"):
+        sampler.start_capture(window, float(os.environ["SAMPLE_PROFILE"]))
+    arcade.run()
@@ -0,0 +1,161 @@
+import random
+from collections import deque
+
+COLS = 30
+ROWS = 30
+BASE_SPEED = 0.15
+MIN_SPEED = 0.04
+SPEED_STEP = 0.005
+APPLE_COUNT = 2
+
+UP = (0, 1)
+DOWN = (0, -1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+
+RED = 0
+BLUE = 1
+
+# (колонка, ряд, направление) головы; второй сегмент стоит позади головы
+START_POSITIONS = [(5, 15, RIGHT), (25, 15, LEFT)]
+
+
+class SnakeBody:
+    def __init__(self, col, row, direction, sim):
+        self.sim = sim
+        self.head_col = col
+        self.head_row = row
+        self.direction = direction
+        # второй сегмент ставится позади головы против направления, у Player 2 хвост справа;
+        # клетка упакована в row * cols + col
+        self.segments = deque()
+        self.push(sim.cell(col - direction[0], row - direction[1]))
+        self.push(sim.cell(col, row))
+
+    def push(self, cell):
+        self.segments.append(cell)
+        self.sim.grid[cell] += 1
+
+    def pop_tail(self):
+        cell = self.segments.popleft()
+        self.sim.grid[cell] -= 1
+        return cell
+
+    def turn(self, direction):
+        # Поворот только поперёк текущего движения, как раньше по клавишам
+        if direction[0] and self.direction[0] == 0 or direction[1] and self.direction[1] == 0:
+            self.direction = direction
+
+    def move(self):
+        # None, если голова ушла за стену - тогда в сетку её не кладём
+        self.head_col += self.direction[0]
+        self.head_row += self.direction[1]
+        if not self.sim.inside(self.head_col, self.head_row):
+            return None
+        cell = self.sim.cell(self.head_col, self.head_row)
+        self.push(cell)
+        return cell
+
+    @property
+    def head_cell(self):
+        return self.segments[-1]
+
+
+class SnakeSim:
+    # Правила Snake Battle без окна и GL: шаг симуляции - step(inputs)
+    def __init__(self, seed=None, cols=COLS, rows=ROWS):
+        self.cols = cols
+        self.rows = rows
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed = seed
+            self.rng.seed(seed)
+        self.grid = bytearray(self.cols * self.rows)
+        self.snakes = [SnakeBody(col, row, direction, self) for col, row, direction in START_POSITIONS]
+        self.scores = [0, 0]
+        self.apples = set()
+        self.current_speed = BASE_SPEED
+        self.timer = 0
+        self.ticks = 0
+        self.game_over = False
+        self.winner = None
+        for _ in range(APPLE_COUNT):
+            self.spawn_apple()
+
+    def cell(self, col, row):
+        return row * self.cols + col
+
+    def cell_col_row(self, cell):
+        row, col = divmod(cell, self.cols)
+        return col, row
+
+    def inside(self, col, row):
+        return 0 <= col < self.cols and 0 <= row < self.rows
+
+    def spawn_apple(self):
+        new_apple = self.rng.randrange(len(self.grid))
+        while new_apple in self.apples or self.grid[new_apple]:
+            new_apple = self.rng.randrange(len(self.grid))
+        self.apples.add(new_apple)
+        return new_apple
+
+    def turn(self, player, direction):
+        self.snakes[player].turn(direction)
+
+    def advance(self, delta_time, inputs=None):
+        # Шаг по реальному времени: не чаще, чем раз в current_speed секунд
+        if self.game_over:
+            return []
+        self.timer += delta_time
+        if self.timer < self.current_speed:
+            return []
+        self.timer = 0
+        return self.step(inputs)
+
+    def step(self, inputs=None):
+        # inputs - направление (или None) для каждого игрока. Возвращает события тика:
+        # ("move", игрок, голова, хвост или None), ("eat", игрок, яблоко, новое яблоко),
+        # ("crash", победитель или None)
+        if self.game_over:
+            return []
+        if inputs:
+            for player, direction in enumerate(inputs):
+                if direction is not None:
+                    self.turn(player, direction)
+
+        self.ticks += 1
+        self.current_speed = max(MIN_SPEED, BASE_SPEED - sum(self.scores) * SPEED_STEP)
+        events = []
+        hit_wall = False
+        for player, snake in enumerate(self.snakes):
+            head = snake.move()
+            if head is None:
+                hit_wall = True
+                continue
+            if head in self.apples:
+                self.scores[player] += 1
+                self.apples.remove(head)
+                events.append(("move", player, head, None))
+                events.append(("eat", player, head, self.spawn_apple()))
+            else:
+                events.append(("move", player, head, snake.pop_tail()))
+
+        # Голова одна в своей клетке, если не врезалась ни в тело, ни в другую голову
+        if hit_wall or any(self.grid[snake.head_cell] > 1 for snake in self.snakes):
+            self.game_over = True
+            if self.scores[RED] > self.scores[BLUE]:
+                self.winner = RED
+            elif self.scores[BLUE] > self.scores[RED]:
+                self.winner = BLUE
+            events.append(("crash", self.winner))
+        return events
+
+    def run(self, max_ticks, controller=None):
+        # Перемотка без окна: controller(sim) возвращает inputs на тик
+        while not self.game_over and self.ticks < max_ticks:
+            self.step(controller(self) if controller else None)
+        return self.ticks
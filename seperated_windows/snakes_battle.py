@@ -1,90 +1,120 @@
 import arcade
+import copy
 import random
 import math
-import os
-import sys
-#from interface import count_of_blue, count_of_red
+from collections import deque
+import assets
+import hud
+import interface
+import replay
+from profiler import profiler
+import scenes
+import snake_sim
 
 SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 600
 SCREEN_TITLE = "SNAKE BATTLE"
 CELL_SIZE = 20
-BASE_SPEED = 0.15
-MIN_SPEED = 0.04
+
+# Поле - решётка клеток CELL_SIZE, клетка упакована в одно число row * COLS + col
+COLS = SCREEN_WIDTH // CELL_SIZE
+ROWS = SCREEN_HEIGHT // CELL_SIZE
+
+PLAYER_COLORS = [arcade.color.ELECTRIC_CRIMSON, arcade.color.CYAN]
+
+BOARD_COLOR = arcade.color.DARK_BLUE_GRAY
+# Картинка snakes_menu_bg под сеткой, затемнённая как в старом меню
+SHOW_BACKDROP = False
+BACKDROP_SHADE = (0, 0, 0, 150)
 
 STATE_COUNTDOWN = 0
 STATE_GAME = 1
 
 
-def resource_path(relative_path):
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        assets_path = os.path.join(os.path.dirname(base_path), "Assets")
-        if os.path.exists(assets_path):
-            test_path = os.path.join(os.path.dirname(base_path), relative_path)
-            if os.path.exists(test_path):
-                return test_path
-            test_path = os.path.join(base_path, relative_path)
-            if os.path.exists(test_path):
-                return test_path
-
-    full_path = os.path.join(base_path, relative_path)
-    return full_path
-
-
-class Particle:
-    def __init__(self, x, y, color):
-        self.x = x
-        self.y = y
+SEGMENT_SIZE = CELL_SIZE - 2
+PARTICLE_SIZE = 4
+
+
+class Particle(arcade.SpriteSolidColor):
+    def __init__(self):
+        super().__init__(PARTICLE_SIZE, PARTICLE_SIZE)
+        self.vx = 0
+        self.vy = 0
+
+    def reset(self, x, y):
+        self.position = x, y
         self.vx = random.uniform(-5, 5)
         self.vy = random.uniform(-5, 5)
         self.alpha = 255
-        self.color = color
 
-    def update(self):
-        self.x += self.vx
-        self.y += self.vy
-        self.alpha -= 5
+    def update(self, delta_time=1 / 60, *args, **kwargs):
+        self.center_x += self.vx
+        self.center_y += self.vy
+        self.alpha = max(0, self.alpha - 5)
+
+
+class SpritePool:
+    # Спрайты не удаляются, а прячутся и переиспользуются; всё рисуется одним вызовом
+    def __init__(self, factory):
+        self.factory = factory
+        self.sprites = arcade.SpriteList()
+        self.free = []
+
+    def take(self, color):
+        if self.free:
+            sprite = self.free.pop()
+            sprite.visible = True
+        else:
+            sprite = self.factory()
+            self.sprites.append(sprite)
+        sprite.color = color
+        return sprite
+
+    def release(self, sprite):
+        sprite.visible = False
+        self.free.append(sprite)
+
+    def release_all(self):
+        for sprite in self.sprites:
+            if sprite.visible:
+                self.release(sprite)
+
+    def draw(self):
+        self.sprites.draw()
+
 
-    def draw(self, off_x, off_y):
-        if self.alpha > 0:
-            color = (self.color[0], self.color[1], self.color[2], self.alpha)
-            arcade.draw_rect_filled(arcade.rect.XYWH(self.x + off_x, self.y + off_y, 4, 4), color)
+def cell_xy(cell):
+    row, col = divmod(cell, COLS)
+    return col * CELL_SIZE, row * CELL_SIZE
 
 
-class Snake:
-    def __init__(self, x, y, color):
-        self.color = color
-        self.segments = [[x, y], [x - CELL_SIZE, y]]
-        self.change_x = CELL_SIZE
-        self.change_y = 0
+def cell_center(cell):
+    x, y = cell_xy(cell)
+    return x + CELL_SIZE / 2, y + CELL_SIZE / 2
 
-    def draw(self, off_x, off_y):
-        for seg in self.segments:
-            arcade.draw_rect_filled(
-                arcade.rect.XYWH(seg[0] + CELL_SIZE / 2 + off_x, seg[1] + CELL_SIZE / 2 + off_y,
-                                 CELL_SIZE - 2, CELL_SIZE - 2),
-                self.color
-            )
 
+def solid_cell():
+    return arcade.SpriteSolidColor(SEGMENT_SIZE, SEGMENT_SIZE)
 
-class SnakeBattle(arcade.Window):
+
+class SnakeBattle(arcade.View):
     def __init__(self):
-        super().__init__(fullscreen=True, title=SCREEN_TITLE)
+        super().__init__()
         # self.state = STATE_MENU
-        self.player1 = None
-        self.player2 = None
-        self.apple = None
-        self.timer = 0
+        # Правила и состояние игры - в snake_sim, окно только рисует его
+        self.sim = snake_sim.SnakeSim(cols=COLS, rows=ROWS)
+        self.bodies = [deque(), deque()]
+        self.apples = {}
+        self.body_pool = SpritePool(solid_cell)
+        self.apple_pool = SpritePool(solid_cell)
+        self.particle_pool = SpritePool(Particle)
+        # Поле рисуется в своих координатах, камера сдвигает его в центр окна
+        self.board_camera = arcade.Camera2D()
+        self.board_shapes = None
+        self.board_backdrop = arcade.SpriteList()
+        self.board_key = None
         self.flash_timer = 0
-        self.game_over = False
         self.menu_bg = self.is_music = self.over_sound = None
-        self.current_speed = BASE_SPEED
-        self.score1 = 0
-        self.score2 = 0
-        self.particles = []
 
         self.state = STATE_COUNTDOWN
         self.countdown_value = 3.0
@@ -93,152 +123,244 @@ class SnakeBattle(arcade.Window):
         self.title_text = arcade.Text("SNAKE BATTLE", 0, 0, arcade.color.NEON_GREEN, 50, anchor_x="center", bold=True)
         self.hint_text = arcade.Text("P1: Arrows | P2: WASD\n\nPRESS ENTER TO START\n\nESC TO EXIT",
                                      0, 0, arcade.color.WHITE, 16, anchor_x="center", multiline=True, width=500)
-        self.over_text = arcade.Text("", self.width / 2, self.height / 2, arcade.color.GOLD, 35, anchor_x="center",
-                                     bold=True)
-        self.countdown_text = arcade.Text("", self.width / 2, self.height / 2, arcade.color.NEON_GREEN, 50,
-                                          anchor_x="center", bold=True)
 
+        self.hud = hud.Hud()
+        self.hud.add("speed", "", 10, 0, arcade.color.LIGHT_GRAY, 22, bold=True)
+        self.hud.add("score1", "", 10, 0, arcade.color.ELECTRIC_CRIMSON, 22, bold=True)
+        self.hud.add("score2", "", 10, 0, arcade.color.CYAN, 22, bold=True)
+        self.hud.add("over", "", 0, 0, arcade.color.GOLD, 35, anchor_x="center", bold=True)
+        self.hud.add("countdown", "", 0, 0, arcade.color.NEON_GREEN, 50, charset=hud.DIGITS,
+                     anchor_x="center", bold=True)
+        self.hud.prewarm()
+        self.layout_hud()
+
+    def on_show_view(self):
+        self.window.set_caption(SCREEN_TITLE)
+        arcade.set_background_color(arcade.color.BLACK)
+        self.update_board_camera()
+        self.layout_hud()
         self.setup()
 
+    def on_hide_view(self):
+        if self.is_music:
+            arcade.stop_sound(self.is_music)
+            self.is_music = None
+
     def setup(self):
 
         # self.ctx.projection_2d = 0, SCREEN_WIDTH, 0, SCREEN_HEIGHT
 
         try:
-            self.eat_sound = arcade.load_sound(resource_path("Assets/sound/snake_sounds/eat.wav"))
-            self.music_bg = arcade.load_sound(resource_path("Assets/sound/snake_sounds/snake_music.mp3"))
-            self.menu_bg = arcade.load_texture(resource_path("Assets/images/snakes_menu_bg.png"))
+            self.eat_sound = assets.load_sound("Assets/sound/snake_sounds/eat.wav")
+            self.music_bg = assets.load_sound("Assets/sound/snake_sounds/snake_music.mp3")
+            self.menu_bg = assets.load_texture_fit("Assets/images/snakes_menu_bg.png", SCREEN_WIDTH, SCREEN_HEIGHT)
             if not self.over_sound:
-                self.over_sound = arcade.load_sound(resource_path("Assets/sound/snake_sounds/over_sound.mp3"))
+                self.over_sound = assets.load_sound("Assets/sound/snake_sounds/over_sound.mp3")
         except:
             pass
-        self.player1 = Snake(100, 300, arcade.color.ELECTRIC_CRIMSON)
-        self.player2 = Snake(500, 300, arcade.color.CYAN)
-        self.player2.change_x = -CELL_SIZE
-        self.current_speed = BASE_SPEED
-        self.score1 = 0
-        self.score2 = 0
-        self.game_over = False
-        self.particles = []
+        self.build_board()
+        self.sim.reset(seed=replay.match_seed())
+        self.particle_pool.release_all()
+        self.sync_sprites()
         self.state = STATE_COUNTDOWN
         self.countdown_value = 3.0
         self.last_tick_sec = 3
         self.start_background_music()
-        self.apples = []
-        for _ in range(2):
-            self.spawn_apple()
+
+    def save_state(self):
+        # Для перемотки воспроизведения: вся игра - в симуляции, остальное - таймеры и текст итога
+        return (copy.deepcopy(self.sim), self.state, self.countdown_value, self.last_tick_sec,
+                self.flash_timer, self.hud["over"].text)
+
+    def load_state(self, state):
+        sim, self.state, self.countdown_value, self.last_tick_sec, self.flash_timer, over = state
+        # снимок остаётся нетронутым, чтобы на него можно было вернуться ещё раз
+        self.sim = copy.deepcopy(sim)
+        self.hud.set("over", over)
+        self.particle_pool.release_all()
+        self.sync_sprites()
+
+    def sync_sprites(self):
+        # Полная пересборка спрайтов по состоянию симуляции (новая партия)
+        self.body_pool.release_all()
+        self.apple_pool.release_all()
+        for player, snake in enumerate(self.sim.snakes):
+            self.bodies[player].clear()
+            for cell in snake.segments:
+                self.add_body(player, cell)
+        self.apples = {}
+        for apple in self.sim.apples:
+            self.add_apple(apple)
 
     def create_explosion(self, x, y, color):
         for _ in range(25):
-            self.particles.append(Particle(x + CELL_SIZE / 2, y + CELL_SIZE / 2, color))
+            self.particle_pool.take(color).reset(x + CELL_SIZE / 2, y + CELL_SIZE / 2)
+
+    def add_body(self, player, cell):
+        body = self.body_pool.take(PLAYER_COLORS[player])
+        body.position = cell_center(cell)
+        self.bodies[player].append(body)
+
+    def add_apple(self, cell):
+        sprite = self.apple_pool.take(arcade.color.NEON_GREEN)
+        sprite.position = cell_center(cell)
+        self.apples[cell] = sprite
+
+    def apply_events(self, events):
+        # Спрайты повторяют изменения симуляции: голова добавляется, хвост уходит в пул
+        for event in events:
+            if event[0] == "move":
+                _, player, head, tail = event
+                self.add_body(player, head)
+                if tail is not None:
+                    self.body_pool.release(self.bodies[player].popleft())
+            elif event[0] == "eat":
+                _, player, apple, new_apple = event
+                if self.eat_sound: arcade.play_sound(self.eat_sound)
+                self.apple_pool.release(self.apples.pop(apple))
+                self.add_apple(new_apple)
+            elif event[0] == "crash":
+                self.finish_game(event[1])
+
+    def finish_game(self, winner):
+        if self.over_sound: arcade.play_sound(self.over_sound)
+        for player, snake in enumerate(self.sim.snakes):
+            self.create_explosion(snake.head_col * CELL_SIZE, snake.head_row * CELL_SIZE, PLAYER_COLORS[player])
+        if winner == snake_sim.RED:
+            interface.count_of_red += 1
+            self.hud.set("over", "COLLISION! RED PLAYER WINS!")
+        elif winner == snake_sim.BLUE:
+            interface.count_of_blue += 1
+            self.hud.set("over", "COLLISION! BLUE PLAYER WINS!")
+        else:
+            self.hud.set("over", "COLLISION! IT'S A DRAW!")
+
+    def board_offset(self):
+        return (self.window.width - SCREEN_WIDTH) // 2, (self.window.height - SCREEN_HEIGHT) // 2
+
+    def layout_hud(self):
+        off_y = self.board_offset()[1]
+        self.hud["speed"].position = 10, self.window.height + 60 - off_y
+        self.hud["score1"].position = 10, self.window.height + 30 - off_y
+        self.hud["score2"].position = 10, self.window.height - off_y
+        self.hud["over"].position = self.window.width / 2, self.window.height / 2
+        self.hud["countdown"].position = self.window.width / 2, self.window.height / 2
+
+    def update_board_camera(self):
+        off_x, off_y = self.board_offset()
+        self.board_camera.match_window()
+        self.board_camera.position = (self.window.width / 2 - off_x, self.window.height / 2 - off_y)
+
+    def build_board(self):
+        # Сетка и рамка собираются в один буфер; смещение в окне делает камера,
+        # так что пересобирать нужно только при смене размеров поля
+        backdrop = self.menu_bg if SHOW_BACKDROP else None
+        key = (SCREEN_WIDTH, SCREEN_HEIGHT, CELL_SIZE, backdrop)
+        if key == self.board_key:
+            return
+        self.board_key = key
 
-    def spawn_apple(self):
-        new_apple = [random.randrange(0, SCREEN_WIDTH, CELL_SIZE),
-                     random.randrange(0, SCREEN_HEIGHT, CELL_SIZE)]
-        self.apples.append(new_apple)
+        self.board_backdrop.clear()
+        shapes = arcade.shape_list.ShapeElementList()
+        if backdrop:
+            self.board_backdrop.append(arcade.Sprite(backdrop, center_x=SCREEN_WIDTH / 2, center_y=SCREEN_HEIGHT / 2))
+            shapes.append(arcade.shape_list.create_rectangle_filled(
+                SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2, SCREEN_WIDTH, SCREEN_HEIGHT, BACKDROP_SHADE))
 
-    def draw_grid(self):
+        points = []
         for x in range(0, SCREEN_WIDTH + 1, CELL_SIZE):
-            arcade.draw_line(x, 0, x, SCREEN_HEIGHT, arcade.color.DARK_BLUE_GRAY, 1)
+            points += [(x, 0), (x, SCREEN_HEIGHT)]
         for y in range(0, SCREEN_HEIGHT + 1, CELL_SIZE):
-            arcade.draw_line(0, y, SCREEN_WIDTH, y, arcade.color.DARK_BLUE_GRAY, 1)
+            points += [(0, y), (SCREEN_WIDTH, y)]
+        shapes.append(arcade.shape_list.create_lines(points, BOARD_COLOR, 1))
+        shapes.append(arcade.shape_list.create_rectangle_outline(
+            SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2, SCREEN_WIDTH, SCREEN_HEIGHT, BOARD_COLOR, 2))
+        self.board_shapes = shapes
 
     def on_draw(self):
         self.clear()
 
-        off_x = (self.width - SCREEN_WIDTH) // 2
-        off_y = (self.height - SCREEN_HEIGHT) // 2
-
-        arcade.draw_rect_outline(arcade.rect.XYWH(self.width / 2, self.height / 2, SCREEN_WIDTH, SCREEN_HEIGHT),
-                                 arcade.color.DARK_BLUE_GRAY, 2)
+        if self.board_shapes is None:
+            self.build_board()
+        with self.board_camera.activate():
+            self.board_backdrop.draw()
+            self.board_shapes.draw()
 
         # if self.state == STATE_MENU:
-        #    if self.menu_bg:
-        #        arcade.draw_texture_rect(self.menu_bg, arcade.rect.XYWH(off_x * 2, off_y * 2, 600, 600))
-        #        arcade.draw_rect_filled(arcade.rect.XYWH(off_x * 2, off_y * 2, 600, 600), (0, 0, 0, 150))
-
         #    self.title_text.draw()
         #    self.hint_text.draw()
 
         # elif self.state == STATE_GAME:
-        for x in range(0, SCREEN_WIDTH + 1, CELL_SIZE):
-            arcade.draw_line(x + off_x, off_y, x + off_x, SCREEN_HEIGHT + off_y, arcade.color.DARK_BLUE_GRAY, 1)
-        for y in range(0, SCREEN_HEIGHT + 1, CELL_SIZE):
-            arcade.draw_line(off_x, y + off_y, SCREEN_WIDTH + off_x, y + off_y, arcade.color.DARK_BLUE_GRAY, 1)
 
-        speed_val = int((BASE_SPEED / self.current_speed) * 100)
-        arcade.draw_text(f"SPEED: {speed_val}%", 10, self.height + 60 - off_y, arcade.color.LIGHT_GRAY,
-                         22, bold=True)
-        arcade.draw_text(f"RED PLAYER: {self.score1}", 10, self.height + 30 - off_y, arcade.color.ELECTRIC_CRIMSON, 22,
-                         bold=True)
-        arcade.draw_text(f"BLUE PLAYER: {self.score2}", 10, self.height - off_y, arcade.color.CYAN, 22,
-                         bold=True)
+        speed_val = int((snake_sim.BASE_SPEED / self.sim.current_speed) * 100)
+        self.hud.set("speed", f"SPEED: {speed_val}%")
+        self.hud.set("score1", f"RED PLAYER: {self.sim.scores[snake_sim.RED]}")
+        self.hud.set("score2", f"BLUE PLAYER: {self.sim.scores[snake_sim.BLUE]}")
+        self.hud.draw("speed", "score1", "score2")
 
-        for p in self.particles:
-            p.draw(off_x, off_y)
+        with self.board_camera.activate():
+            self.particle_pool.draw()
 
         if self.state == STATE_COUNTDOWN:
-            self.countdown_text.text = str(int(self.countdown_value) + 1)
-            self.countdown_text.draw()
-        elif self.game_over:
-            self.over_text.x, self.over_text.y = self.width / 2, self.height / 2
-            self.over_text.draw()
+            self.hud.set("countdown", int(self.countdown_value) + 1)
+            self.hud.draw("countdown")
+        elif self.sim.game_over:
+            self.hud.draw("over")
         else:
-            alpha = int(160 + 95 * math.sin(self.flash_timer * 12))
-            c = arcade.color.NEON_GREEN
-            apple_color = (c[0], c[1], c[2], alpha)
-            for apple in self.apples:
-                arcade.draw_rect_filled(
-                    arcade.rect.XYWH(apple[0] + CELL_SIZE / 2 + off_x, apple[1] + CELL_SIZE / 2 + off_y,
-                                     CELL_SIZE - 2, CELL_SIZE - 2), apple_color)
-            self.player1.draw(off_x, off_y)
-            self.player2.draw(off_x, off_y)
+            self.apple_pool.sprites.alpha = int(160 + 95 * math.sin(self.flash_timer * 12))
+            with self.board_camera.activate():
+                self.apple_pool.draw()
+                self.body_pool.draw()
 
     def on_resize(self, width, height):
         super().on_resize(width, height)
+        self.update_board_camera()
+        self.layout_hud()
         # self.ctx.projection_2d = 0, width, 0, height
 
     def on_key_press(self, key, modifiers):
         if key == arcade.key.ESCAPE:
-            arcade.exit()
+            self.window.show_scene("menu")
+            return
 
-        if self.game_over and key == arcade.key.SPACE:
+        if self.sim.game_over and key == arcade.key.SPACE:
             self.setup()
             return
 
-        if key == arcade.key.UP and self.player1.change_y == 0:
-            self.player1.change_x, self.player1.change_y = 0, CELL_SIZE
-        elif key == arcade.key.DOWN and self.player1.change_y == 0:
-            self.player1.change_x, self.player1.change_y = 0, -CELL_SIZE
-        elif key == arcade.key.LEFT and self.player1.change_x == 0:
-            self.player1.change_x, self.player1.change_y = -CELL_SIZE, 0
-        elif key == arcade.key.RIGHT and self.player1.change_x == 0:
-            self.player1.change_x, self.player1.change_y = CELL_SIZE, 0
+        if key == arcade.key.UP:
+            self.sim.turn(snake_sim.RED, snake_sim.UP)
+        elif key == arcade.key.DOWN:
+            self.sim.turn(snake_sim.RED, snake_sim.DOWN)
+        elif key == arcade.key.LEFT:
+            self.sim.turn(snake_sim.RED, snake_sim.LEFT)
+        elif key == arcade.key.RIGHT:
+            self.sim.turn(snake_sim.RED, snake_sim.RIGHT)
 
         try:
             char = chr(key).lower()
         except:
             char = ''
-        if (key == arcade.key.W or key == 119) and self.player2.change_y == 0:
-            self.player2.change_x, self.player2.change_y = 0, CELL_SIZE
-        elif (key == arcade.key.S or char in 'sы') and self.player2.change_y == 0:
-            self.player2.change_x, self.player2.change_y = 0, -CELL_SIZE
-        elif (key == arcade.key.A or char in 'aф') and self.player2.change_x == 0:
-            self.player2.change_x, self.player2.change_y = -CELL_SIZE, 0
-        elif (key == arcade.key.D or char in 'dв') and self.player2.change_x == 0:
-            self.player2.change_x, self.player2.change_y = CELL_SIZE, 0
+        if key == arcade.key.W or key == 119:
+            self.sim.turn(snake_sim.BLUE, snake_sim.UP)
+        elif key == arcade.key.S or char in 'sы':
+            self.sim.turn(snake_sim.BLUE, snake_sim.DOWN)
+        elif key == arcade.key.A or char in 'aф':
+            self.sim.turn(snake_sim.BLUE, snake_sim.LEFT)
+        elif key == arcade.key.D or char in 'dв':
+            self.sim.turn(snake_sim.BLUE, snake_sim.RIGHT)
 
     def start_background_music(self):
         if self.is_music:
             arcade.stop_sound(self.is_music)
-        self.background_music = arcade.load_sound(resource_path("Assets/sound/snake_sounds/snake_music.mp3"))
+        self.background_music = assets.load_sound("Assets/sound/snake_sounds/snake_music.mp3")
         self.is_music = arcade.play_sound(self.background_music, loop=True)
 
     def on_update(self, delta_time):
         self.flash_timer += delta_time
-        for p in self.particles[:]:
+        for p in self.particle_pool.sprites:
+            if not p.visible: continue
             p.update()
-            if p.alpha <= 0: self.particles.remove(p)
+            if p.alpha <= 0: self.particle_pool.release(p)
 
         if self.state == STATE_COUNTDOWN:
             self.countdown_value -= delta_time
@@ -247,52 +369,15 @@ class SnakeBattle(arcade.Window):
                 self.state = STATE_GAME
             return
 
-        if self.game_over: return
-
-        self.timer += delta_time
-        if self.timer < self.current_speed: return
-        self.timer = 0
-
-        self.current_speed = max(MIN_SPEED, BASE_SPEED - ((self.score1 + self.score2) * 0.005))
-        for i, p in enumerate([self.player1, self.player2]):
-            head = p.segments[-1]
-            new_head = [int(head[0] + p.change_x), int(head[1] + p.change_y)]
-            p.segments.append(new_head)
-            ate = False
-            for apple in self.apples[:]:
-                if new_head == apple:
-                    if i == 0:
-                        self.score1 += 1
-                    else:
-                        self.score2 += 1
-                    if self.eat_sound: arcade.play_sound(self.eat_sound)
-                    self.apples.remove(apple)
-                    self.spawn_apple()
-                    ate = True
-                    break
-            if not ate: p.segments.pop(0)
-
-        h1, h2 = self.player1.segments[-1], self.player2.segments[-1]
-        b1, b2 = self.player1.segments[:-1], self.player2.segments[:-1]
-
-        if h1[0] < 0 or h1[0] >= SCREEN_WIDTH or h1[1] < 0 or h1[1] >= SCREEN_HEIGHT or \
-                h2[0] < 0 or h2[0] >= SCREEN_WIDTH or h2[1] < 0 or h2[1] >= SCREEN_HEIGHT or \
-                h1 == h2 or h1 in b1 or h1 in b2 or h2 in b1 or h2 in b2:
-            self.game_over = True
-            if self.over_sound: arcade.play_sound(self.over_sound)
-            for h, c in [(h1, self.player1.color), (h2, self.player2.color)]:
-                for _ in range(25): self.particles.append(Particle(h[0] + CELL_SIZE / 2, h[1] + CELL_SIZE / 2, c))
-            if self.score1 > self.score2:
-                interface.count_of_red += 1
-                self.over_text.text = "COLLISION! RED PLAYER WINS!"
-            elif self.score2 > self.score1:
-                interface.count_of_blue += 1
-                self.over_text.text = "COLLISION! BLUE PLAYER WINS!"
-            else:
-                self.over_text.text = "COLLISION! IT'S A DRAW!"
+        with profiler.phase("simulation"):
+            events = self.sim.advance(delta_time)
+        with profiler.phase("sprites"):
+            self.apply_events(events)
+
+
+def main():
+    scenes.run("snakes")
 
 
 if __name__ == "__main__":
-    game = SnakeBattle()
-    game.setup()
-    arcade.run()
+    main()
@@ -1,29 +1,13 @@
-import os
-import sys
 import arcade
 import math
 from arcade.gui import UIManager, UITextureButton, UIAnchorLayout, UIBoxLayout
 
-import interface
+import assets
+import hud
+from profiler import profiler
+import scenes
 
 
-def resource_path(relative_path):
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        assets_path = os.path.join(os.path.dirname(base_path), "Assets")
-        if os.path.exists(assets_path):
-            test_path = os.path.join(os.path.dirname(base_path), relative_path)
-            if os.path.exists(test_path):
-                return test_path
-            test_path = os.path.join(base_path, relative_path)
-            if os.path.exists(test_path):
-                return test_path
-
-    full_path = os.path.join(base_path, relative_path)
-    return full_path
-
 TANK_SCALE = 1
 TANK_SPEED = 1.5
 
@@ -34,7 +18,7 @@ ROCKET_SPEED = 5
 class Tank_red(arcade.Sprite):
     def __init__(self):
         super(Tank_red, self).__init__()
-        self.texture = arcade.load_texture(resource_path(f'Assets/images/tank_red.png'))
+        self.texture = assets.load_texture('Assets/images/tank_red.png')
         self.center_x = arcade.get_window().width // 2
         self.center_y = arcade.get_window().height // 4
 
@@ -64,7 +48,7 @@ class Tank_red(arcade.Sprite):
 class Tank_blue(arcade.Sprite):
     def __init__(self):
         super(Tank_blue, self).__init__()
-        self.texture = arcade.load_texture(resource_path(f'Assets/images/tank_blue.png'))
+        self.texture = assets.load_texture('Assets/images/tank_blue.png')
         self.center_x = arcade.get_window().width // 2
         self.center_y = arcade.get_window().height * 3 // 4
 
@@ -93,8 +77,7 @@ class Tank_blue(arcade.Sprite):
 
 class Rocket_red(arcade.Sprite):
     def __init__(self, start_x, start_y, angle):
-        super().__init__(arcade.load_texture(':resources:/images/topdown_tanks/tankRed_barrel1.png'), ROCKET_SCALE)
-        self.texture = arcade.load_texture(':resources:/images/topdown_tanks/tankRed_barrel1.png')
+        super().__init__(assets.load_texture(':resources:/images/topdown_tanks/tankRed_barrel1.png'), ROCKET_SCALE)
         self.center_x = start_x
         self.center_y = start_y
         self.angle = angle
@@ -117,8 +100,7 @@ class Rocket_red(arcade.Sprite):
 
 class Rocket_blue(arcade.Sprite):
     def __init__(self, start_x, start_y, angle):
-        super().__init__(arcade.load_texture(':resources:/images/topdown_tanks/tankBlue_barrel1.png'), ROCKET_SCALE)
-        self.texture = arcade.load_texture(':resources:/images/topdown_tanks/tankBlue_barrel1.png')
+        super().__init__(assets.load_texture(':resources:/images/topdown_tanks/tankBlue_barrel1.png'), ROCKET_SCALE)
         self.center_x = start_x
         self.center_y = start_y
         self.angle = angle
@@ -138,47 +120,65 @@ class Rocket_blue(arcade.Sprite):
             self.remove_from_sprite_lists()
 
 
-class TankGame(arcade.Window):
+class TankGame(arcade.View):
     def __init__(self):
-        super().__init__(fullscreen=True)
-        self.texture_back = arcade.load_texture(resource_path('Assets/images/place_of_tanks.png'))
-        self.setup()
-        self.setup_ui()
+        super().__init__()
+        self.texture_back = assets.load_texture_fit('Assets/images/place_of_tanks.png', self.window.width,
+                                                     self.window.height)
         self.anchor_layout = None
         self.box_layout = None
         self.again_button = None
+        self.setup_ui()
+
+        self.hud = hud.Hud()
+        self.hud.add("red_wins", "WINNER IS RED!", 0, 0,
+                     arcade.color.RED, 50, charset="", anchor_x="center", anchor_y="center")
+        self.hud.add("blue_wins", "WINNER IS BLUE!", 0, 0,
+                     arcade.color.BLUE, 50, charset="", anchor_x="center", anchor_y="center")
+        self.hud.prewarm()
+
+    def on_show_view(self):
+        self.window.set_caption("Танки")
+        arcade.set_background_color(arcade.color.BLACK)
+        self.manager.enable()
+        self.layout_hud()
+        self.setup()
+
+    def on_resize(self, width, height):
+        super().on_resize(width, height)
+        self.layout_hud()
+
+    def layout_hud(self):
+        self.hud["red_wins"].position = self.window.width // 2, self.window.height // 2
+        self.hud["blue_wins"].position = self.window.width // 2, self.window.height // 2
+
+    def on_hide_view(self):
+        self.manager.disable()
 
     def setup_ui(self):
         self.manager = UIManager()
-        self.manager.enable()
         self.anchor_layout = UIAnchorLayout()
         self.box_layout = UIBoxLayout(vertical=False, space_between=500)
         self.anchor_layout.add(self.box_layout)
         self.manager.add(self.anchor_layout)
 
-        menu_button = UITextureButton(
-            texture=arcade.load_texture(resource_path("Assets/images/menu_icon.png")),
-            scale=0.2
-        )
+        menu_texture, menu_scale = assets.load_texture_scaled("Assets/images/menu_icon.png", assets.MENU_ICON_SCALE)
+        menu_button = UITextureButton(texture=menu_texture, scale=menu_scale)
 
         def on_menu_click(event):
-            self.manager.disable()
-            self.close()
-            menu_window = interface.MyGame()
-            arcade.run()
+            self.window.show_scene("menu")
 
         menu_button.on_click = on_menu_click
         self.box_layout.add(menu_button)
 
-        self.again_button = UITextureButton(
-            texture=arcade.load_texture(resource_path("Assets/images/vor.png")),
-            scale=0.8
-        )
+        again_texture, again_scale = assets.load_texture_scaled("Assets/images/vor.png", assets.RESTART_ICON_SCALE)
+        self.again_button = UITextureButton(texture=again_texture, scale=again_scale)
         self.again_button.on_click = self.restart_game
         self.box_layout.add(self.again_button)
 
     def setup(self):
         self.game_over = False
+        self.winner = None
         self.red_tank = Tank_red()
         self.blue_tank = Tank_blue()
         self.rockets = arcade.SpriteList()
@@ -190,6 +190,28 @@ class TankGame(arcade.Window):
     def restart_game(self, event=None):
         self.setup()
 
+    def save_state(self):
+        # Для перемотки воспроизведения: танки и ракеты - положение, скорость и угол
+        tanks = [(tank.center_x, tank.center_y, tank.change_x, tank.change_y, tank.angle)
+                 for tank in (self.red_tank, self.blue_tank)]
+        rockets = [(rocket.owner_color, rocket.center_x, rocket.center_y, rocket.change_x, rocket.change_y,
+                    rocket.angle) for rocket in self.rockets]
+        return self.game_over, self.winner, tanks, rockets, set(self.keys_pressed)
+
+    def load_state(self, state):
+        self.game_over, self.winner, tanks, rockets, keys_pressed = state
+        self.keys_pressed = set(keys_pressed)
+        for tank, (x, y, change_x, change_y, angle) in zip((self.red_tank, self.blue_tank), tanks):
+            tank.center_x, tank.center_y = x, y
+            tank.change_x, tank.change_y = change_x, change_y
+            tank.angle = angle
+        self.rockets.clear()
+        for owner_color, x, y, change_x, change_y, angle in rockets:
+            rocket = Rocket_red(x, y, 0) if owner_color == "red" else Rocket_blue(x, y, 0)
+            rocket.change_x, rocket.change_y = change_x, change_y
+            rocket.angle = angle
+            self.rockets.append(rocket)
+
     def on_draw(self):
         self.clear()
         arcade.draw_texture_rect(self.texture_back,
@@ -199,19 +221,13 @@ class TankGame(arcade.Window):
         self.rockets.draw()
 
         if self.game_over and self.winner == 'red':
-            arcade.draw_text(f"WINNER IS RED!",
-                             arcade.get_window().width // 2, arcade.get_window().height // 2,
-                             arcade.color.RED, 50,
-                             anchor_x="center", anchor_y="center")
-
+            self.hud.draw("red_wins")
 
         elif self.game_over and self.winner == 'blue':
-            arcade.draw_text(f"WINNER IS BLUE!",
-                             arcade.get_window().width // 2, arcade.get_window().height // 2,
-                             arcade.color.BLUE, 50,
-                             anchor_x="center", anchor_y="center")
+            self.hud.draw("blue_wins")
 
         if self.game_over:
+            with profiler.phase("ui"):
                 self.manager.draw()
 
     def on_update(self, delta_time):
@@ -220,8 +236,13 @@ class TankGame(arcade.Window):
 
         self.red_tank.update(delta_time)
         self.blue_tank.update(delta_time)
-        self.rockets.update()
+        with profiler.phase("rockets"):
+            self.rockets.update()
     
+        with profiler.phase("collisions"):
+            self.check_rocket_hits()
+
+    def check_rocket_hits(self):
         for rocket in self.rockets:
             if rocket.owner_color == "red" and arcade.check_for_collision(rocket, self.blue_tank):
                 self.game_over = True
@@ -288,8 +309,7 @@ class TankGame(arcade.Window):
 
 
 def main():
-    game = TankGame()
-    arcade.run()
+    scenes.run("tanks")
 
 
 if __name__ == "__main__":